@@ -4,6 +4,10 @@ import pandas as pd
 import numpy as np
 from tabulate import tabulate
 from datetime import datetime
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.results import ResultSink
 
 # 设置中文显示格式
 pd.set_option('display.unicode.ambiguous_as_wide', True)
@@ -112,4 +116,8 @@ if __name__ == "__main__":
     final_output = format_output(stats_result)
     
     # 打印结果
-    print(tabulate(final_output, headers='keys', tablefmt='pretty', showindex=True))
\ No newline at end of file
+    print(tabulate(final_output, headers='keys', tablefmt='pretty', showindex=True))
+
+    # 未格式化的统计结果追加到本地结果仓库，便于和其他指数、其他起始日期的结果一起比较
+    with ResultSink("halfmonth", params={"symbol": INDEX_CODE, "start_date": START_DATE}) as sink:
+        sink.append(stats_result.rename_axis('半月'))
\ No newline at end of file
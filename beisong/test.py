@@ -1,8 +1,10 @@
 import os
 import pandas as pd
-import time
 from tqdm import tqdm
 import akshare as ak
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.fetcher import Fetcher, call_with_retry
 
 
 class THSIndustry(object):
@@ -14,14 +16,24 @@ class THSIndustry(object):
     def update(self):
         stock_industry_df = ak.stock_board_industry_summary_ths()  # 同花顺
         industry_list = []
-        for concept_dict_data in tqdm(stock_industry_df.to_dict(orient="records"), desc="更新同花顺行业"):
-            time.sleep(3)
-            stock_board_concept_df = ak.stock_board_industry_cons_ths(symbol=concept_dict_data['板块'])
-            stock_board_concept_df['行业'] = concept_dict_data['板块']
-            [industry_list.append(_) for _ in stock_board_concept_df.to_dict(orient="records")]
+        boards = stock_industry_df['板块'].tolist()
+        # 成分请求按接口限速（同花顺每 3 秒一次），出错自动重试，失败的板块最后再补跑一轮
+        fetcher = Fetcher(max_workers=2)
+        for results in (fetcher.map(self._board_cons, boards), fetcher.retry_failures()):
+            for board, records in tqdm(results, desc="更新同花顺行业"):
+                if records is not None:
+                    industry_list.extend(records)
+        if fetcher.failures:
+            print(f"以下行业成分更新失败: {[f.item for f in fetcher.failures]}")
         # 导出结果
         pd.DataFrame(industry_list).to_csv(self.concept_file)
 
+    @staticmethod
+    def _board_cons(board):
+        stock_board_concept_df = call_with_retry("stock_board_industry_cons_ths", ak.stock_board_industry_cons_ths, symbol=board)
+        stock_board_concept_df['行业'] = board
+        return stock_board_concept_df.to_dict(orient="records")
+
     def get_industry_df(self):
         if not os.path.exists(self.concept_file):
             return None
@@ -1,24 +1,33 @@
 import pandas as pd
 import random
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.industry import industry_store
 
-# 读取Excel文件（根据实际路径修改）
-df = pd.read_excel('/Users/jianaoli/Quant/quant1/beisong/stocks.xlsx', sheet_name='选股结果')
+# 同花顺行业存放在本地行业库里，第一次运行时从 Excel 文件导入（根据实际路径修改）
+industry_df = industry_store.load("ths")
+if industry_df.empty:
+    df = pd.read_excel(os.path.join(os.path.dirname(__file__), 'stocks.xlsx'), sheet_name='选股结果')
 
-# 预处理：确保列名正确
-df = df.rename(columns={'所属同花顺行业': '行业'})  # 将列名简化为'行业'
+    # 预处理：确保列名正确
+    df = df.rename(columns={'股票代码': '代码', '股票简称': '名称', '所属同花顺行业': '行业'})  # 将列名简化为'行业'
+    industry_store.replace("ths", df[['代码', '名称', '行业']].dropna())
+    industry_df = industry_store.load("ths")
 
 # 提取需要的列：股票代码、股票简称、行业
-companies = df[['股票代码', '股票简称', '行业']].dropna().to_dict('records')
+companies = industry_df.reset_index().rename(columns={'代码': '股票代码', '名称': '股票简称'}).to_dict('records')
+
+# 行业列是分类编码，类别就是所有行业的唯一值
+all_industries = list(industry_df['行业'].cat.categories)
 
 def generate_question(companies):
     # 随机选择一家公司
     current_company = random.choice(companies)
     correct_industry = current_company['行业']
     
-    # 收集所有其他行业的唯一值
-    other_industries = list(set(
-        [c['行业'] for c in companies if c['行业'] != correct_industry]
-    ))
+    # 其他行业
+    other_industries = [industry for industry in all_industries if industry != correct_industry]
     
     # 随机选择3个不重复的错误选项
     wrong_choices = random.sample(other_industries, 3) if len(other_industries) >= 3 else []
@@ -1,17 +1,30 @@
 import pandas as pd
 import random
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.industry import industry_store
 
-# 读取Excel文件（根据实际路径修改）
-df = pd.read_excel('/Users/jianaoli/Quant/quant1/beisong/as.xlsx', sheet_name='全部A股')
+# 公司简介和行业存放在本地行业库里，第一次运行时从 Excel 文件导入（根据实际路径修改）
+companies_df = industry_store.load_profiles()
+if companies_df.empty:
+    df = pd.read_excel(os.path.join(os.path.dirname(__file__), 'as.xlsx'), sheet_name='全部A股')
 
-# 选择需要的列并重命名
-df = df.rename(columns={
-    '证券代码': '股票代码',
-    '证券名称': '股票简称'
-})
+    # 选择需要的列并重命名
+    df = df.rename(columns={
+        '证券代码': '股票代码',
+        '证券名称': '股票简称'
+    })
+    industry_store.replace_profiles(df[['股票代码', '股票简称', '一级行业', '二级行业', '三级行业', '公司简介']].dropna())
+    companies_df = industry_store.load_profiles()
 
 # 提取需要的列并转换为字典
-companies = df[['股票代码', '股票简称', '一级行业', '二级行业', '三级行业', '公司简介']].dropna().to_dict('records')
+companies = companies_df.to_dict('records')
+
+# 所有行业的唯一值（格式为 一级行业-二级行业-三级行业），只算一次
+all_industries = sorted(set(
+    f"{c['一级行业']}-{c['二级行业']}-{c['三级行业']}" for c in companies
+))
 
 def generate_question(companies):
     # 随机选择一家公司
@@ -19,11 +32,8 @@ def generate_question(companies):
     correct_industry = f"{current_company['一级行业']}-{current_company['二级行业']}-{current_company['三级行业']}"
     company_intro = current_company['公司简介']
 
-    # 收集所有其他行业的唯一值（格式为 一级行业-二级行业-三级行业）
-    other_industries = list(set(
-        [f"{c['一级行业']}-{c['二级行业']}-{c['三级行业']}" 
-         for c in companies if f"{c['一级行业']}-{c['二级行业']}-{c['三级行业']}" != correct_industry]
-    ))
+    # 其他行业
+    other_industries = [industry for industry in all_industries if industry != correct_industry]
     
     # 随机选择3个不重复的错误选项
     wrong_choices = random.sample(other_industries, 3) if len(other_industries) >= 3 else []
@@ -1,50 +1,53 @@
-import akshare as ak
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
-
-# 获取沪深300指数成分股
-def get_hs300_components():
-    hs300 = ak.index_stock_cons(symbol="000300")  # 沪深300
-    print(hs300)
-    return hs300['品种代码'].tolist()
-
-# 获取个股的历史数据
-def get_stock_data(stock_code, start_date, end_date):
-    try:
-        df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=end_date, adjust="hfq")
-        if df.empty:
-            return None
-        df = df[['日期', '收盘', '开盘', '最高', '最低', '涨跌幅']]  # 选取需要的列
-        df.columns = ['date', 'close', 'open', 'high', 'low', 'pct_chg']
-        df['date'] = pd.to_datetime(df['date'])
-        print(f"{stock_code} is done")
-        return stock_code, df
-    except Exception as e:
-        print(f"Error processing stock {stock_code}: {e}")
-        return stock_code, None
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.constituents import constituent_store
+from common.panel import load_calendar_panel
+from common.snapshot import lookup, read_snapshot
+from common.tradecal import get_calendar
+
+# 获取回测区间内出现过的沪深300指数成分股（本地缓存的成分股历史，按生效日期区间查询）
+def get_hs300_components(start_date, end_date):
+    components = constituent_store.union("000300", start_date, end_date)  # 沪深300
+    print(f"沪深300 在 {start_date} ~ {end_date} 内的成分股共 {len(components)} 只")
+    return components
+
+# 最新一个交易日的候选股：前一交易日下跌 -9% 且当日没涨，只读两天的全市场快照，不逐只请求历史行情
+def latest_candidates(components, date):
+    calendar = get_calendar()
+    t1_date = calendar.prev(date)
+    t_date = calendar.prev(t1_date, inclusive=False)
+    t_snapshot, t1_snapshot = read_snapshot(t_date), read_snapshot(t1_date)
+    if t_snapshot is None or t1_snapshot is None:
+        print(f"缺少 {t_date.date()} 或 {t1_date.date()} 的快照，先运行 python -m common.snapshot")
+        return []
+    t_pos, t1_pos = lookup(t_snapshot, components), lookup(t1_snapshot, components)
+    mask = (t_pos >= 0) & (t1_pos >= 0) & (t_snapshot['pct_chg'][t_pos] <= -9) & (t1_snapshot['pct_chg'][t1_pos] <= 0)
+    return [symbol for symbol, m in zip(components, mask) if m]
 
 # 回测策略
-def backtest_hs300(start_date, end_date, initial_balance):
-    components = get_hs300_components()
-    all_data = {}
-
-    # 多线程下载所有股票的数据
-    with ThreadPoolExecutor(max_workers=32) as executor:
-        results = executor.map(lambda stock: get_stock_data(stock, start_date, end_date), components)
-        for stock, data in results:
-            if data is not None:
-                all_data[stock] = data
-
-    # 提取所有股票的实际交易日期，取交集
-    trade_dates = set()
-    for data in all_data.values():
-        trade_dates.update(data['date'])
-    trade_dates = sorted(list(trade_dates))  # 转换为排序列表
+def backtest_hs300(start_date, end_date, initial_balance, components=None):
+    components = components or get_hs300_components(start_date, end_date)
+
+    # 多线程读取所有股票的数据，按交易日历对齐成 日期 × 股票 面板
+    panel = load_calendar_panel(components, start_date, end_date, adjust="hfq", fields=("close", "pct_chg"), max_workers=32)
+    trade_dates = panel.dates
+    symbols = panel.symbols
+    close = panel["close"]
+    pct_chg = panel["pct_chg"]
+
+    # t 日下跌 -9% 且 t+1 日没涨的股票，下标 [i, j] 对应第 i 个交易日、第 j 只股票；停牌日为 NaN，比较结果为 False
+    candidate_mask = (pct_chg[:-1] <= -9) & (pct_chg[1:] <= 0)
+    # 只选 t 日是沪深300成分股的股票。成分股来自本地积累的快照和 record 补录的历史调样，
+    # 积累的快照或调整记录越多，用今天的成分股回测过去带来的幸存者偏差越小；
+    # 只有一份快照时更早的日期都用这份（今天的）名单近似，这个掩码全为 True，偏差仍然存在
+    candidate_mask &= constituent_store.mask("000300", trade_dates[:-1], symbols)
 
     # 回测变量
     balance = initial_balance
-    holdings = {}  # 当前持仓
+    holdings = {}  # 当前持仓，股票下标 -> 持仓
     trade_log = []  # 交易记录
     transaction_fee_rate = 0.001  # 交易费用千分之一
 
@@ -54,64 +57,55 @@ def backtest_hs300(start_date, end_date, initial_balance):
 
         print(f"Date: {t_date.date()} | Starting Balance: {balance:.2f}")
 
-        # 获取 t 日下跌 -9%的股票, 且t+1日没涨
-        candidates = []
-        for stock, data in all_data.items():
-            row = data[data['date'] == t_date]
-            t1_row = data[data['date'] == t1_date]  # 获取 t+1 日数据
-            if not row.empty and row.iloc[0]['pct_chg'] <= -9:
-                if not t1_row.empty and t1_row.iloc[0]['pct_chg'] <= 0:
-                    print(f"{stock} on {t_date.date()} is between -6-9%")
-                    candidates.append(stock)
+        candidates = np.flatnonzero(candidate_mask[i])
+        for j in candidates:
+            print(f"{symbols[j]} on {t_date.date()} is between -6-9%")
 
         # 在 t+2 日卖出持仓
-        for stock, holding in list(holdings.items()):
-            sell_data = all_data[stock][all_data[stock]['date'] == t1_date]
-            if not sell_data.empty:
-                sell_price = sell_data.iloc[0]['close']
+        for j, holding in holdings.items():
+            sell_price = close[i + 1, j]
+            if not np.isnan(sell_price):
                 sell_amount = holding['shares'] * sell_price
                 sell_fee = sell_amount * transaction_fee_rate
                 balance += sell_amount - sell_fee
                 trade_log.append({
                     'date': t1_date,
-                    'stock': stock,
+                    'stock': symbols[j],
                     'action': 'sell',
                     'price': sell_price,
                     'shares': holding['shares'],
                     'fee': sell_fee
                 })
-                print(f"Sold {holding['shares']} shares of {stock} at {sell_price:.2f} on {t1_date.date()}, Fee: {sell_fee:.2f}")
+                print(f"Sold {holding['shares']} shares of {symbols[j]} at {sell_price:.2f} on {t1_date.date()}, Fee: {sell_fee:.2f}")
 
         holdings = {}
 
         # 在 t+1 日买入t日下跌8%且t+1日低收或平收的股票，控制仓位，个股最高25%
-        if candidates:
+        if len(candidates):
             equal_allocation = balance / len(candidates)
             if equal_allocation >= balance / 4:
                 equal_allocation = balance / 4
-            for stock in candidates:
-                buy_data0 = all_data[stock][all_data[stock]['date'] == t_date]
-                buy_data = all_data[stock][all_data[stock]['date'] == t1_date]
-                if not buy_data.empty:
-                    price0 = buy_data0.iloc[0]['close']
-                    buy_price = buy_data.iloc[0]['close']
-                    shares = equal_allocation // buy_price
-                    if buy_price > price0:
-                        shares = 0
-                    buy_amount = shares * buy_price
-                    buy_fee = buy_amount * transaction_fee_rate
-                    if shares > 0:
-                        holdings[stock] = {'shares': shares, 'buy_price': buy_price}
-                        balance -= buy_amount + buy_fee
-                        trade_log.append({
-                            'date': t1_date,
-                            'stock': stock,
-                            'action': 'buy',
-                            'price': buy_price,
-                            'shares': shares,
-                            'fee': buy_fee
-                        })
-                        print(f"Bought {shares} shares of {stock} at {buy_price:.2f} on {t1_date.date()}, Fee: {buy_fee:.2f}")
+            for j in candidates:
+                buy_price = close[i + 1, j]
+                if np.isnan(buy_price):
+                    continue
+                shares = equal_allocation // buy_price
+                if buy_price > close[i, j]:
+                    shares = 0
+                buy_amount = shares * buy_price
+                buy_fee = buy_amount * transaction_fee_rate
+                if shares > 0:
+                    holdings[j] = {'shares': shares, 'buy_price': buy_price}
+                    balance -= buy_amount + buy_fee
+                    trade_log.append({
+                        'date': t1_date,
+                        'stock': symbols[j],
+                        'action': 'buy',
+                        'price': buy_price,
+                        'shares': shares,
+                        'fee': buy_fee
+                    })
+                    print(f"Bought {shares} shares of {symbols[j]} at {buy_price:.2f} on {t1_date.date()}, Fee: {buy_fee:.2f}")
 
     return pd.DataFrame(trade_log), balance
 
@@ -121,9 +115,12 @@ if __name__ == "__main__":
     end_date = "20241201"  # 回测结束日期
     initial_balance = 1000000  # 初始资金
 
-    trade_log, final_balance = backtest_hs300(start_date, end_date, initial_balance)
+    components = get_hs300_components(start_date, end_date)
+    trade_log, final_balance = backtest_hs300(start_date, end_date, initial_balance, components)
     print(f"Final Balance: {final_balance:.2f}")
     print(f"Total Trades: {len(trade_log)}")
     print(trade_log)
+
+    print(f"截至 {end_date} 的候选股票: {latest_candidates(constituent_store.members('000300', end_date), end_date)}")
     
 
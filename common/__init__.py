@@ -0,0 +1,5 @@
+"""
+各策略脚本共用的数据访问与计算模块。
+
+脚本位于各自的策略目录下，通过把项目根目录加入 sys.path 后 `from common.xxx import ...` 使用。
+"""
@@ -0,0 +1,184 @@
+"""
+复权因子仓库。
+
+每只股票只在本地保存一份不复权日线和一张后复权因子表（新浪 `stock_zh_a_daily(adjust="hfq-factor")`），
+前复权 / 后复权日线在读取时用因子向量化相乘得到：
+
+    后复权价 = 不复权价 × 当日后复权因子
+    前复权价 = 不复权价 × 当日后复权因子 / 最新后复权因子
+
+同一只股票的 qfq / hfq / 不复权请求只需要一份上游行情，几个判断条件用到的复权口径也始终一致。
+因子表记录拉取日期，读取的行情超出这个日期时（期间可能发生了新的除权除息）重新拉取因子表。
+"""
+import os
+import threading
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.barstore import COVERAGE_KEY, DATE_COLUMN, STORE_DIR, last_settled_date, stock_store, to_timestamp
+from common.fetcher import call_with_retry
+from common.schema import PRICE_DTYPE
+from common.tradecal import get_calendar
+
+FACTOR_COLUMN = "hfq_factor"
+PRICE_COLUMNS = ["开盘", "收盘", "最高", "最低"]
+
+
+def sina_symbol(symbol: str) -> str:
+    """'600519' -> 'sh600519'，新浪接口需要带交易所前缀的代码。"""
+    if symbol.startswith(("6", "9")):
+        return f"sh{symbol}"
+    if symbol.startswith(("4", "8")):
+        return f"bj{symbol}"
+    return f"sz{symbol}"
+
+
+def plain_symbol(symbol: str) -> str:
+    """'sh600751' -> '600751'，仓库里统一用不带交易所前缀的代码。"""
+    return symbol[2:] if symbol[:2] in ("sh", "sz", "bj") else symbol
+
+
+class FactorStore:
+    """
+    按股票保存后复权因子表：<root>/factor/<symbol>.parquet，元数据里记录拉取日期。
+
+    :param root: 仓库根目录
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def path(self, symbol: str) -> str:
+        return os.path.join(self.root, "factor", f"{symbol}.parquet")
+
+    def _lock(self, key) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _fetch(self, symbol: str) -> pd.DataFrame:
+        df = call_with_retry("stock_zh_a_daily", ak.stock_zh_a_daily, symbol=sina_symbol(symbol), adjust="hfq-factor")
+        df = pd.DataFrame({
+            DATE_COLUMN: pd.to_datetime(df["date"]),
+            FACTOR_COLUMN: pd.to_numeric(df[FACTOR_COLUMN]),
+        })
+        return df.sort_values(DATE_COLUMN).reset_index(drop=True)
+
+    def get(self, symbol: str, end_date) -> pd.DataFrame:
+        """
+        读取因子表，保证覆盖到 end_date（不晚于最近一个收盘结算日）。
+
+        :param symbol: 股票代码
+        :param end_date: 需要用到因子的最后一天
+        :return: 按日期升序的 DataFrame（日期, hfq_factor），每行表示从该日起生效的因子
+        """
+        path = self.path(symbol)
+        needed = min(to_timestamp(end_date), last_settled_date())
+        with self._lock(path):
+            if os.path.exists(path):
+                table = pq.read_table(path)
+                fetched = to_timestamp((table.schema.metadata or {}).get(COVERAGE_KEY, b"19700101").decode())
+                if fetched >= needed:
+                    return table.to_pandas()
+
+            df = self._fetch(symbol)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), COVERAGE_KEY: f"{last_settled_date():%Y%m%d}".encode()})
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, path)
+            return df
+
+
+factor_store = FactorStore()
+
+
+def factor_at(dates, factors: pd.DataFrame, adjust: str) -> np.ndarray:
+    """
+    每个时间点适用的复权系数：取不晚于它的最后一个因子，前复权再除以最新因子。
+
+    :param dates: datetime64[ns] 数组，可以是日期也可以是分钟时间戳
+    :param factors: FactorStore.get 返回的因子表
+    :param adjust: 'qfq' / 'hfq'
+    :return: 与 dates 等长的系数数组
+    """
+    factor_dates = factors[DATE_COLUMN].to_numpy(dtype="datetime64[ns]")
+    factor_values = factors[FACTOR_COLUMN].to_numpy(dtype=float)
+    pos = np.maximum(np.searchsorted(factor_dates, dates, side="right") - 1, 0)
+    factor = factor_values[pos]
+    if adjust == "qfq":
+        return factor / factor_values[-1]
+    if adjust != "hfq":
+        raise ValueError(f"未知的复权方式: {adjust}")
+    return factor
+
+
+def adjust_bars(raw: pd.DataFrame, factors: pd.DataFrame, adjust: str) -> pd.DataFrame:
+    """
+    用因子表把不复权日线换算成复权日线。
+
+    价格列按因子相乘；涨跌额 / 涨跌幅 / 振幅 按复权后的收盘价重新计算（第一行沿用上游的值），
+    成交量、成交额、换手率不受复权影响。
+    :param raw: 不复权日线
+    :param factors: FactorStore.get 返回的因子表
+    :param adjust: 'qfq' / 'hfq'
+    :return: 复权日线
+    """
+    if raw.empty or not adjust:
+        return raw
+    factor = factor_at(raw[DATE_COLUMN].to_numpy(dtype="datetime64[ns]"), factors, adjust)
+
+    df = raw.copy()
+    prices = {col: df[col].to_numpy(dtype=float) * factor for col in PRICE_COLUMNS if col in df}
+    close = prices["收盘"]
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    derived = {}
+    if "涨跌额" in df:
+        derived["涨跌额"] = np.round(close - prev_close, 2)
+    if "涨跌幅" in df:
+        derived["涨跌幅"] = np.round((close / prev_close - 1) * 100, 2)
+    if "振幅" in df and "最高" in df and "最低" in df:
+        derived["振幅"] = np.round((prices["最高"] - prices["最低"]) / prev_close * 100, 2)
+    for col, values in derived.items():
+        values[0] = df[col].iloc[0]
+    # 整列替换，保持 common.schema 规定的 float32
+    return df.assign(**{col: values.astype(PRICE_DTYPE) for col, values in {**prices, **derived}.items()})
+
+
+def adjusted_hist(symbol: str, start_date="19700101", end_date="20500101", adjust: str = "hfq", live: bool = False) -> pd.DataFrame:
+    """
+    读取复权日线：不复权日线来自行情仓库，复权因子来自因子仓库。
+
+    :param symbol: 股票代码
+    :param start_date: 开始日期
+    :param end_date: 结束日期
+    :param adjust: '' / 'qfq' / 'hfq'
+    :param live: 是否补拉尚未收盘结算的当天 K 线
+    :return: 与 ak.stock_zh_a_hist 同样列的 DataFrame
+    """
+    if not adjust:
+        return stock_store.get(symbol, "daily", start_date, end_date, "", live)
+    # 多读 start 之前的最后一根 K 线：第一行的涨跌幅 / 振幅也要用复权后的前收盘价重新计算，
+    # 否则区间第一天恰好是除权日时会沿用上游不复权的值
+    start = to_timestamp(start_date)
+    try:
+        lead = get_calendar().prev(start, inclusive=False)
+    except ValueError:
+        lead = start
+    raw = stock_store.get(symbol, "daily", lead, end_date, "", live)
+    if raw.empty:
+        return raw
+    if lead < start and raw[DATE_COLUMN].iloc[0] >= start:
+        # 前一个交易日停牌：往前找最后一根实际存在的 K 线（只有上市首日之前才找不到）
+        before = stock_store.get(symbol, "daily", "19700101", lead, "")
+        if not before.empty:
+            raw = pd.concat([before.tail(1), raw], ignore_index=True)
+    factors = factor_store.get(symbol, raw[DATE_COLUMN].iloc[-1])
+    df = adjust_bars(raw, factors, adjust)
+    return df[df[DATE_COLUMN] >= start].reset_index(drop=True)
@@ -0,0 +1,222 @@
+"""
+本地日线行情仓库。
+
+按 (品种类型, period, adjust, symbol) 分区，每个分区保存为一个 Parquet 文件，
+文件元数据里记录已经从上游拉取过的连续日期区间（coverage）。
+读取时直接从本地切片；请求区间超出 coverage 的部分才向上游补拉，
+所以已经缓存过的行情不会再产生任何网络请求。
+
+用法与 akshare 保持一致，脚本里只需要把 `ak.stock_zh_a_hist(...)` 换成 `stock_zh_a_hist(...)`：
+
+    from common.barstore import stock_zh_a_hist
+    df = stock_zh_a_hist(symbol="002780", period="daily", start_date="20240101", end_date="20240630", adjust="")
+"""
+import datetime
+import os
+import threading
+
+import akshare as ak
+import pandas as pd
+import pyarrow.parquet as pq
+
+from common.fetcher import call_with_retry
+from common.schema import DATE_COLUMN, bars_from_arrow, bars_to_arrow, compact_bars
+
+# 项目根目录，默认的本地仓库放在 datas/store 下，可以用环境变量 QUANT1_STORE 改到别处
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_DIR = os.environ.get("QUANT1_STORE", os.path.join(ROOT_DIR, "datas", "store"))
+
+COVERAGE_KEY = b"quant1.coverage"
+
+# 收盘后多久认为当天的日线已经定型
+MARKET_SETTLED = datetime.time(15, 30)
+
+
+def to_timestamp(date) -> pd.Timestamp:
+    """
+    把 '20240101' / '2024-01-01' / date / Timestamp 统一转换为不带时分秒的 Timestamp。
+    """
+    return pd.Timestamp(date).normalize()
+
+
+def last_settled_date() -> pd.Timestamp:
+    """
+    返回最近一个行情已经定型的自然日：收盘结算之前取昨天，之后取今天。
+    盘中拉到的当天 K 线还会变化，不能写进缓存的 coverage。
+    """
+    now = datetime.datetime.now()
+    today = pd.Timestamp(now.date())
+    return today if now.time() >= MARKET_SETTLED else today - pd.Timedelta(days=1)
+
+
+class BarStore:
+    """
+    一个上游接口对应一个 BarStore，例如个股日线 `stock_zh_a_hist`、指数日线 `index_zh_a_hist`。
+
+    :param kind: 分区目录名（'stock' / 'index'）
+    :param upstream: akshare 上的接口函数名，调用时才从 ak 上取，便于录制回放时替换
+    :param adjustable: 上游接口是否支持 adjust 参数
+    :param root: 仓库根目录
+    """
+
+    def __init__(self, kind: str, upstream: str, adjustable: bool = True, root: str = STORE_DIR):
+        self.kind = kind
+        self.upstream = upstream
+        self.adjustable = adjustable
+        self.root = root
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    # ---------- 路径与锁 ----------
+    def path(self, symbol: str, period: str, adjust: str) -> str:
+        """分区文件路径：<root>/<kind>/<period>/<adjust>/<symbol>.parquet，不复权记作 raw。"""
+        return os.path.join(self.root, self.kind, period, adjust or "raw", f"{symbol}.parquet")
+
+    def _lock(self, key) -> threading.Lock:
+        # 同一个分区的读写串行，不同分区可以被线程池并发处理
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    # ---------- 磁盘读写 ----------
+    def _load(self, path: str):
+        """
+        读取分区文件。
+
+        :return: (DataFrame, coverage)，coverage 为 (起始日, 结束日) 或 None（尚未缓存）
+        """
+        if not os.path.exists(path):
+            return None, None
+        table = pq.read_table(path)
+        meta = table.schema.metadata or {}
+        coverage = None
+        if COVERAGE_KEY in meta:
+            start, end = meta[COVERAGE_KEY].decode().split(",")
+            coverage = (to_timestamp(start), to_timestamp(end))
+        return bars_from_arrow(table), coverage
+
+    def _save(self, path: str, df: pd.DataFrame, coverage) -> None:
+        """先写临时文件再替换，避免并发读到写了一半的文件。"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = bars_to_arrow(df)
+        meta = dict(table.schema.metadata or {})
+        meta[COVERAGE_KEY] = f"{coverage[0]:%Y%m%d},{coverage[1]:%Y%m%d}".encode()
+        table = table.replace_schema_metadata(meta)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+    # ---------- 上游 ----------
+    def _fetch(self, symbol: str, period: str, start: pd.Timestamp, end: pd.Timestamp, adjust: str) -> pd.DataFrame:
+        """向上游拉取 [start, end] 的行情（按接口限速，失败重试），各列统一转换为 common.schema 规定的紧凑类型。"""
+        kwargs = dict(symbol=symbol, period=period, start_date=f"{start:%Y%m%d}", end_date=f"{end:%Y%m%d}")
+        if self.adjustable:
+            kwargs["adjust"] = adjust
+        df = call_with_retry(self.upstream, getattr(ak, self.upstream), **kwargs)
+        if df is None or df.empty:
+            return pd.DataFrame()
+        return compact_bars(df)
+
+    @staticmethod
+    def _same_bar(old: pd.DataFrame, new: pd.DataFrame, date: pd.Timestamp) -> bool:
+        """
+        比较新旧两份数据在重叠日 date 上的收盘价。
+        复权价会在除权除息后整体平移，对不上说明本地缓存的复权基准已经过期。
+        """
+        old_close = old.loc[old[DATE_COLUMN] == date, "收盘"]
+        new_close = new.loc[new[DATE_COLUMN] == date, "收盘"] if not new.empty else new
+        if old_close.empty or new_close.empty:
+            return True
+        return abs(float(old_close.iloc[0]) - float(new_close.iloc[0])) < 1e-6
+
+    # ---------- 对外接口 ----------
+    def get(self, symbol: str, period: str = "daily", start_date="19700101", end_date="20500101", adjust: str = "", live: bool = False) -> pd.DataFrame:
+        """
+        读取 [start_date, end_date] 的行情，返回列与 akshare 上游一致，类型见 common.schema（日期列为 datetime64，价格列为 float32）。
+
+        :param symbol: 代码，如 '600519'
+        :param period: 'daily' / 'weekly' / 'monthly'
+        :param start_date: 开始日期
+        :param end_date: 结束日期
+        :param adjust: '' / 'qfq' / 'hfq'
+        :param live: 是否补拉尚未收盘结算的当天 K 线（不写入缓存，每次都会请求上游）
+        :return: 行情 DataFrame
+        """
+        adjust = adjust if self.adjustable else ""
+        start = to_timestamp(start_date)
+        end = to_timestamp(end_date)
+        settled = min(end, last_settled_date())
+
+        result = pd.DataFrame()
+        if start <= settled:
+            path = self.path(symbol, period, adjust)
+            with self._lock(path):
+                df, coverage = self._load(path)
+                new_df, new_coverage = self._extend(symbol, period, adjust, df, coverage, start, settled)
+                if new_coverage != coverage:
+                    self._save(path, new_df, new_coverage)
+            if not new_df.empty:
+                result = new_df[(new_df[DATE_COLUMN] >= start) & (new_df[DATE_COLUMN] <= settled)]
+
+        # 盘中的当天 K 线还会变化，只在显式要求时单独补拉
+        if live and end > settled:
+            tail = self._fetch(symbol, period, max(start, settled + pd.Timedelta(days=1)), end, adjust)
+            if not tail.empty:
+                result = pd.concat([result, tail], ignore_index=True)
+        return result.reset_index(drop=True)
+
+    def _extend(self, symbol, period, adjust, df, coverage, start, end):
+        """
+        把本地缓存扩展到覆盖 [start, end]，只拉取缺失的两端。
+
+        补拉时和已有数据重叠一根 K 线：一方面周线/月线最后一根在上次拉取时可能尚未走完，
+        需要用新数据替换；另一方面复权数据如果在重叠日对不上，就整体重新拉取。
+        :return: (新的 DataFrame, 新的 coverage)；coverage 不变说明无需写回磁盘
+        """
+        if coverage is None:
+            return self._fetch(symbol, period, start, end, adjust), (start, end)
+
+        lo, hi = coverage
+        if start >= lo and end <= hi:
+            return df, coverage
+
+        new_lo, new_hi = min(lo, start), max(hi, end)
+        if end > hi:
+            # 向后补：从最后一根已缓存的 K 线开始拉
+            last = df[DATE_COLUMN].max() if not df.empty else hi + pd.Timedelta(days=1)
+            fresh = self._fetch(symbol, period, min(last, hi + pd.Timedelta(days=1)), end, adjust)
+            if adjust and not df.empty and not self._same_bar(df, fresh, last):
+                return self._fetch(symbol, period, new_lo, new_hi, adjust), (new_lo, new_hi)
+            if not fresh.empty:
+                df = pd.concat([df[df[DATE_COLUMN] < last], fresh], ignore_index=True) if not df.empty else fresh
+        if start < lo:
+            # 向前补：拉到第一根已缓存的 K 线为止
+            first = df[DATE_COLUMN].min() if not df.empty else lo - pd.Timedelta(days=1)
+            fresh = self._fetch(symbol, period, start, max(first, lo - pd.Timedelta(days=1)), adjust)
+            if adjust and not df.empty and not self._same_bar(df, fresh, first):
+                return self._fetch(symbol, period, new_lo, new_hi, adjust), (new_lo, new_hi)
+            if not fresh.empty:
+                df = pd.concat([fresh[fresh[DATE_COLUMN] < first], df], ignore_index=True) if not df.empty else fresh
+
+        df = df.drop_duplicates(subset=DATE_COLUMN, keep="last").sort_values(DATE_COLUMN).reset_index(drop=True)
+        return df, (new_lo, new_hi)
+
+
+# 默认仓库实例
+stock_store = BarStore("stock", "stock_zh_a_hist")
+index_store = BarStore("index", "index_zh_a_hist", adjustable=False)
+
+
+def stock_zh_a_hist(symbol: str = "000001", period: str = "daily", start_date="19700101", end_date="20500101", adjust: str = "", live: bool = False) -> pd.DataFrame:
+    """
+    与 ak.stock_zh_a_hist 参数相同，优先读本地仓库。
+    复权日线不单独向上游请求，由不复权日线和复权因子在本地换算，见 common.adjfactor。
+    """
+    if adjust and period == "daily":
+        from common.adjfactor import adjusted_hist  # adjfactor 依赖本模块，放在这里导入
+        return adjusted_hist(symbol, start_date, end_date, adjust, live)
+    return stock_store.get(symbol, period, start_date, end_date, adjust, live)
+
+
+def index_zh_a_hist(symbol: str = "000300", period: str = "daily", start_date="19700101", end_date="20500101", live: bool = False) -> pd.DataFrame:
+    """与 ak.index_zh_a_hist 参数相同，优先读本地仓库。"""
+    return index_store.get(symbol, period, start_date, end_date, live=live)
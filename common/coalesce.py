@@ -0,0 +1,78 @@
+"""
+单次运行内的请求合并层。
+
+筛选脚本对同一只股票会在多个判断函数里重复取行情，线程池里也可能同时发出完全相同的请求。
+WindowCache 为每个 (symbol, adjust) 只保留一个日期窗口：
+请求落在窗口内直接切片返回；超出窗口时取并集重新拉一次；
+同一个 key 正在拉取时，其它线程等待同一个 Future，而不是各自再发请求。
+"""
+import threading
+from concurrent.futures import Future
+
+import pandas as pd
+
+from common.barstore import DATE_COLUMN, stock_zh_a_hist, to_timestamp
+
+
+def fetch_stock_window(symbol: str, start: pd.Timestamp, end: pd.Timestamp, adjust: str) -> pd.DataFrame:
+    """默认的取数函数：从本地行情仓库读取个股日线。"""
+    return stock_zh_a_hist(symbol=symbol, period="daily", start_date=start, end_date=end, adjust=adjust)
+
+
+class WindowCache:
+    """
+    :param fetch: 取数函数 fetch(symbol, start, end, adjust) -> DataFrame，返回的数据需包含日期列
+    """
+
+    def __init__(self, fetch=fetch_stock_window):
+        self.fetch = fetch
+        self._lock = threading.Lock()
+        self._windows = {}  # (symbol, adjust) -> (start, end, DataFrame)
+        self._inflight = {}  # (symbol, adjust) -> Future
+        self.fetch_count = 0  # 实际调用 fetch 的次数，便于核对去重效果
+
+    def get(self, symbol: str, start_date, end_date, adjust: str = "") -> pd.DataFrame:
+        """
+        读取 [start_date, end_date] 的行情切片。
+
+        :param symbol: 股票代码
+        :param start_date: 开始日期
+        :param end_date: 结束日期
+        :param adjust: 复权方式
+        :return: 行情 DataFrame（共享缓存中的数据，调用方不要原地修改）
+        """
+        start, end = to_timestamp(start_date), to_timestamp(end_date)
+        key = (symbol, adjust)
+        while True:
+            with self._lock:
+                window = self._windows.get(key)
+                if window is not None and window[0] <= start and end <= window[1]:
+                    df = window[2]
+                    if df.empty:
+                        return df
+                    return df[(df[DATE_COLUMN] >= start) & (df[DATE_COLUMN] <= end)]
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    self._inflight[key] = future
+                    lo = start if window is None else min(start, window[0])
+                    hi = end if window is None else max(end, window[1])
+
+            if not owner:
+                # 等待正在进行的同 key 请求；它失败时异常会在这里抛出
+                future.result()
+                continue
+
+            try:
+                df = self.fetch(symbol, lo, hi, adjust)
+            except BaseException as e:
+                with self._lock:
+                    del self._inflight[key]
+                future.set_exception(e)
+                raise
+            with self._lock:
+                self._windows[key] = (lo, hi, df)
+                self.fetch_count += 1
+                del self._inflight[key]
+            future.set_result(None)
@@ -0,0 +1,193 @@
+"""
+指数成分股历史。
+
+中证指数官网接口 `index_stock_cons_csindex` 只能拿到当前的成分股，直接拿来回测历史区间会有幸存者偏差：
+2023 年的回测用到的是今天的成分股。这里把每次下载到的成分股按 (指数, 生效日期) 记成一个快照，
+第 k 个快照在 [生效日期_k, 生效日期_{k+1}) 内有效，查询某一天的成分股就是在生效日期上二分查找。
+也可以用 record 手工补录历史调样（例如中证指数公司的调样公告）。
+
+早于第一份快照的日期只能用最早的快照近似，第一次遇到时会提示。
+
+    from common.constituents import constituent_store
+    constituent_store.members("000300", "2023-06-30")                 # 当天的成分股
+    symbols = constituent_store.union("000300", "20230101", "20241231")  # 区间内出现过的全部成分股
+    mask = constituent_store.mask("000300", panel.dates, panel.symbols)  # 日期 × 股票 是否为成分股
+"""
+import os
+import threading
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.barstore import COVERAGE_KEY, STORE_DIR, last_settled_date, to_timestamp
+from common.fetcher import call_with_retry
+
+DATE_COLUMN = "date"
+SYMBOL_COLUMN = "symbol"
+
+
+class ConstituentHistory:
+    """
+    一个指数的全部成分股快照。
+
+    :param dates: 升序的生效日期
+    :param symbols: 出现过的全部成分股代码（升序）
+    :param matrix: 形状为 (len(dates), len(symbols)) 的布尔矩阵，第 k 行是第 k 个快照的成分股
+    """
+
+    def __init__(self, dates, symbols, matrix: np.ndarray):
+        self.dates = pd.DatetimeIndex(dates)
+        self.symbols = np.asarray(symbols)
+        self.matrix = matrix
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "ConstituentHistory":
+        """由 (date, symbol) 长表构造。"""
+        dates, rows = np.unique(df[DATE_COLUMN].to_numpy(dtype="datetime64[ns]"), return_inverse=True)
+        symbols, cols = np.unique(df[SYMBOL_COLUMN].astype(str).to_numpy(), return_inverse=True)
+        matrix = np.zeros((len(dates), len(symbols)), dtype=bool)
+        matrix[rows, cols] = True
+        return cls(dates, symbols, matrix)
+
+    def rows(self, dates) -> np.ndarray:
+        """每个日期适用的快照行号：不晚于它的最后一个快照，早于第一个快照时取第一个。"""
+        pos = self.dates.searchsorted(pd.DatetimeIndex(dates), side="right") - 1
+        return np.maximum(pos, 0)
+
+    def members(self, date) -> list:
+        return self.symbols[self.matrix[self.rows([to_timestamp(date)])[0]]].tolist()
+
+    def union(self, start, end) -> list:
+        lo, hi = self.rows([to_timestamp(start), to_timestamp(end)])
+        return self.symbols[self.matrix[lo:hi + 1].any(axis=0)].tolist()
+
+    def mask(self, dates, symbols) -> np.ndarray:
+        cols = pd.Index(self.symbols).get_indexer([str(s) for s in symbols])
+        out = self.matrix[self.rows(dates)][:, np.maximum(cols, 0)]
+        out[:, cols < 0] = False
+        return out
+
+
+class ConstituentStore:
+    """
+    按指数保存成分股快照：<root>/constituents/<index>.parquet，长表 (date, symbol)，
+    元数据里记录最近一次下载的日期，同一天内不会重复下载。
+
+    :param root: 仓库根目录
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self._cache = {}
+        self._warned = set()
+        self._lock = threading.Lock()
+
+    def path(self, index: str) -> str:
+        return os.path.join(self.root, "constituents", f"{index}.parquet")
+
+    def _read(self, index: str):
+        """:return: (长表, 最近一次下载日期)，还没有缓存时为 (空表, None)"""
+        path = self.path(index)
+        if not os.path.exists(path):
+            return pd.DataFrame({DATE_COLUMN: pd.DatetimeIndex([]), SYMBOL_COLUMN: pd.Series([], dtype=str)}), None
+        table = pq.read_table(path)
+        fetched = (table.schema.metadata or {}).get(COVERAGE_KEY)
+        return table.to_pandas(), to_timestamp(fetched.decode()) if fetched else None
+
+    def _write(self, index: str, df: pd.DataFrame, fetched: pd.Timestamp) -> None:
+        path = self.path(index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df.sort_values([DATE_COLUMN, SYMBOL_COLUMN]), preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), COVERAGE_KEY: f"{fetched:%Y%m%d}".encode()})
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+    def record(self, index: str, date, symbols, fetched=None) -> None:
+        """
+        记录一个成分股快照。和前一个快照完全相同时不新增（成分股没变，原来的区间继续有效）。
+
+        :param index: 指数代码
+        :param date: 生效日期
+        :param symbols: 成分股代码
+        :param fetched: 下载日期，手工补录历史时不传
+        """
+        date = to_timestamp(date)
+        symbols = sorted({str(s) for s in symbols})
+        with self._lock:
+            df, last_fetched = self._read(index)
+            df = df[df[DATE_COLUMN] != date]
+            earlier = df[df[DATE_COLUMN] < date]
+            previous = sorted(earlier.loc[earlier[DATE_COLUMN] == earlier[DATE_COLUMN].max(), SYMBOL_COLUMN]) if not earlier.empty else None
+            if previous != symbols:
+                df = pd.concat([df, pd.DataFrame({DATE_COLUMN: date, SYMBOL_COLUMN: symbols})], ignore_index=True)
+            if fetched is not None:
+                last_fetched = max(last_fetched, to_timestamp(fetched)) if last_fetched is not None else to_timestamp(fetched)
+            self._write(index, df, last_fetched if last_fetched is not None else date)
+            self._cache.pop(index, None)
+
+    def refresh(self, index: str) -> None:
+        """下载当前成分股并记为一个快照，生效日期取接口返回的日期列（没有时取下载当天）。"""
+        df = call_with_retry("index_stock_cons_csindex", ak.index_stock_cons_csindex, symbol=index)
+        today = to_timestamp(pd.Timestamp.now())
+        date = to_timestamp(df['日期'].max()) if '日期' in df else today
+        self.record(index, date, df['成分券代码'].astype(str), fetched=today)
+
+    def history(self, index: str, date=None) -> ConstituentHistory:
+        """
+        读取指数的成分股历史。查询日期晚于最近一次下载、且今天还没有下载过时先下载一次当前成分股。
+
+        :param index: 指数代码
+        :param date: 需要查询的最晚日期，不传表示今天
+        """
+        needed = min(to_timestamp(date if date is not None else pd.Timestamp.now()), last_settled_date())
+        with self._lock:
+            df, fetched = self._read(index)
+        stale = fetched is None or fetched < needed
+        if stale:
+            try:
+                self.refresh(index)
+            except Exception as e:
+                if fetched is None:
+                    raise
+                print(f"指数 {index} 成分股更新失败，使用本地缓存: {e}")
+        with self._lock:
+            if stale or index not in self._cache:
+                self._cache[index] = ConstituentHistory.from_frame(self._read(index)[0])
+            return self._cache[index]
+
+    def _warn_before_first(self, history: ConstituentHistory, index: str, date) -> None:
+        """每个指数只提示一次。"""
+        if to_timestamp(date) < history.dates[0] and index not in self._warned:
+            self._warned.add(index)
+            print(f"指数 {index} 最早的成分股快照是 {history.dates[0]:%Y-%m-%d}，更早的日期用这份快照近似")
+
+    # ---------- 对外接口 ----------
+    def members(self, index: str, date) -> list:
+        """某一天的成分股代码列表。"""
+        history = self.history(index, date)
+        self._warn_before_first(history, index, date)
+        return history.members(date)
+
+    def union(self, index: str, start, end) -> list:
+        """[start, end] 内任意一天是成分股的全部代码，用作面板的股票轴。"""
+        history = self.history(index, end)
+        self._warn_before_first(history, index, start)
+        return history.union(start, end)
+
+    def mask(self, index: str, dates, symbols) -> np.ndarray:
+        """
+        :param dates: 日期序列
+        :param symbols: 股票代码序列
+        :return: 形状为 (len(dates), len(symbols)) 的布尔数组，[i, j] 表示第 j 只股票在第 i 天是否为成分股
+        """
+        dates = pd.DatetimeIndex(dates)
+        history = self.history(index, dates.max())
+        self._warn_before_first(history, index, dates.min())
+        return history.mask(dates, symbols)
+
+
+constituent_store = ConstituentStore()
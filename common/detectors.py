@@ -0,0 +1,198 @@
+"""
+选股条件检测器：N 日内创 M 日新高、连续 N 日下跌。
+
+两种用法：
+
+- 整段区间：对 dates × symbols 面板一次算出每一天、每只股票是否满足条件，
+  只需要扫一遍数据（见 common.indicators 的 rolling_max / streak）；
+- 逐日增量：每个交易日把全部股票当天的收盘价 / 涨跌幅作为一个数组传给 update，
+  每只股票 O(1)（均摊）得到当天的结果，不用再回头取 M 天的历史。
+
+停牌（NaN）的处理和逐只取数的 is_new_high / is_nday_minus 一致：条件只看最近 M（或 N）根有行情的 bar，
+停牌日跳过、沿用最近一个交易日的结果；这 M 根 bar 要在最近 lookback(M) 个交易日里凑齐，
+否则（上市不久或长期停牌）不满足条件。逐只取数按 lookback(M) 个交易日取数后 tail(M)，
+面板也要从 lookback(M) 个交易日以前开始加载。
+
+    from common.detectors import NewHighDetector, new_high_within
+    hits = new_high_within(panel['close'], 7, 100)       # 整段区间
+    detector = NewHighDetector(7, 100, len(symbols))
+    for row in panel['close']:
+        today = detector.update(row)                     # 逐日
+"""
+import numpy as np
+
+from common.indicators import rolling_max, streak
+
+# 最近 m 根有行情的 bar 最多往前找 LOOKBACK_RATIO * m 个交易日
+LOOKBACK_RATIO = 2
+
+
+def lookback(m: int) -> int:
+    """最近 m 根有行情的 bar 要在多少个交易日里凑齐，逐只取数和面板加载都按它往前取。"""
+    return LOOKBACK_RATIO * m
+
+
+# ---------- 整段区间 ----------
+def _on_traded_bars(x, m: int, window: int, func) -> np.ndarray:
+    """
+    把每列停牌（NaN）的行挤掉，对有行情的 bar 算 func，再放回原来的日期：停牌日沿用最近一根 bar 的结果；
+    最近 m 根 bar 没有在最近 window 个交易日里凑齐时为 False。
+
+    :param x: dates × symbols 的面板（也可以是一维序列）
+    :param func: 输入挤掉停牌后的面板（停牌行排在每列末尾），返回同形状的布尔数组
+    """
+    x = np.asarray(x, dtype=np.float64)
+    flat = x.ndim == 1
+    if flat:
+        x = x[:, None]
+    valid = ~np.isnan(x)
+    order = np.argsort(~valid, axis=0, kind="stable")  # 每列有行情的行按原顺序排在前面
+    hit = func(np.take_along_axis(x, order, axis=0))
+    k = np.cumsum(valid, axis=0) - 1  # 截至每一行最后一根 bar 挤掉停牌后的行号
+    result = np.take_along_axis(hit, np.maximum(k, 0), axis=0) & (k >= 0)
+    # 倒数第 m 根 bar 所在的日期要在最近 window 个交易日内
+    first = k - (m - 1)
+    start = np.take_along_axis(order, np.maximum(first, 0), axis=0)
+    result &= (first >= 0) & (np.arange(len(x))[:, None] - start < window)
+    return result[:, 0] if flat else result
+
+
+def new_high_within(close, n: int, m: int, window: int = None) -> np.ndarray:
+    """
+    最近 n 根 bar 的最高价等于最近 m 根 bar 的最高价（即 m 日新高出现在最近 n 天内），停牌日不算 bar。
+
+    :param close: dates × symbols 的价格面板（也可以是一维序列）
+    :param window: m 根 bar 最多往前找多少个交易日，默认 lookback(m)
+    :return: 同形状的布尔数组，window 个交易日里不足 m 根 bar 时为 False
+    """
+    def hit(packed):
+        with np.errstate(invalid="ignore"):
+            return rolling_max(packed, n) == rolling_max(packed, m)
+    return _on_traded_bars(close, m, window or lookback(m), hit)
+
+
+def down_streak(pct, n: int, window: int = None) -> np.ndarray:
+    """
+    最近 n 根 bar 的涨跌幅全部小于 0，停牌日不算 bar、也不中断连续下跌。
+
+    :param pct: dates × symbols 的涨跌幅面板
+    :param window: n 根 bar 最多往前找多少个交易日，默认 lookback(n)
+    :return: 同形状的布尔数组，window 个交易日里不足 n 根 bar 时为 False
+    """
+    def hit(packed):
+        with np.errstate(invalid="ignore"):
+            return streak(packed < 0) >= n
+    return _on_traded_bars(pct, n, window or lookback(n), hit)
+
+
+# ---------- 逐日增量 ----------
+class _BarWindow:
+    """
+    每只股票最近 m 根有行情的 bar 出现在第几个交易日（(股票数, m) 的环形数组），
+    用来判断这 m 根 bar 是否在最近 window 个交易日里凑齐。
+    """
+
+    def __init__(self, m: int, window: int, width: int):
+        self.m = m
+        self.window = window
+        self.t = 0
+        self.bars = np.zeros(width, dtype=np.int64)  # 有行情的 bar 数
+        self.days = np.zeros((width, m), dtype=np.int64)
+        self._rows = np.arange(width)
+
+    def update(self, valid) -> np.ndarray:
+        """
+        :param valid: 当天每只股票是否有行情
+        :return: 当天每只股票最近 m 根 bar 是否都在最近 window 个交易日内
+        """
+        t = self.t
+        self.t += 1
+        self.days[self._rows[valid], self.bars[valid] % self.m] = t
+        self.bars += valid
+        # 写入以后，倒数第 m 根 bar 在 bars % m 的位置
+        first = self.days[self._rows, self.bars % self.m]
+        return (self.bars >= self.m) & (t - first < self.window)
+
+
+class NewHighDetector:
+    """
+    每只股票一个单调队列，保存最近 m 根 bar 里可能成为最高价的 (bar 序号, 价格)，价格从队头到队尾递减；
+    相等的价格只保留最新的一个，所以队头就是 m 日最高价最近一次出现的位置，
+    它落在最近 n 根 bar 内就说明 n 日最高价等于 m 日最高价。停牌日不算 bar，沿用前一天的结果。
+    全部股票的队列放在 (股票数, m) 的环形数组里，入队出队对所有股票一起做。
+
+    :param n: 最近 n 根 bar
+    :param m: m 根 bar 以来的新高
+    :param width: 股票数
+    :param window: m 根 bar 最多往前找多少个交易日，默认 lookback(m)
+    """
+
+    def __init__(self, n: int, m: int, width: int, window: int = None):
+        self.n = n
+        self.m = m
+        self.index = np.zeros((width, m), dtype=np.int64)
+        self.value = np.zeros((width, m))
+        self.head = np.zeros(width, dtype=np.int64)  # 队头、队尾是一直递增的计数，取模后才是数组下标
+        self.tail = np.zeros(width, dtype=np.int64)
+        self.hit = np.zeros(width, dtype=bool)  # 最近一根 bar 上的结果
+        self.bars = _BarWindow(m, window or lookback(m), width)
+        self._rows = np.arange(width)
+
+    def update(self, close) -> np.ndarray:
+        """
+        :param close: 当天全部股票的收盘价，停牌为 NaN
+        :return: 当天每只股票是否在最近 n 根 bar 内创了 m 日新高
+        """
+        close = np.asarray(close, dtype=np.float64)
+        valid = ~np.isnan(close)
+        b = self.bars.bars  # 今天这根 bar 的序号（只对有行情的股票有意义）
+
+        # 队头过期：序号 <= b - m 的已经不在最近 m 根 bar 里
+        while True:
+            expired = valid & (self.tail > self.head) & (self.index[self._rows, self.head % self.m] <= b - self.m)
+            if not expired.any():
+                break
+            self.head += expired
+        # 队尾不高于今天收盘价的出队
+        while True:
+            back = (self.tail - 1) % self.m
+            beaten = valid & (self.tail > self.head) & (self.value[self._rows, back] <= close)
+            if not beaten.any():
+                break
+            self.tail -= beaten
+        # 今天入队（停牌的股票不入队）
+        rows = self._rows[valid]
+        slot = self.tail[valid] % self.m
+        self.index[rows, slot] = b[valid]
+        self.value[rows, slot] = close[valid]
+        self.tail += valid
+
+        latest = self.index[self._rows, self.head % self.m]
+        self.hit = np.where(valid, latest > b - self.n, self.hit)
+        return self.bars.update(valid) & self.hit
+
+
+class DownStreakDetector:
+    """
+    连续下跌计数：当天下跌加一，上涨、平盘清零，停牌日不变。
+
+    :param n: 连续下跌天数
+    :param width: 股票数
+    :param window: n 根 bar 最多往前找多少个交易日，默认 lookback(n)
+    """
+
+    def __init__(self, n: int, width: int, window: int = None):
+        self.n = n
+        self.count = np.zeros(width, dtype=np.int64)
+        self.bars = _BarWindow(n, window or lookback(n), width)
+
+    def update(self, pct) -> np.ndarray:
+        """
+        :param pct: 当天全部股票的涨跌幅，停牌为 NaN
+        :return: 当天每只股票是否最近 n 根 bar 连续下跌
+        """
+        pct = np.asarray(pct, dtype=np.float64)
+        valid = ~np.isnan(pct)
+        with np.errstate(invalid="ignore"):
+            self.count = np.where(valid, np.where(pct < 0, self.count + 1, 0), self.count)
+        return self.bars.update(valid) & (self.count >= self.n)
@@ -0,0 +1,175 @@
+"""
+上游接口的限流、重试和并发调度。
+
+- 每个上游接口（按 akshare 函数名区分）有一个全进程共享的令牌桶，所有线程的请求合计不超过设定速率；
+- call_with_retry 在令牌桶限速下调用接口，失败时按指数退避 + 随机抖动重试；
+- Fetcher 把一批任务放进线程池，同时在途的任务数有上限，结果按完成顺序返回，
+  重试后仍然失败的任务记进 failures 列表，可以稍后用 retry_failures 再跑一遍，不会悄悄留下数据空洞。
+
+    from common.fetcher import Fetcher, call_with_retry
+
+    def load(code):
+        return call_with_retry("stock_individual_info_em", ak.stock_individual_info_em, symbol=code)
+
+    fetcher = Fetcher(max_workers=32)
+    for code, df in fetcher.map(load, codes):
+        ...
+    for code, df in fetcher.retry_failures():
+        ...
+"""
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# 接口名 -> (每秒请求数, 突发容量)，没有列出的接口用 DEFAULT_RATE_LIMIT
+DEFAULT_RATE_LIMIT = (8.0, 16)
+RATE_LIMITS = {
+    "stock_board_industry_cons_ths": (1 / 3, 1),  # 同花顺板块成分请求过快会被封，保持每 3 秒一次
+}
+
+# 重试次数与退避时间（秒）
+RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶。
+
+    :param rate: 每秒补充的令牌数
+    :param capacity: 桶容量，即允许的突发请求数
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """取一个令牌，桶空时阻塞到有令牌为止。"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def limiter(endpoint: str) -> TokenBucket:
+    """返回接口对应的全局令牌桶。"""
+    with _buckets_lock:
+        bucket = _buckets.get(endpoint)
+        if bucket is None:
+            bucket = _buckets[endpoint] = TokenBucket(*RATE_LIMITS.get(endpoint, DEFAULT_RATE_LIMIT))
+        return bucket
+
+
+def set_rate_limit(endpoint: str, rate: float, capacity: int = 1) -> None:
+    """调整某个接口的限速，对之后的请求生效。"""
+    with _buckets_lock:
+        RATE_LIMITS[endpoint] = (rate, capacity)
+        _buckets[endpoint] = TokenBucket(rate, capacity)
+
+
+def call_with_retry(endpoint: str, func, *args, retries: int = RETRIES, **kwargs):
+    """
+    在接口的令牌桶限速下调用 func(*args, **kwargs)，出错时指数退避重试。
+
+    :param endpoint: 接口名，用于选择令牌桶
+    :param func: 实际发请求的函数
+    :param retries: 最多重试次数
+    :return: func 的返回值；重试用尽后抛出最后一次的异常
+    """
+    for attempt in range(retries + 1):
+        limiter(endpoint).acquire()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            if attempt == retries:
+                raise
+            # 全抖动退避：在 [0, min(上限, 基数 * 2^attempt)] 内随机等待，避免所有线程同时重试
+            time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+
+
+class FetchFailure:
+    """
+    一个失败的任务。
+
+    :param item: 任务参数
+    :param error: 最后一次的异常
+    """
+
+    def __init__(self, item, error: Exception):
+        self.item = item
+        self.error = error
+
+    def __repr__(self):
+        return f"FetchFailure({self.item!r}, {self.error!r})"
+
+
+class Fetcher:
+    """
+    :param max_workers: 线程数
+    :param max_inflight: 同时在途（已提交未取走结果）的任务上限，默认线程数的 2 倍
+    """
+
+    def __init__(self, max_workers: int = 16, max_inflight: int = None):
+        self.max_workers = max_workers
+        self.max_inflight = max_inflight or max_workers * 2
+        self.failures = []
+        self._func = None
+
+    def map(self, func, items):
+        """
+        对每个 item 调用 func(item)。
+
+        :param func: 任务函数，内部的网络请求应当通过 call_with_retry 发出
+        :param items: 任务参数序列
+        :return: 生成器，按完成顺序产出 (item, result)；失败的任务产出 (item, None) 并记入 failures
+        """
+        self._func = func
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+            for item in items:
+                if len(pending) >= self.max_inflight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from self._collect(done, pending)
+                pending[executor.submit(func, item)] = item
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self._collect(done, pending)
+
+    def _collect(self, done, pending):
+        for future in done:
+            item = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"任务 {item} 失败: {e}")
+                self.failures.append(FetchFailure(item, e))
+                result = None
+            yield item, result
+
+    def retry_failures(self, func=None):
+        """
+        把 failures 里的任务再跑一遍，用法同 map；这一轮仍然失败的任务重新记入 failures。
+        这是一个生成器，开始迭代时才读取 failures，所以可以和 map 一起写成
+        `for results in (fetcher.map(func, items), fetcher.retry_failures()): ...`
+
+        :param func: 任务函数，默认沿用上一次 map 的函数
+        """
+        items = [failure.item for failure in self.failures]
+        self.failures = []
+        yield from self.map(func or self._func, items)
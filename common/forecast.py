@@ -0,0 +1,125 @@
+"""
+业绩预告仓库。
+
+东方财富业绩预告接口 `ak.stock_yjyg_em(date=报告期)` 一次返回全市场某个报告期的全部预告，
+按报告期保存成一个 Parquet 文件：<root>/forecast/<YYYYMMDD>.parquet，行按股票代码排序，
+读取时以 (报告期, 股票代码) 为索引，不需要再逐只股票请求。
+
+报告期结束后几个月内预告还会陆续发布，文件元数据里记录拉取日期，
+在 FINAL_AFTER 天之内读取时如果拉取日期早于需要的日期就重新拉取，之后视为定稿不再请求。
+上游没有返回任何预告时不写文件，下次读取会再请求，空表不会被当成定稿。
+
+    from common.forecast import forecast_store
+    df = forecast_store.load("20231231")
+    losses = forecast_store.loss_stocks("20231231", as_of="2024-02-01")
+"""
+import os
+import threading
+
+import akshare as ak
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.barstore import COVERAGE_KEY, STORE_DIR, last_settled_date, to_timestamp
+from common.fetcher import call_with_retry
+
+CODE_COLUMN = "股票代码"
+PERIOD_COLUMN = "报告期"
+NOTICE_COLUMN = "公告日期"
+NET_PROFIT = "归属于上市公司股东的净利润"
+NUMERIC_COLUMNS = ["预测数值", "业绩变动幅度", "上年同期值"]
+# stock_yjyg_em 去掉序号以后的列，上游没有返回数据时也按这些列建空表
+COLUMNS = [CODE_COLUMN, "股票简称", "预测指标", "业绩变动", "预测数值", "业绩变动幅度", "业绩变动原因", "预告类型", "上年同期值", NOTICE_COLUMN]
+
+# 报告期结束后多少天认为预告已经发布完毕（年报预告最晚在次年 4 月底前）
+FINAL_AFTER = 150
+
+
+def period_of(date) -> pd.Timestamp:
+    """报告期统一成季度末日期，'2023' 或 2023 表示年报 20231231。"""
+    if isinstance(date, int) or (isinstance(date, str) and len(date) == 4):
+        return pd.Timestamp(f"{date}-12-31")
+    return to_timestamp(date)
+
+
+class ForecastStore:
+    """
+    :param root: 仓库根目录
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def path(self, period: pd.Timestamp) -> str:
+        return os.path.join(self.root, "forecast", f"{period:%Y%m%d}.parquet")
+
+    def _lock(self, key) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _fetch(self, period: pd.Timestamp) -> pd.DataFrame:
+        df = call_with_retry("stock_yjyg_em", ak.stock_yjyg_em, date=f"{period:%Y%m%d}")
+        if df is None or df.empty:
+            df = pd.DataFrame(columns=COLUMNS)
+        df = df.drop(columns=["序号"], errors="ignore")
+        df[CODE_COLUMN] = df[CODE_COLUMN].astype(str)
+        df[NOTICE_COLUMN] = pd.to_datetime(df[NOTICE_COLUMN])
+        for col in NUMERIC_COLUMNS:
+            if col in df:
+                df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        return df.sort_values([CODE_COLUMN, NOTICE_COLUMN]).reset_index(drop=True)
+
+    def load(self, period) -> pd.DataFrame:
+        """
+        读取某个报告期的全部业绩预告，本地没有或者还没定稿且已过期时向上游拉取一次。
+
+        :param period: 报告期，'20231231' / '2023-12-31'，或年份表示年报
+        :return: 以 (报告期, 股票代码) 为索引的 DataFrame，同一只股票可能有多个预测指标
+        """
+        period = period_of(period)
+        path = self.path(period)
+        needed = min(period + pd.Timedelta(days=FINAL_AFTER), last_settled_date())
+        with self._lock(path):
+            df = cached = None
+            if os.path.exists(path):
+                table = pq.read_table(path)
+                fetched = to_timestamp((table.schema.metadata or {}).get(COVERAGE_KEY, b"19700101").decode())
+                cached = table.to_pandas()
+                if fetched >= needed:
+                    df = cached
+            if df is None:
+                fresh = self._fetch(period)
+                if fresh.empty:
+                    # 上游没有返回数据（还没发布或请求失败）时不写缓存，下次读取再请求，免得空表过了 FINAL_AFTER 被当成定稿；
+                    # 本地有过期的缓存就先用它
+                    df = cached if cached is not None else fresh
+                else:
+                    df = fresh
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    table = pa.Table.from_pandas(df, preserve_index=False)
+                    table = table.replace_schema_metadata({**(table.schema.metadata or {}), COVERAGE_KEY: f"{last_settled_date():%Y%m%d}".encode()})
+                    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                    pq.write_table(table, tmp_path)
+                    os.replace(tmp_path, path)
+        df.insert(0, PERIOD_COLUMN, period)
+        return df.set_index([PERIOD_COLUMN, CODE_COLUMN])
+
+    def loss_stocks(self, period, as_of=None) -> list:
+        """
+        预告净利润为负的股票。
+
+        :param period: 报告期
+        :param as_of: 只看这一天及之前发布的预告（回测时避免用到未来信息），不传表示全部
+        :return: 股票代码列表（升序、去重）
+        """
+        df = self.load(period).reset_index()
+        loss = (df["预测指标"] == NET_PROFIT) & (df["预测数值"] < 0)
+        if as_of is not None:
+            loss &= df[NOTICE_COLUMN] <= to_timestamp(as_of)
+        return sorted(df.loc[loss, CODE_COLUMN].unique())
+
+
+forecast_store = ForecastStore()
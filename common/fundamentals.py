@@ -0,0 +1,223 @@
+"""
+基本面数据仓库：按 (股票代码, 报告期) 一行保存财务指标和员工数据。
+
+每个报告期一个 Parquet 文件：<root>/fundamentals/<YYYYMMDD>.parquet，
+- 财务指标来自东方财富按报告期批量返回全市场的两个接口：业绩报表 `stock_yjbb_em`（营业收入、净利润、
+  净资产收益率、销售毛利率）和利润表 `stock_lrb_em`（营业利润，用来算营业利润率），每个报告期两次请求；
+- 员工人数、应付职工薪酬只能逐只请求 `stock_employee_analysis_em`，一次返回这只股票的全部报告期，
+  只对本地还没有员工数据的股票请求，一只股票的结果同时填进所有需要的报告期。
+
+文件元数据里记录拉取日期，报告期结束后 FINAL_AFTER 天内（年报 4 月底前陆续披露）读取时会补拉，之后不再请求；
+员工数据请求失败的股票也记在元数据里，定稿以后的更新仍会对这些股票重新请求，直到成功为止。
+全部股票列表和上市日期（沪深交易所股票列表）单独缓存在 listings.parquet，每天最多下载一次。
+
+回测前一次性读出所有需要的报告期，之后的筛选都是对内存里的列做向量化比较，不再有网络请求：
+
+    from common.fundamentals import fundamental_store
+    df = fundamental_store.load(["20221231", "20231231"])   # 以 (报告期, 代码) 为索引
+    listings = fundamental_store.listings()                 # 以代码为索引，列为 名称 / 上市日期
+"""
+import json
+import os
+import threading
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.adjfactor import sina_symbol
+from common.barstore import COVERAGE_KEY, STORE_DIR, last_settled_date, to_timestamp
+from common.fetcher import Fetcher, call_with_retry
+from common.forecast import FINAL_AFTER, period_of
+
+CODE_COLUMN = "代码"
+PERIOD_COLUMN = "报告期"
+NOTICE_COLUMN = "公告日期"
+
+# 业绩报表列名 -> 仓库列名
+YJBB_COLUMNS = {
+    "股票代码": CODE_COLUMN,
+    "营业总收入-营业总收入": "营业收入",
+    "净利润-净利润": "净利润",
+    "净资产收益率": "净资产收益率",
+    "销售毛利率": "销售毛利率",
+    "最新公告日期": NOTICE_COLUMN,
+}
+EMPLOYEE_COLUMNS = ["员工人数", "应付职工薪酬"]
+# 文件元数据里员工数据请求失败的股票代码（JSON 列表）
+EMPLOYEE_FAILED_KEY = b"quant1.employee_failed"
+
+COLUMNS = [CODE_COLUMN, "营业收入", "净利润", "净资产收益率", "销售毛利率", "营业利润率", NOTICE_COLUMN] + EMPLOYEE_COLUMNS
+
+
+def fetch_financials(period: pd.Timestamp) -> pd.DataFrame:
+    """
+    某个报告期全市场的财务指标，两次请求。
+
+    :return: 列为 COLUMNS 中除员工数据以外的列，按代码排序
+    """
+    date = f"{period:%Y%m%d}"
+    yjbb = call_with_retry("stock_yjbb_em", ak.stock_yjbb_em, date=date)
+    lrb = call_with_retry("stock_lrb_em", ak.stock_lrb_em, date=date)
+    if yjbb is None or yjbb.empty:
+        return pd.DataFrame(columns=COLUMNS[:-len(EMPLOYEE_COLUMNS)])
+    df = yjbb[list(YJBB_COLUMNS)].rename(columns=YJBB_COLUMNS)
+    df[CODE_COLUMN] = df[CODE_COLUMN].astype(str)
+    lrb = lrb.assign(**{CODE_COLUMN: lrb["股票代码"].astype(str)}).drop_duplicates(CODE_COLUMN).set_index(CODE_COLUMN)
+    operating = pd.to_numeric(lrb["营业利润"], errors="coerce").reindex(df[CODE_COLUMN]).to_numpy()
+    for col in ("营业收入", "净利润", "净资产收益率", "销售毛利率"):
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    # 营业利润率（%）= 营业利润 / 营业总收入
+    df["营业利润率"] = operating / df["营业收入"].to_numpy() * 100
+    df[NOTICE_COLUMN] = pd.to_datetime(df[NOTICE_COLUMN], errors="coerce")
+    return df.drop_duplicates(CODE_COLUMN).sort_values(CODE_COLUMN).reset_index(drop=True)
+
+
+def fetch_employees(code: str) -> pd.DataFrame:
+    """
+    某只股票历年的员工人数和应付职工薪酬。
+
+    :return: 以报告期为索引、列为 EMPLOYEE_COLUMNS 的 DataFrame
+    """
+    df = call_with_retry("stock_employee_analysis_em", ak.stock_employee_analysis_em, symbol=sina_symbol(code).upper())
+    if df is None or df.empty:
+        return pd.DataFrame(columns=EMPLOYEE_COLUMNS, index=pd.DatetimeIndex([], name=PERIOD_COLUMN))
+    df = df.assign(**{PERIOD_COLUMN: pd.to_datetime(df[PERIOD_COLUMN])}).set_index(PERIOD_COLUMN)
+    df = df[~df.index.duplicated(keep="last")]
+    return df[EMPLOYEE_COLUMNS].apply(pd.to_numeric, errors="coerce")
+
+
+class FundamentalStore:
+    """
+    :param root: 仓库根目录
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, "fundamentals", f"{name}.parquet")
+
+    def _read(self, name: str):
+        """:return: (DataFrame, 拉取日期, 员工数据请求失败的代码)，还没有缓存时为 (None, None, [])"""
+        path = self.path(name)
+        if not os.path.exists(path):
+            return None, None, []
+        table = pq.read_table(path)
+        metadata = table.schema.metadata or {}
+        fetched = metadata.get(COVERAGE_KEY)
+        failed = json.loads(metadata[EMPLOYEE_FAILED_KEY]) if EMPLOYEE_FAILED_KEY in metadata else []
+        return table.to_pandas(), to_timestamp(fetched.decode()) if fetched else None, failed
+
+    def _write(self, name: str, df: pd.DataFrame, fetched: pd.Timestamp, failed=()) -> None:
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        metadata = {**(table.schema.metadata or {}), COVERAGE_KEY: f"{fetched:%Y%m%d}".encode()}
+        if failed:
+            metadata[EMPLOYEE_FAILED_KEY] = json.dumps(sorted(failed)).encode()
+        table = table.replace_schema_metadata(metadata)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+    # ---------- 财务与员工数据 ----------
+    def update(self, periods, max_workers: int = 16) -> list:
+        """
+        补齐若干报告期：没有缓存或还没定稿且已过期的报告期重新拉取财务指标，
+        再对这些报告期里缺员工数据的股票逐只请求一次员工数据；已经定稿的报告期只重新请求上次失败的股票。
+
+        :param periods: 报告期列表
+        :param max_workers: 员工数据请求线程数
+        :return: 重试后仍然失败的股票代码（记在报告期文件里，下次更新时会再次请求）
+        """
+        today = last_settled_date()
+        frames = {}
+        wanted = {}  # 报告期 -> 这次要请求员工数据的股票
+        fetched_on = {}  # 报告期 -> 写回时记录的拉取日期
+        with self._lock:
+            for period in sorted({period_of(p) for p in periods}):
+                df, fetched, failed = self._read(f"{period:%Y%m%d}")
+                if df is None or fetched < min(period + pd.Timedelta(days=FINAL_AFTER), today):
+                    fresh = fetch_financials(period)
+                    # 已经拿到的员工数据保留，财务指标以最新一次拉取为准
+                    old = df.set_index(CODE_COLUMN)[EMPLOYEE_COLUMNS] if df is not None else pd.DataFrame(columns=EMPLOYEE_COLUMNS)
+                    frames[period] = fresh.join(old, on=CODE_COLUMN)
+                    wanted[period] = set(frames[period].loc[frames[period]["员工人数"].isna(), CODE_COLUMN])
+                    fetched_on[period] = today
+                elif failed:
+                    frames[period] = df
+                    wanted[period] = set(failed)
+                    fetched_on[period] = fetched
+        if not frames:
+            return []
+
+        missing = sorted(set().union(*wanted.values()))
+        print(f"更新 {len(frames)} 个报告期，需要请求员工数据的股票 {len(missing)} 只")
+        fetcher = Fetcher(max_workers=max_workers)
+        employees = {}
+        for results in (fetcher.map(fetch_employees, missing), fetcher.retry_failures()):
+            for code, result in results:
+                if isinstance(result, pd.DataFrame):
+                    employees[code] = result
+        failed = [f.item for f in fetcher.failures]
+
+        with self._lock:
+            for period, df in frames.items():
+                rows = [(code, emp.loc[period]) for code, emp in employees.items() if period in emp.index]
+                if rows:
+                    pos = pd.Index(df[CODE_COLUMN]).get_indexer([code for code, _ in rows])
+                    values = np.array([row[EMPLOYEE_COLUMNS].to_numpy(dtype=float) for _, row in rows])
+                    for k, col in enumerate(EMPLOYEE_COLUMNS):
+                        column = df[col].to_numpy(dtype=float, copy=True)
+                        column[pos[pos >= 0]] = values[pos >= 0, k]
+                        df[col] = column
+                self._write(f"{period:%Y%m%d}", df[COLUMNS], fetched_on[period], wanted[period] & set(failed))
+        if failed:
+            print(f"{len(failed)} 只股票的员工数据请求失败: {failed}")
+        return failed
+
+    def load(self, periods, max_workers: int = 16) -> pd.DataFrame:
+        """
+        读取若干报告期的基本面数据，需要时先 update。
+
+        :param periods: 报告期列表，'20231231' / '2023-12-31'，或年份表示年报
+        :return: 以 (报告期, 代码) 为索引、列为 营业收入 / 净利润 / 净资产收益率 / 销售毛利率 / 营业利润率 /
+                 公告日期 / 员工人数 / 应付职工薪酬 的 DataFrame
+        """
+        periods = sorted({period_of(p) for p in periods})
+        self.update(periods, max_workers=max_workers)
+        frames = []
+        with self._lock:
+            for period in periods:
+                df, _, _ = self._read(f"{period:%Y%m%d}")
+                frames.append(df.assign(**{PERIOD_COLUMN: period}))
+        return pd.concat(frames, ignore_index=True).set_index([PERIOD_COLUMN, CODE_COLUMN]).sort_index()
+
+    # ---------- 股票列表 ----------
+    def listings(self) -> pd.DataFrame:
+        """
+        沪深 A 股列表和上市日期，每天最多下载一次。
+
+        :return: 以代码为索引、列为 名称 / 上市日期 的 DataFrame
+        """
+        with self._lock:
+            df, fetched, _ = self._read("listings")
+            if df is None or fetched < last_settled_date():
+                sh = call_with_retry("stock_info_sh_name_code", ak.stock_info_sh_name_code, symbol="主板A股")
+                sz = call_with_retry("stock_info_sz_name_code", ak.stock_info_sz_name_code, symbol="A股列表")
+                df = pd.concat([
+                    pd.DataFrame({CODE_COLUMN: sh["证券代码"], "名称": sh["证券简称"], "上市日期": sh["上市日期"]}),
+                    pd.DataFrame({CODE_COLUMN: sz["A股代码"], "名称": sz["A股简称"], "上市日期": sz["A股上市日期"]}),
+                ], ignore_index=True)
+                df[CODE_COLUMN] = df[CODE_COLUMN].astype(str).str.zfill(6)
+                df["上市日期"] = pd.to_datetime(df["上市日期"], errors="coerce")
+                df = df.sort_values(CODE_COLUMN).reset_index(drop=True)
+                self._write("listings", df, last_settled_date())
+        return df.set_index(CODE_COLUMN)
+
+
+fundamental_store = FundamentalStore()
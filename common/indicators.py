@@ -0,0 +1,334 @@
+"""
+技术指标库。
+
+两套接口，算出来的值一致：
+
+- 数组函数：输入一维序列或 dates × symbols 面板（沿第 0 维计算），一次算完整段历史。
+  滚动均值 / 求和 / 标准差用前缀和，EMA 用一阶递推，N 日最高 / 最低用分块前后缀极值（van Herk / Gil-Werman），
+  都是 O(n)，与窗口长度无关；窗口内有 NaN 或数据不足时结果为 NaN，和 pandas rolling(window=n) 相同。
+- 增量类：每来一根新 K 线调用一次 update(x)，O(1) 返回最新的指标值，用于实盘逐笔更新。
+  x 可以是一个数，也可以是一组股票当天的数组（RollingMax / RollingMin 除外）。
+
+    from common.indicators import sma, rolling_std, macd, SMA
+    df['ma'] = sma(df['close'], 5)
+    dif, dea, hist = macd(df['close'])
+
+    ma = SMA(5)
+    for price in live_prices:
+        value = ma.update(price)
+"""
+import warnings
+from collections import deque
+
+import numpy as np
+
+
+def _as_float(x) -> np.ndarray:
+    return np.asarray(x, dtype=np.float64)
+
+
+def _prefix(x: np.ndarray) -> np.ndarray:
+    """沿第 0 维的前缀和，前面补一行 0：out[i] = x[0] + ... + x[i-1]。"""
+    out = np.zeros((len(x) + 1,) + x.shape[1:], dtype=np.float64)
+    np.cumsum(x, axis=0, out=out[1:])
+    return out
+
+
+def _window_sums(x: np.ndarray, n: int):
+    """
+    :return: (窗口和, 窗口内是否有 NaN)，前 n-1 行的窗口不完整，记为有 NaN
+    """
+    isnan = np.isnan(x)
+    sums = _prefix(np.where(isnan, 0.0, x))
+    nans = _prefix(isnan)
+    out = np.full(x.shape, np.nan)
+    bad = np.ones(x.shape, dtype=bool)
+    if n <= len(x):
+        out[n - 1:] = sums[n:] - sums[:-n]
+        bad[n - 1:] = (nans[n:] - nans[:-n]) > 0
+    return out, bad
+
+
+# ---------- 数组函数 ----------
+def rolling_sum(x, n: int) -> np.ndarray:
+    """最近 n 行的和。"""
+    sums, bad = _window_sums(_as_float(x), n)
+    sums[bad] = np.nan
+    return sums
+
+
+def sma(x, n: int) -> np.ndarray:
+    """n 日简单移动平均。"""
+    return rolling_sum(x, n) / n
+
+
+def rolling_std(x, n: int, ddof: int = 1) -> np.ndarray:
+    """
+    n 日滚动标准差（默认样本标准差，同 pandas）。
+    先减去整段的均值再求平方和的前缀和，避免价格水平较高时两个大数相减损失精度。
+    """
+    x = _as_float(x)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # 整列都是 NaN（一直停牌）时 nanmean 会告警
+        centered = x - np.nanmean(x, axis=0) if len(x) else x
+    sums, bad = _window_sums(centered, n)
+    squares, _ = _window_sums(centered * centered, n)
+    var = (squares - sums * sums / n) / (n - ddof)
+    out = np.sqrt(np.maximum(var, 0.0))
+    out[bad] = np.nan
+    return out
+
+
+def momentum(x, n: int) -> np.ndarray:
+    """n 日涨跌幅 x[t] / x[t-n] - 1，同 pandas pct_change(periods=n)。"""
+    x = _as_float(x)
+    out = np.full(x.shape, np.nan)
+    if n < len(x):
+        out[n:] = x[n:] / x[:-n] - 1
+    return out
+
+
+def ema(x, span: int) -> np.ndarray:
+    """
+    指数移动平均，alpha = 2 / (span + 1)，首个有效值作为初值，同 pandas ewm(span=span, adjust=False)。
+    开头的 NaN 保持 NaN；中间的 NaN 沿用上一个值。
+    """
+    x = _as_float(x)
+    alpha = 2.0 / (span + 1)
+    out = np.empty(x.shape)
+    prev = np.full(x.shape[1:], np.nan)
+    for i in range(len(x)):
+        value = x[i]
+        prev = np.where(np.isnan(prev), value, np.where(np.isnan(value), prev, prev + alpha * (value - prev)))
+        out[i] = prev
+    return out
+
+
+def macd(x, fast: int = 12, slow: int = 26, signal: int = 9):
+    """
+    :return: (DIF, DEA, DIF - DEA)
+    """
+    dif = ema(x, fast) - ema(x, slow)
+    dea = ema(dif, signal)
+    return dif, dea, dif - dea
+
+
+def gain_loss(x, n: int):
+    """
+    RSI 的中间量：最近 n 日上涨幅度的平均和下跌幅度的平均（简单平均）。
+
+    :return: (平均上涨, 平均下跌)，下跌为正数
+    """
+    change = np.diff(_as_float(x), axis=0, prepend=np.nan)
+    return sma(np.where(np.isnan(change), np.nan, np.maximum(change, 0)), n), sma(np.where(np.isnan(change), np.nan, np.maximum(-change, 0)), n)
+
+
+def _rsi(up, down):
+    """窗口内只涨不跌时为 100，不涨不跌时为 50。"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = np.where(down > 0, 100 - 100 / (1 + up / down), np.where(up > 0, 100.0, 50.0))
+    return np.where(np.isnan(up) | np.isnan(down), np.nan, value)[()]
+
+
+def rsi(x, n: int = 14) -> np.ndarray:
+    """简单平均的 RSI（Cutler RSI），取值 0~100。"""
+    return _rsi(*gain_loss(x, n))
+
+
+def _rolling_extreme(x, n: int, func) -> np.ndarray:
+    """
+    van Herk / Gil-Werman：按 n 行分块，块内从前往后和从后往前各做一次累计极值，
+    以第 i 行结尾的窗口 = 前一块的后缀极值[i-n+1] 与当前块的前缀极值[i] 取极值。
+    """
+    x = _as_float(x)
+    length = len(x)
+    out = np.full(x.shape, np.nan)
+    if n > length:
+        return out
+    blocks = -(-length // n)
+    padded = np.full((blocks * n,) + x.shape[1:], np.nan)
+    padded[:length] = x
+    shaped = padded.reshape((blocks, n) + x.shape[1:])
+    prefix = func.accumulate(shaped, axis=1).reshape(padded.shape)
+    suffix = func.accumulate(shaped[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+    out[n - 1:] = func(suffix[:length - n + 1], prefix[n - 1:length])
+    return out
+
+
+def rolling_max(x, n: int) -> np.ndarray:
+    """最近 n 行的最高值（N 日新高）。"""
+    return _rolling_extreme(x, n, np.maximum)
+
+
+def rolling_min(x, n: int) -> np.ndarray:
+    """最近 n 行的最低值（N 日新低）。"""
+    return _rolling_extreme(x, n, np.minimum)
+
+
+def streak(cond) -> np.ndarray:
+    """
+    截至每一行连续满足 cond 的行数（例如连续下跌天数：streak(returns < 0)）。
+
+    :param cond: 布尔数组，沿第 0 维计算
+    :return: 与 cond 同形状的 int64 数组
+    """
+    cond = np.asarray(cond, dtype=bool)
+    counts = np.cumsum(cond, axis=0, dtype=np.int64)
+    # 最近一次不满足时的累计数，用来把计数清零
+    reset = np.maximum.accumulate(np.where(cond, 0, counts), axis=0)
+    return counts - reset
+
+
+# ---------- 增量计算 ----------
+class RollingSum:
+    """最近 n 个值的和，窗口未满或窗口内有 NaN 时为 NaN（NaN 移出窗口后恢复），同 rolling_sum。"""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.window = deque()
+        self.total = 0.0
+        self.nans = 0
+
+    def update(self, x):
+        x = _as_float(x)
+        isnan = np.isnan(x)
+        value = np.where(isnan, 0.0, x)
+        self.window.append((value, isnan))
+        self.total = self.total + value
+        self.nans = self.nans + isnan
+        if len(self.window) > self.n:
+            old, old_nan = self.window.popleft()
+            self.total = self.total - old
+            self.nans = self.nans - old_nan
+        if len(self.window) < self.n:
+            return np.full(x.shape, np.nan)[()]
+        return np.where(self.nans > 0, np.nan, self.total)[()]
+
+
+class SMA(RollingSum):
+    """n 日简单移动平均。"""
+
+    def update(self, x):
+        return super().update(x) / self.n
+
+
+class RollingStd:
+    """n 日滚动标准差，用滚动和与滚动平方和计算。"""
+
+    def __init__(self, n: int, ddof: int = 1):
+        self.n = n
+        self.ddof = ddof
+        self.sums = RollingSum(n)
+        self.squares = RollingSum(n)
+
+    def update(self, x):
+        x = _as_float(x)
+        total = self.sums.update(x)
+        squares = self.squares.update(x * x)
+        var = (squares - total * total / self.n) / (self.n - self.ddof)
+        return np.sqrt(np.maximum(var, 0.0))
+
+
+class Momentum:
+    """n 日涨跌幅 x[t] / x[t-n] - 1。"""
+
+    def __init__(self, n: int):
+        self.n = n
+        self.window = deque(maxlen=n + 1)
+
+    def update(self, x):
+        x = _as_float(x)
+        self.window.append(x)
+        if len(self.window) <= self.n:
+            return np.full(x.shape, np.nan)[()]
+        return x / self.window[0] - 1
+
+
+class EMA:
+    """指数移动平均，同 ema。"""
+
+    def __init__(self, span: int):
+        self.alpha = 2.0 / (span + 1)
+        self.value = None
+
+    def update(self, x):
+        x = _as_float(x)
+        if self.value is None:
+            self.value = x
+        else:
+            self.value = np.where(np.isnan(self.value), x, np.where(np.isnan(x), self.value, self.value + self.alpha * (x - self.value)))[()]
+        return self.value
+
+
+class MACD:
+    """update 返回 (DIF, DEA, DIF - DEA)。"""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, x):
+        dif = self.fast.update(x) - self.slow.update(x)
+        dea = self.signal.update(dif)
+        return dif, dea, dif - dea
+
+
+class RSI:
+    """简单平均的 RSI，同 rsi。"""
+
+    def __init__(self, n: int = 14):
+        self.prev = None
+        self.up = SMA(n)
+        self.down = SMA(n)
+
+    def update(self, x):
+        x = _as_float(x)
+        change = x - self.prev if self.prev is not None else np.full(x.shape, np.nan)[()]
+        self.prev = x
+        up = self.up.update(np.where(np.isnan(change), np.nan, np.maximum(change, 0))[()])
+        down = self.down.update(np.where(np.isnan(change), np.nan, np.maximum(-change, 0))[()])
+        return _rsi(up, down)
+
+
+class RollingMax:
+    """
+    最近 n 个值的最高值，单调队列实现：队列里保存 (序号, 值)，值从队头到队尾递减，
+    新值进来时把队尾不比它大的值弹出，队头过期时弹出，每个值最多进出队列一次。
+    只接受单个数值，不能是 NaN。
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.count = 0
+        self.queue = deque()
+
+    def _better(self, a, b) -> bool:
+        return a >= b
+
+    def update(self, x: float) -> float:
+        while self.queue and self._better(x, self.queue[-1][1]):
+            self.queue.pop()
+        self.queue.append((self.count, x))
+        self.count += 1
+        if self.queue[0][0] <= self.count - 1 - self.n:
+            self.queue.popleft()
+        return self.queue[0][1] if self.count >= self.n else np.nan
+
+
+class RollingMin(RollingMax):
+    """最近 n 个值的最低值。"""
+
+    def _better(self, a, b) -> bool:
+        return a <= b
+
+
+class Streak:
+    """连续满足条件的次数，条件不满足时清零。"""
+
+    def __init__(self):
+        self.count = 0
+
+    def update(self, cond):
+        self.count = np.where(cond, self.count + 1, 0)[()]
+        return self.count
@@ -0,0 +1,217 @@
+"""
+股票行业元数据仓库。
+
+所有行业信息放在一个 SQLite 文件里（<root>/industry.sqlite），按代码和行业建索引：
+- industries：行业名字典，其余表只存行业编号（分类编码），读出来直接是 pandas Categorical；
+- stock_industry：(代码, 来源) -> 股票名称、行业编号。来源 "em" 是东方财富个股资料里的行业，
+  "ths" 是同花顺行业；
+- company_profile：一级 / 二级 / 三级行业和公司简介（beisong 背诵用的 as.xlsx）。
+
+东方财富的行业只能逐只调用 `stock_individual_info_em` 获取（全市场约 5000 次请求），
+update_em 只对新上市和名称变化（改名、戴帽摘帽）的股票重新请求，退市的股票从表里删除。
+第一次更新时行业库还是空的，先从 astockvocab/industry_em_seed.csv（原来的 a股上市公司行业信息_part*.json）导入，
+不必再把全市场请求一遍。
+
+    from common.industry import industry_store
+    df = industry_store.load("em")          # 以代码为索引，列为 名称 / 行业（Categorical）
+    industry_store.members("em", "银行")     # 某个行业的全部股票代码
+"""
+import contextlib
+import os
+import sqlite3
+import threading
+
+import akshare as ak
+import pandas as pd
+
+from common.barstore import ROOT_DIR, STORE_DIR
+from common.fetcher import Fetcher, call_with_retry
+
+INDUSTRY_PATH = os.path.join(STORE_DIR, "industry.sqlite")
+# 东方财富行业的初始数据：代码 / 名称 / 行业
+EM_SEED_PATH = os.path.join(ROOT_DIR, "astockvocab", "industry_em_seed.csv")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS industries (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS stock_industry (
+    code TEXT NOT NULL,
+    source TEXT NOT NULL,
+    name TEXT,
+    industry_id INTEGER NOT NULL REFERENCES industries(id),
+    PRIMARY KEY (code, source)
+);
+CREATE INDEX IF NOT EXISTS stock_industry_by_industry ON stock_industry (source, industry_id);
+CREATE TABLE IF NOT EXISTS company_profile (
+    code TEXT PRIMARY KEY,
+    name TEXT,
+    level1_id INTEGER REFERENCES industries(id),
+    level2_id INTEGER REFERENCES industries(id),
+    level3_id INTEGER REFERENCES industries(id),
+    intro TEXT
+);
+CREATE INDEX IF NOT EXISTS company_profile_by_industry ON company_profile (level3_id);
+"""
+
+
+def normalize_code(code) -> str:
+    """Excel 里读出来的代码可能是整数（丢了前导零），统一成 6 位字符串；带后缀的代码（600519.SH）原样保留。"""
+    code = str(code)
+    return code.zfill(6) if code.isdigit() else code
+
+
+def fetch_em_industry(code: str) -> str:
+    """从东方财富个股资料取行业。请求按接口限速，出错自动重试，重试后仍失败时抛出。"""
+    df = call_with_retry("stock_individual_info_em", ak.stock_individual_info_em, symbol=code)
+    return df.loc[df['item'] == '行业', 'value'].values[0]
+
+
+class IndustryStore:
+    """
+    :param path: SQLite 文件路径
+    """
+
+    def __init__(self, path: str = INDUSTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """打开连接并在一个事务里执行，正常结束时提交，出错时回滚。"""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            try:
+                conn.executescript(SCHEMA)
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+
+    @staticmethod
+    def _industry_ids(conn, names) -> dict:
+        """行业名 -> 编号，字典里没有的行业先插入。"""
+        names = sorted({name for name in names if isinstance(name, str)})
+        conn.executemany("INSERT OR IGNORE INTO industries (name) VALUES (?)", [(name,) for name in names])
+        return dict(conn.execute("SELECT name, id FROM industries").fetchall())
+
+    @staticmethod
+    def _categorical(conn, ids: pd.Series) -> pd.Categorical:
+        """行业编号列 -> Categorical，类别只保留实际用到的行业。"""
+        categories = dict(conn.execute("SELECT id, name FROM industries").fetchall())
+        used = sorted(ids.dropna().astype(int).unique())
+        return pd.Categorical(ids.map(categories), categories=[categories[i] for i in used])
+
+    # ---------- 读取 ----------
+    def load(self, source: str = "em") -> pd.DataFrame:
+        """
+        :param source: 行业来源，"em" / "ths"
+        :return: 以代码为索引、列为 名称 / 行业（Categorical）的 DataFrame
+        """
+        with self._transaction() as conn:
+            df = pd.read_sql_query("SELECT code, name, industry_id FROM stock_industry WHERE source = ? ORDER BY code",
+                                   conn, params=(source,))
+            df['行业'] = self._categorical(conn, df.pop('industry_id'))
+        return df.rename(columns={'code': '代码', 'name': '名称'}).set_index('代码')
+
+    def members(self, source: str, industry: str) -> list:
+        """某个行业的全部股票代码（走 (source, industry_id) 索引）。"""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT s.code FROM stock_industry s JOIN industries i ON s.industry_id = i.id "
+                                "WHERE s.source = ? AND i.name = ? ORDER BY s.code", (source, industry)).fetchall()
+        return [code for code, in rows]
+
+    def load_profiles(self) -> pd.DataFrame:
+        """
+        :return: 列为 股票代码 / 股票简称 / 一级行业 / 二级行业 / 三级行业 / 公司简介 的 DataFrame，行业列为 Categorical
+        """
+        with self._transaction() as conn:
+            df = pd.read_sql_query("SELECT code, name, level1_id, level2_id, level3_id, intro FROM company_profile ORDER BY code", conn)
+            for level, column in (('level1_id', '一级行业'), ('level2_id', '二级行业'), ('level3_id', '三级行业')):
+                df[column] = self._categorical(conn, df.pop(level))
+        df = df.rename(columns={'code': '股票代码', 'name': '股票简称', 'intro': '公司简介'})
+        return df[['股票代码', '股票简称', '一级行业', '二级行业', '三级行业', '公司简介']]
+
+    # ---------- 写入 ----------
+    def replace(self, source: str, df: pd.DataFrame) -> None:
+        """
+        用一份完整的列表替换某个来源的行业数据。
+
+        :param df: 列为 代码 / 名称 / 行业 的 DataFrame
+        """
+        with self._transaction() as conn:
+            ids = self._industry_ids(conn, df['行业'])
+            conn.execute("DELETE FROM stock_industry WHERE source = ?", (source,))
+            conn.executemany("INSERT OR REPLACE INTO stock_industry (code, source, name, industry_id) VALUES (?, ?, ?, ?)",
+                             [(normalize_code(code), source, name, ids[industry]) for code, name, industry in zip(df['代码'], df['名称'], df['行业'])
+                              if industry in ids])
+
+    def replace_profiles(self, df: pd.DataFrame) -> None:
+        """
+        用一份完整的公司简介表替换 company_profile。
+
+        :param df: 列为 股票代码 / 股票简称 / 一级行业 / 二级行业 / 三级行业 / 公司简介 的 DataFrame
+        """
+        with self._transaction() as conn:
+            ids = self._industry_ids(conn, pd.concat([df['一级行业'], df['二级行业'], df['三级行业']]))
+            conn.execute("DELETE FROM company_profile")
+            conn.executemany("INSERT OR REPLACE INTO company_profile VALUES (?, ?, ?, ?, ?, ?)",
+                             [(normalize_code(r['股票代码']), r['股票简称'], ids.get(r['一级行业']), ids.get(r['二级行业']), ids.get(r['三级行业']), r['公司简介'])
+                              for r in df.to_dict('records')])
+
+    def seed_em(self, path: str = EM_SEED_PATH) -> int:
+        """
+        东方财富行业为空时从种子文件导入，已有数据时什么也不做。
+
+        :param path: 列为 代码 / 名称 / 行业 的 CSV
+        :return: 导入的股票数
+        """
+        if not os.path.exists(path) or not self.load("em").empty:
+            return 0
+        df = pd.read_csv(path, dtype=str)
+        with self._transaction() as conn:
+            ids = self._industry_ids(conn, df['行业'])
+            conn.executemany("INSERT OR IGNORE INTO stock_industry (code, source, name, industry_id) VALUES (?, 'em', ?, ?)",
+                             [(normalize_code(code), name, ids[industry]) for code, name, industry in zip(df['代码'], df['名称'], df['行业'])
+                              if industry in ids])
+        return len(df)
+
+    def update_em(self, listings: pd.DataFrame, max_workers: int = 32) -> list:
+        """
+        增量更新东方财富行业：只请求新上市和名称有变化的股票，删除已经不在列表里的股票。
+        股票名称取列表里的名称，下次更新时用它判断是否有变化。行业库为空时先用 seed_em 导入种子数据。
+
+        :param listings: 全部 A 股列表，列为 code / name（ak.stock_info_a_code_name 的返回值）
+        :param max_workers: 请求线程数
+        :return: 重试后仍然失败的股票代码（下次更新时会再次请求）
+        """
+        seeded = self.seed_em()
+        if seeded:
+            print(f"从 {EM_SEED_PATH} 导入 {seeded} 只股票的行业")
+        known = self.load("em")['名称'].to_dict()
+        codes = listings['code'].astype(str)
+        names = dict(zip(codes, listings['name']))
+        stale = [code for code in codes if known.get(code) != names[code]]
+        print(f"共 {len(codes)} 只股票，需要更新行业的 {len(stale)} 只")
+
+        rows = []
+        fetcher = Fetcher(max_workers=max_workers)
+        for results in (fetcher.map(fetch_em_industry, stale), fetcher.retry_failures()):
+            for code, result in results:
+                if isinstance(result, str):
+                    rows.append((code, names[code], result))
+        failed = [f.item for f in fetcher.failures]
+
+        with self._transaction() as conn:
+            ids = self._industry_ids(conn, [industry for _, _, industry in rows])
+            conn.executemany("INSERT OR REPLACE INTO stock_industry (code, source, name, industry_id) VALUES (?, 'em', ?, ?)",
+                             [(code, name, ids[industry]) for code, name, industry in rows if industry in ids])
+            delisted = sorted(set(known) - set(codes))
+            conn.executemany("DELETE FROM stock_industry WHERE source = 'em' AND code = ?", [(code,) for code in delisted])
+        print(f"已更新 {len(rows)} 只，删除退市 {len(delisted)} 只，失败 {len(failed)} 只")
+        return failed
+
+
+industry_store = IndustryStore()
@@ -0,0 +1,243 @@
+"""
+回测绩效指标：累计收益、年化收益（CAGR）、年化波动、夏普、索提诺、最大回撤及持续期、
+胜率 / 盈亏比 / 盈利因子、换手率，以及按年、按月的收益。
+
+输入是每期（通常是每个交易日，或每笔交易）的收益率，可以是一维序列，也可以是 期数 × 参数个数 的二维数组，
+沿第 0 维计算，每一列是一组参数；NaN 视为当期没有收益。两套接口，结果一致：
+
+- summarize：整段收益率一次算出全部指标；
+- Accumulator：逐期 update，只保存几个累计量，参数扫描时不必为每组参数保存整条净值曲线或建 DataFrame。
+
+    from common.metrics import summarize, Accumulator
+    stats = summarize(df['strategy_return'], dates=df.index, position=df['signal'])
+    print(stats['sharpe'], stats['max_drawdown'], stats['yearly'])
+
+    acc = Accumulator()
+    for r in daily_returns:        # r 可以是一个数，也可以是全部参数当天收益组成的数组
+        acc.update(r)
+    acc.result()
+
+回撤为负值（-0.2 表示从高点回落 20%），高点从初始净值 1 算起；回撤持续期是净值低于前高的最长连续期数。
+"""
+import numpy as np
+import pandas as pd
+
+from common.indicators import streak
+
+TRADING_DAYS = 252
+
+
+def _returns(x) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float64)
+    return np.where(np.isnan(x), 0.0, x)
+
+
+def equity(returns) -> np.ndarray:
+    """逐期复利的净值，初始为 1。"""
+    return np.cumprod(1 + _returns(returns), axis=0)
+
+
+def drawdown(returns) -> np.ndarray:
+    """每期净值相对此前最高净值（含初始净值 1）的回撤，<= 0。"""
+    nv = equity(returns)
+    return nv / np.maximum.accumulate(np.maximum(nv, 1.0), axis=0) - 1
+
+
+def _period_key(dates, freq: str) -> np.ndarray:
+    dates = pd.DatetimeIndex(dates)
+    if freq == "Y":
+        return dates.year.to_numpy()
+    if freq == "M":
+        return dates.year.to_numpy() * 100 + dates.month.to_numpy()
+    raise ValueError(f"不支持的周期: {freq}，只能是 'Y' 或 'M'")
+
+
+def _period_frame(keys, growth, freq: str):
+    """keys 为年（或 年*100+月）列表，growth 为各周期的净值倍数；一维输入返回 Series，二维返回 DataFrame。"""
+    index = pd.Index(keys, name="year") if freq == "Y" else pd.PeriodIndex(
+        [pd.Period(year=k // 100, month=k % 100, freq="M") for k in keys], name="month")
+    if growth.ndim == 1:
+        return pd.Series(growth - 1, index=index)
+    return pd.DataFrame(growth - 1, index=index)
+
+
+def period_returns(returns, dates, freq: str = "Y"):
+    """
+    按自然年 / 自然月复利汇总的收益率。
+
+    :param returns: 每期收益率
+    :param dates: 每期的日期
+    :param freq: "Y" 按年，"M" 按月
+    :return: 以年（或月）为索引的 Series；二维输入时为 DataFrame，每列一组参数
+    """
+    r = _returns(returns)
+    keys, group = np.unique(_period_key(dates, freq), return_inverse=True)
+    growth = np.ones((len(keys),) + r.shape[1:])
+    np.multiply.at(growth, group.reshape(-1), 1 + r)
+    return _period_frame(keys, growth, freq)
+
+
+def _finish(n, mean, var, downside, final, max_dd, duration, wins, losses, held, gross_profit, gross_loss,
+            turnover, periods_per_year, risk_free) -> dict:
+    """由累计量计算各项指标，summarize 和 Accumulator 共用。"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        excess = mean - risk_free / periods_per_year
+        std = np.sqrt(var)
+        return {
+            "periods": n,
+            "total_return": final - 1,
+            "cagr": final ** (periods_per_year / n) - 1 if n else np.zeros_like(final),
+            "annual_volatility": std * np.sqrt(periods_per_year),
+            "sharpe": np.where(std > 0, excess / std * np.sqrt(periods_per_year), np.nan)[()],
+            "sortino": np.where(downside > 0, excess / np.sqrt(downside) * np.sqrt(periods_per_year), np.nan)[()],
+            "max_drawdown": max_dd,
+            "max_drawdown_duration": duration,
+            "win_rate": np.where(held > 0, wins / held, np.nan)[()],
+            "loss_rate": np.where(held > 0, losses / held, np.nan)[()],
+            # 平均盈利 / 平均亏损
+            "win_loss_ratio": np.where((wins > 0) & (gross_loss > 0), gross_profit / wins / (gross_loss / losses), np.nan)[()],
+            # 总盈利 / 总亏损
+            "profit_factor": np.where(gross_loss > 0, gross_profit / gross_loss, np.nan)[()],
+            "turnover": turnover * periods_per_year / n if turnover is not None and n else None,
+        }
+
+
+def summarize(returns, dates=None, position=None, periods_per_year: int = TRADING_DAYS, risk_free: float = 0.0) -> dict:
+    """
+    一次算出全部指标。
+
+    :param returns: 每期收益率（一维，或 期数 × 参数个数）
+    :param dates: 每期的日期，传入时给出按年、按月的收益
+    :param position: 每期的持仓（与 returns 对齐，即产生该期收益的仓位）。传入时胜率等只统计有持仓的期数，
+                     并计算年化换手率（持仓变动绝对值之和按年折算，从空仓开始）；不传时统计收益不为 0 的期数
+    :param periods_per_year: 每年期数，日收益为 252；逐笔交易收益没有固定频率，年化类指标不适用
+    :param risk_free: 年化无风险利率，用于夏普 / 索提诺
+    :return: dict，一维输入时各项为标量，二维输入时为每组参数一个值的数组；
+             另有 'yearly' / 'monthly'（传入 dates 时）
+    """
+    r = _returns(returns)
+    n = len(r)
+    nv = np.cumprod(1 + r, axis=0)
+    peak = np.maximum.accumulate(np.maximum(nv, 1.0), axis=0)
+    dd = nv / peak - 1
+    excess = r - risk_free / periods_per_year
+    if position is not None:
+        position = np.asarray(position, dtype=np.float64)
+        position = np.where(np.isnan(position), 0.0, position)
+        held = position != 0
+        changes = np.abs(np.diff(position, axis=0, prepend=np.zeros((1,) + position.shape[1:])))
+        turnover = changes.sum(axis=0)
+    else:
+        held = r != 0
+        turnover = None
+    win = held & (r > 0)
+    loss = held & (r < 0)
+
+    stats = _finish(
+        n,
+        r.mean(axis=0) if n else np.zeros(r.shape[1:]),
+        r.var(axis=0, ddof=1) if n > 1 else np.full(r.shape[1:], np.nan),
+        np.mean(np.minimum(excess, 0) ** 2, axis=0) if n else np.zeros(r.shape[1:]),
+        nv[-1] if n else np.ones(r.shape[1:]),
+        dd.min(axis=0) if n else np.zeros(r.shape[1:]),
+        streak(dd < 0).max(axis=0) if n else np.zeros(r.shape[1:], dtype=np.int64),
+        win.sum(axis=0), loss.sum(axis=0), np.broadcast_to(held, r.shape).sum(axis=0),
+        np.where(win, r, 0).sum(axis=0), -np.where(loss, r, 0).sum(axis=0),
+        turnover, periods_per_year, risk_free,
+    )
+    stats = {key: value[()] if isinstance(value, np.ndarray) else value for key, value in stats.items()}
+    if dates is not None:
+        stats["yearly"] = period_returns(r, dates, "Y")
+        stats["monthly"] = period_returns(r, dates, "M")
+    return stats
+
+
+class Accumulator:
+    """
+    逐期累计绩效指标，内存只和参数个数有关，与期数无关。均值 / 方差用 Welford 递推。
+
+    :param periods_per_year: 每年期数
+    :param risk_free: 年化无风险利率
+    """
+
+    def __init__(self, periods_per_year: int = TRADING_DAYS, risk_free: float = 0.0):
+        self.periods_per_year = periods_per_year
+        self.risk_free = risk_free
+        self.n = 0
+        self._state = None
+        self._yearly = {}
+        self._monthly = {}
+
+    def _init(self, shape):
+        zeros = lambda: np.zeros(shape)
+        self._state = {
+            "mean": zeros(), "m2": zeros(), "downside": zeros(),
+            "nv": np.ones(shape), "peak": np.ones(shape), "max_dd": zeros(),
+            "under": np.zeros(shape, dtype=np.int64), "duration": np.zeros(shape, dtype=np.int64),
+            "wins": np.zeros(shape, dtype=np.int64), "losses": np.zeros(shape, dtype=np.int64),
+            "held": np.zeros(shape, dtype=np.int64), "gross_profit": zeros(), "gross_loss": zeros(),
+            "position": zeros(), "turnover": None,
+        }
+
+    def update(self, r, position=None, date=None) -> None:
+        """
+        :param r: 本期收益率（一个数，或全部参数本期收益组成的数组）
+        :param position: 本期持仓，含义同 summarize
+        :param date: 本期日期，需要按年 / 按月汇总时传入
+        """
+        r = _returns(r)
+        if self._state is None:
+            self._init(r.shape)
+        s = self._state
+        self.n += 1
+        delta = r - s["mean"]
+        s["mean"] = s["mean"] + delta / self.n
+        s["m2"] = s["m2"] + delta * (r - s["mean"])
+        excess = r - self.risk_free / self.periods_per_year
+        s["downside"] = s["downside"] + np.minimum(excess, 0) ** 2
+
+        s["nv"] = s["nv"] * (1 + r)
+        s["peak"] = np.maximum(s["peak"], s["nv"])
+        dd = s["nv"] / s["peak"] - 1
+        s["max_dd"] = np.minimum(s["max_dd"], dd)
+        s["under"] = np.where(dd < 0, s["under"] + 1, 0)
+        s["duration"] = np.maximum(s["duration"], s["under"])
+
+        if position is not None:
+            position = _returns(position)
+            held = position != 0
+            change = np.abs(position - s["position"])
+            s["turnover"] = change if s["turnover"] is None else s["turnover"] + change
+            s["position"] = position
+        else:
+            held = r != 0
+        win = held & (r > 0)
+        loss = held & (r < 0)
+        s["wins"] = s["wins"] + win
+        s["losses"] = s["losses"] + loss
+        s["held"] = s["held"] + held
+        s["gross_profit"] = s["gross_profit"] + np.where(win, r, 0)
+        s["gross_loss"] = s["gross_loss"] - np.where(loss, r, 0)
+
+        if date is not None:
+            date = pd.Timestamp(date)
+            for book, key in ((self._yearly, date.year), (self._monthly, date.year * 100 + date.month)):
+                book[key] = book.get(key, 1.0) * (1 + r)
+
+    def result(self) -> dict:
+        """:return: 与 summarize 相同结构的 dict"""
+        if self._state is None:
+            raise ValueError("还没有任何数据")
+        s = self._state
+        stats = _finish(
+            self.n, s["mean"], s["m2"] / (self.n - 1) if self.n > 1 else np.full(s["mean"].shape, np.nan),
+            s["downside"] / self.n, s["nv"], s["max_dd"], s["duration"],
+            s["wins"], s["losses"], s["held"], s["gross_profit"], s["gross_loss"],
+            s["turnover"], self.periods_per_year, self.risk_free,
+        )
+        stats = {key: value[()] if isinstance(value, np.ndarray) else value for key, value in stats.items()}
+        if self._yearly:
+            for name, book, freq in (("yearly", self._yearly, "Y"), ("monthly", self._monthly, "M")):
+                keys = sorted(book)
+                stats[name] = _period_frame(keys, np.array([np.broadcast_to(book[k], s["nv"].shape) for k in keys]), freq)
+        return stats
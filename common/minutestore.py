@@ -0,0 +1,169 @@
+"""
+本地分钟线行情仓库。
+
+新浪分钟线接口 `ak.stock_zh_a_minute` 每次只返回最近的一段 K 线（1 分钟线大约一周多），
+所以分钟线只能靠每次运行时把新拉到的部分并进本地，慢慢攒出几个月的历史。
+
+按 symbol / 月份分区，每个月一个 Parquet 文件：<root>/minute/<period>/<symbol>/<YYYYMM>.parquet。
+列为 ts（int64 纳秒时间戳）和 open / high / low / close（float32）、volume（float64），
+读取几个月的数据只需要打开对应月份的几个小文件，不用把上游返回的字符串列再解析一遍。
+
+本地只保存不复权价格，前复权 / 后复权在读取时用 common.adjfactor 的复权因子按日换算，
+除权除息之后旧的分钟线也不需要重新拉取（上游也拉不到了）。
+
+    from common.minutestore import stock_zh_a_minute
+    bars = stock_zh_a_minute("600751", period="1", start_date="20240601", end_date="20240831", adjust="qfq")
+"""
+import os
+import threading
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common.adjfactor import factor_at, factor_store, plain_symbol, sina_symbol
+from common.barstore import COVERAGE_KEY, STORE_DIR, last_settled_date, to_timestamp
+from common.fetcher import call_with_retry
+
+TS_COLUMN = "ts"
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+SCHEMA = pa.schema([(TS_COLUMN, pa.int64())] + [(col, pa.float32()) for col in PRICE_COLUMNS] + [("volume", pa.float64())])
+
+
+class MinuteStore:
+    """
+    :param period: 分钟线周期，'1' / '5' / '15' / '30' / '60'
+    :param root: 仓库根目录
+    """
+
+    def __init__(self, period: str = "1", root: str = STORE_DIR):
+        self.period = period
+        self.root = root
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def directory(self, symbol: str) -> str:
+        return os.path.join(self.root, "minute", self.period, symbol)
+
+    def path(self, symbol: str, month: str) -> str:
+        return os.path.join(self.directory(symbol), f"{month}.parquet")
+
+    def months(self, symbol: str) -> list:
+        """已经缓存的月份（'YYYYMM'，升序）。"""
+        directory = self.directory(symbol)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len(".parquet")] for name in os.listdir(directory) if name.endswith(".parquet"))
+
+    def _lock(self, key) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    # ---------- 上游 ----------
+    def _fetch(self, symbol: str) -> pd.DataFrame:
+        """拉取上游最近一段不复权分钟线，转换成仓库的列和类型。"""
+        df = call_with_retry("stock_zh_a_minute", ak.stock_zh_a_minute, symbol=sina_symbol(symbol), period=self.period, adjust="")
+        if df is None or df.empty:
+            return pd.DataFrame(columns=SCHEMA.names)
+        ts = pd.to_datetime(df["day"]).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        out = pd.DataFrame({TS_COLUMN: ts})
+        for col in PRICE_COLUMNS:
+            out[col] = pd.to_numeric(df[col]).to_numpy(dtype=np.float32)
+        out["volume"] = pd.to_numeric(df["volume"]).to_numpy(dtype=np.float64)
+        return out
+
+    def _fetched(self, symbol: str) -> pd.Timestamp:
+        """上一次拉取时已经收盘结算的日期，记在最新一个月份文件的元数据里。"""
+        months = self.months(symbol)
+        if not months:
+            return None
+        meta = pq.read_schema(self.path(symbol, months[-1])).metadata or {}
+        return to_timestamp(meta[COVERAGE_KEY].decode()) if COVERAGE_KEY in meta else None
+
+    def update(self, symbol: str) -> pd.DataFrame:
+        """
+        拉取上游最近的分钟线并入本地，只保存已经收盘结算的交易日。
+
+        :return: 本次拉到的全部分钟线（包括盘中尚未结算的当天）
+        """
+        symbol = plain_symbol(symbol)
+        fresh = self._fetch(symbol)
+        settled = last_settled_date()
+        settled_end = (settled + pd.Timedelta(days=1)).value
+        keep = fresh[fresh[TS_COLUMN] < settled_end]
+        month_of = pd.to_datetime(keep[TS_COLUMN]).dt.strftime("%Y%m")
+        for month, part in keep.groupby(month_of.to_numpy()):
+            path = self.path(symbol, month)
+            with self._lock(path):
+                if os.path.exists(path):
+                    part = pd.concat([pq.read_table(path).to_pandas(), part], ignore_index=True)
+                part = part.drop_duplicates(subset=TS_COLUMN, keep="last").sort_values(TS_COLUMN)
+                table = pa.Table.from_pandas(part, schema=SCHEMA, preserve_index=False)
+                table = table.replace_schema_metadata({COVERAGE_KEY: f"{settled:%Y%m%d}".encode()})
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                pq.write_table(table, tmp_path)
+                os.replace(tmp_path, path)
+        return fresh
+
+    # ---------- 对外接口 ----------
+    def get(self, symbol: str, start_date="19700101", end_date="20500101", adjust: str = "", live: bool = False) -> pd.DataFrame:
+        """
+        读取 [start_date, end_date] 的分钟线。本地最新的数据早于所需日期时先向上游补拉一次。
+
+        :param symbol: 代码，'600751' 或 'sh600751'
+        :param start_date: 开始日期
+        :param end_date: 结束日期（含当天）
+        :param adjust: '' / 'qfq' / 'hfq'
+        :param live: 是否带上尚未收盘结算的当天分钟线（不写入仓库）
+        :return: 以时间为索引（名为 day）、列为 open / high / low / close / volume 的 DataFrame
+        """
+        symbol = plain_symbol(symbol)
+        start = to_timestamp(start_date)
+        end = to_timestamp(end_date)
+        settled = min(end, last_settled_date())
+
+        fresh = None
+        fetched = self._fetched(symbol)
+        if fetched is None or fetched < settled or live:
+            fresh = self.update(symbol)
+
+        lo, hi = start.value, (end + pd.Timedelta(days=1)).value
+        parts = []
+        for month in self.months(symbol):
+            if f"{start:%Y%m}" <= month <= f"{end:%Y%m}":
+                parts.append(pq.read_table(self.path(symbol, month), filters=[(TS_COLUMN, ">=", lo), (TS_COLUMN, "<", hi)]).to_pandas())
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=SCHEMA.names)
+        if live and fresh is not None:
+            tail = fresh[(fresh[TS_COLUMN] >= max(lo, (settled + pd.Timedelta(days=1)).value)) & (fresh[TS_COLUMN] < hi)]
+            df = pd.concat([df, tail], ignore_index=True)
+        df = df.astype({TS_COLUMN: np.int64})
+
+        if adjust and not df.empty:
+            ts = df[TS_COLUMN].to_numpy().view("datetime64[ns]")
+            factor = factor_at(ts, factor_store.get(symbol, pd.Timestamp(ts[-1]).normalize()), adjust)
+            for col in PRICE_COLUMNS:
+                df[col] = (df[col].to_numpy(dtype=np.float64) * factor).astype(np.float32)
+
+        df.index = pd.DatetimeIndex(df.pop(TS_COLUMN).to_numpy().view("datetime64[ns]"), name="day")
+        return df
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def minute_store(period: str = "1") -> MinuteStore:
+    """每个分钟线周期一个仓库实例。"""
+    with _stores_lock:
+        return _stores.setdefault(period, MinuteStore(period))
+
+
+def stock_zh_a_minute(symbol: str = "sh600751", period: str = "1", start_date="19700101", end_date="20500101", adjust: str = "", live: bool = False) -> pd.DataFrame:
+    """
+    与 ak.stock_zh_a_minute 参数相近，优先读本地仓库。
+    返回的时间已经设为索引（day），价格列为 float32。
+    """
+    return minute_store(period).get(symbol, start_date, end_date, adjust, live)
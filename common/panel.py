@@ -0,0 +1,170 @@
+"""
+dates × symbols 行情面板。
+
+一次性把一组股票的日线从本地行情仓库读进二维数组（行是交易日，列是股票，停牌/未上市为 NaN），
+之后各种筛选条件都可以对整个面板做向量化计算，不必再按 日期 × 股票 逐个取数。
+指数和概念板块用 load_index_panel 拼成同样的面板，择时规则可以对全部指数逐列一次算完。
+"""
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+from common.barstore import DATE_COLUMN, index_zh_a_hist, last_settled_date, stock_zh_a_hist, to_timestamp
+from common.fetcher import Fetcher, call_with_retry
+from common.schema import DAY_DTYPE, compact_bars, empty_panel_array
+from common.tradecal import NS_PER_DAY, get_calendar
+
+# 面板字段名 -> akshare 日线列名
+FIELDS = {
+    "open": "开盘",
+    "close": "收盘",
+    "high": "最高",
+    "low": "最低",
+    "volume": "成交量",
+    "pct_chg": "涨跌幅",
+}
+
+
+class Panel:
+    """
+    :param dates: 交易日序列（升序）
+    :param symbols: 股票代码列表
+    :param fields: 字段名 -> 形状为 (len(dates), len(symbols)) 的数组，dtype 见 common.schema.PANEL_DTYPES
+    """
+
+    def __init__(self, dates, symbols, fields: dict):
+        self.dates = pd.DatetimeIndex(dates)
+        self.symbols = np.asarray(symbols)
+        self.fields = fields
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.fields[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.fields
+
+    @property
+    def shape(self):
+        return len(self.dates), len(self.symbols)
+
+    @property
+    def days(self) -> np.ndarray:
+        """交易日的 int32 日序号（自 1970-01-01 起的天数），可以直接和交易日历做下标运算。"""
+        return (self.dates.as_unit("ns").asi8 // NS_PER_DAY).astype(DAY_DTYPE)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(arr.nbytes for arr in self.fields.values())
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """把某个字段包装成以日期为索引、股票为列的 DataFrame（不复制数据）。"""
+        return pd.DataFrame(self.fields[name], index=self.dates, columns=self.symbols, copy=False)
+
+    def date_loc(self, date) -> int:
+        """返回不晚于 date 的最后一个交易日所在的行号，date 早于面板起点时返回 -1。"""
+        return int(self.dates.searchsorted(pd.Timestamp(date), side="right")) - 1
+
+
+def shift(arr: np.ndarray, n: int) -> np.ndarray:
+    """沿日期轴（第 0 维）向后平移 n 行，空出的行填 NaN，相当于 DataFrame.shift(n)。"""
+    out = np.full(arr.shape, np.nan, dtype=float)
+    if n == 0:
+        out[:] = arr
+    elif n > 0:
+        out[n:] = arr[:-n]
+    else:
+        out[:n] = arr[-n:]
+    return out
+
+
+def rolling_all(cond: np.ndarray, n: int) -> np.ndarray:
+    """最近 n 行（含当前行）是否全部满足 cond，前 n-1 行为 False。用前缀和实现，O(行数)。"""
+    counts = np.cumsum(cond, axis=0, dtype=np.int64)
+    counts = np.vstack([np.zeros((1,) + cond.shape[1:], dtype=np.int64), counts])
+    window = counts[n:] - counts[:-n]
+    out = np.zeros(cond.shape, dtype=bool)
+    out[n - 1:] = window == n
+    return out
+
+
+def load_panel(symbols, start_date, end_date, adjust: str = "hfq", fields=("close", "pct_chg"), dates=None, max_workers: int = 16) -> Panel:
+    """
+    从本地行情仓库读取一组股票，拼成 dates × symbols 面板。
+
+    :param symbols: 股票代码列表
+    :param start_date: 开始日期
+    :param end_date: 结束日期
+    :param adjust: 复权方式
+    :param fields: 需要的字段，见 FIELDS
+    :param dates: 指定的交易日序列；不传时取所有股票日期的并集
+    :param max_workers: 读取线程数（未缓存的股票会在这里补拉）
+    :return: Panel
+    """
+    symbols = [str(s) for s in symbols]
+    fetcher = Fetcher(max_workers=max_workers)
+    frames = dict(fetcher.map(lambda s: stock_zh_a_hist(symbol=s, period="daily", start_date=start_date, end_date=end_date, adjust=adjust), symbols))
+    if fetcher.failures:
+        print(f"{len(fetcher.failures)} 只股票读取失败，面板中对应列为 NaN: {[f.item for f in fetcher.failures]}")
+
+    return _assemble(frames, symbols, fields, dates)
+
+
+def _assemble(frames: dict, symbols, fields, dates=None) -> Panel:
+    """把 代码 -> 日线 DataFrame 拼成面板，dates 为 None 时取所有日期的并集。"""
+    if dates is None:
+        all_dates = [df[DATE_COLUMN].values for df in frames.values() if df is not None and not df.empty]
+        dates = np.unique(np.concatenate(all_dates)) if all_dates else np.array([], dtype="datetime64[ns]")
+    dates = pd.DatetimeIndex(dates)
+
+    arrays = {name: empty_panel_array(name, (len(dates), len(symbols))) for name in fields}
+    for j, symbol in enumerate(symbols):
+        df = frames.get(symbol)
+        if df is None or df.empty:
+            continue
+        rows = dates.get_indexer(pd.DatetimeIndex(df[DATE_COLUMN]))
+        valid = rows >= 0
+        for name in fields:
+            arrays[name][rows[valid], j] = df[FIELDS[name]].to_numpy()[valid]
+    return Panel(dates, symbols, arrays)
+
+
+def load_calendar_panel(symbols, start_date, end_date, adjust: str = "hfq", fields=tuple(FIELDS), max_workers: int = 16) -> Panel:
+    """
+    按交易日历对齐的面板：行是 [start_date, end_date] 内已经收盘结算的全部交易日，停牌日为 NaN，
+    第 i 行的下一个交易日就是第 i + 1 行。参数同 load_panel。
+    """
+    end = min(to_timestamp(end_date), last_settled_date())
+    dates = get_calendar().range(start_date, end)
+    return load_panel(symbols, start_date, end, adjust, fields, dates, max_workers)
+
+
+def fetch_concept_board(symbol: str, start_date, end_date) -> pd.DataFrame:
+    """东方财富概念板块日线（例如 微盘股），列名与个股日线一致。"""
+    df = call_with_retry("stock_board_concept_hist_em", ak.stock_board_concept_hist_em, symbol=symbol, period="daily",
+                         start_date=to_timestamp(start_date).strftime("%Y%m%d"), end_date=to_timestamp(end_date).strftime("%Y%m%d"), adjust="")
+    return compact_bars(df)
+
+
+def load_index_panel(symbols, start_date, end_date, fields=("close", "pct_chg"), max_workers: int = 8) -> Panel:
+    """
+    一组指数拼成 dates × symbols 面板，行是各指数日期的并集，某个指数还没有发布的日期为 NaN。
+
+    :param symbols: 指数代码（例如 000300，走本地行情仓库）或东方财富概念板块名称（例如 微盘股）
+    :param start_date: 开始日期
+    :param end_date: 结束日期
+    :param fields: 需要的字段，见 FIELDS
+    :param max_workers: 读取线程数
+    :return: Panel
+    """
+    symbols = [str(s) for s in symbols]
+
+    def load(symbol):
+        if symbol.isdigit():
+            return index_zh_a_hist(symbol=symbol, period="daily", start_date=start_date, end_date=end_date)
+        return fetch_concept_board(symbol, start_date, end_date)
+
+    fetcher = Fetcher(max_workers=max_workers)
+    frames = dict(fetcher.map(load, symbols))
+    if fetcher.failures:
+        print(f"{len(fetcher.failures)} 个指数读取失败，面板中对应列为 NaN: {[f.item for f in fetcher.failures]}")
+    return _assemble(frames, symbols, fields)
@@ -0,0 +1,140 @@
+"""
+多进程参数扫描。
+
+行情数组只在主进程里放进一块 multiprocessing.shared_memory，
+工作进程启动时按名字挂载一次，之后所有任务都直接读共享内存里的数组，不再把 DataFrame pickle 给每个进程。
+参数按块分发给进程池，结果按完成顺序流式返回。
+
+    from common.parallel import SharedArrays, frame_to_arrays, sweep
+
+    def run_one(arrays, sig):          # 必须是模块顶层函数，工作进程要能按名字找到它
+        ...
+        return result
+
+    if __name__ == "__main__":
+        with SharedArrays(frame_to_arrays(stock_data)) as shared:
+            for sig, result in sweep(run_one, sigs, shared):
+                ...
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# 每个数组在共享内存块里按 8 字节对齐
+ALIGN = 8
+
+INDEX_KEY = "__index__"
+
+
+class SharedArrays:
+    """
+    把一组 numpy 数组复制进同一块共享内存。创建它的进程负责在用完后调用 close() 释放。
+
+    :param arrays: 名字 -> numpy 数组
+    """
+
+    def __init__(self, arrays: dict):
+        layout = []
+        offset = 0
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            if arr.dtype == object:
+                raise TypeError(f"数组 {name} 是 object 类型，不能放进共享内存")
+            layout.append((name, arr.dtype.str, arr.shape, offset))
+            offset += math.ceil(arr.nbytes / ALIGN) * ALIGN
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.layout = layout
+        self.arrays = _views(self.shm, layout)
+        for name, arr in arrays.items():
+            self.arrays[name][...] = arr
+
+    @property
+    def spec(self):
+        """工作进程挂载共享内存所需的信息，只有名字和布局，pickle 开销可以忽略。"""
+        return self.shm.name, self.layout
+
+    def close(self) -> None:
+        """释放共享内存。"""
+        self.arrays = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _views(shm, layout) -> dict:
+    return {name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            for name, dtype, shape, offset in layout}
+
+
+def frame_to_arrays(df: pd.DataFrame) -> dict:
+    """把 DataFrame 的数值列和索引拆成数组，索引存为 INDEX_KEY（日期索引转成 int64 纳秒）。"""
+    arrays = {col: df[col].to_numpy() for col in df.columns}
+    index = df.index
+    arrays[INDEX_KEY] = index.asi8 if isinstance(index, pd.DatetimeIndex) else index.to_numpy()
+    return arrays
+
+
+def arrays_to_frame(arrays: dict, datetime_index: bool = True) -> pd.DataFrame:
+    """frame_to_arrays 的逆操作，在工作进程里需要 DataFrame（例如喂给 backtrader）时使用。"""
+    index = arrays[INDEX_KEY]
+    index = pd.DatetimeIndex(index.view("datetime64[ns]")) if datetime_index else pd.Index(index)
+    return pd.DataFrame({name: arr for name, arr in arrays.items() if name != INDEX_KEY}, index=index)
+
+
+# ---------- 工作进程 ----------
+_worker_shm = None
+_worker_arrays = None
+
+
+def _attach(spec) -> None:
+    """进程池的 initializer：每个工作进程只挂载一次共享内存。"""
+    global _worker_shm, _worker_arrays
+    name, layout = spec
+    _worker_shm = shared_memory.SharedMemory(name=name)
+    _worker_arrays = _views(_worker_shm, layout)
+    for arr in _worker_arrays.values():
+        arr.flags.writeable = False
+
+
+def _run_chunk(func, chunk):
+    results = []
+    for param in chunk:
+        try:
+            results.append((param, func(_worker_arrays, param)))
+        except Exception as e:
+            print(f"参数 {param} 运行失败: {e}")
+            results.append((param, None))
+    return results
+
+
+def sweep(func, params, shared: SharedArrays, max_workers: int = None, chunk_size: int = None):
+    """
+    在进程池里对每个参数调用 func(arrays, param)。
+
+    :param func: 模块顶层函数，arrays 为挂载在共享内存上的只读数组字典
+    :param params: 参数列表（每个参数需要能被 pickle）
+    :param shared: 存放行情数组的 SharedArrays
+    :param max_workers: 进程数，默认等于 CPU 核数
+    :param chunk_size: 每个任务包含的参数个数，默认把参数均分成约 4 倍进程数的块
+    :return: 生成器，按完成顺序产出 (param, result)，单个参数出错时 result 为 None
+    """
+    params = list(params)
+    if not params:
+        return
+    max_workers = max_workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, math.ceil(len(params) / (max_workers * 4)))
+    chunks = [params[i:i + chunk_size] for i in range(0, len(params), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(chunks)), initializer=_attach, initargs=(shared.spec,)) as executor:
+        futures = [executor.submit(_run_chunk, func, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
@@ -0,0 +1,156 @@
+"""
+akshare 接口的录制 / 回放。
+
+录制模式下照常请求上游，同时把每次调用的返回值按 (函数名, 参数) 存到本地；
+回放模式下完全不联网，直接从本地返回录好的结果，并可以加一个固定的人为延迟模拟网络耗时，
+这样性能优化前后可以在没有网络的机器上做确定性的对比。
+
+替换的是 akshare 模块上的函数属性，脚本里的 `ak.xxx(...)` 和行情仓库里按名字取上游函数的调用都会经过这里。
+没有安装 akshare 的机器上回放时会注册一个只含这些函数的替身模块。
+
+    python -m common.replay --record gaoweifantan/findstocksclean.py
+    python -m common.replay --replay --latency 0.05 gaoweifantan/findstocksclean.py
+
+行情仓库里已经缓存的数据不会走到上游，录制和回放时可以用 --store 指定一个单独的空仓库目录，
+两次运行从同样的起点开始。
+"""
+import argparse
+import functools
+import hashlib
+import os
+import runpy
+import sys
+import threading
+import time
+import types
+
+import pandas as pd
+
+# 默认放在行情仓库目录下。这里不能 import common.barstore：它会在 install 之前就 import akshare
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPLAY_DIR = os.environ.get("QUANT1_REPLAY_DIR", os.path.join(os.environ.get("QUANT1_STORE", os.path.join(ROOT_DIR, "datas", "store")), "replay"))
+
+# 仓库里用到的 akshare 接口
+FUNCTIONS = (
+    "stock_zh_a_hist",
+    "stock_zh_a_daily",
+    "index_zh_a_hist",
+    "index_stock_cons_csindex",
+    "index_stock_cons",
+    "stock_zh_a_minute",
+    "stock_zh_a_spot",
+    "stock_zh_index_daily",
+    "stock_board_concept_hist_em",
+    "stock_board_industry_summary_ths",
+    "stock_board_industry_index_ths",
+    "stock_board_industry_cons_ths",
+    "stock_info_a_code_name",
+    "stock_info_sh_name_code",
+    "stock_info_sz_name_code",
+    "stock_individual_info_em",
+    "stock_yjyg_em",
+    "stock_em_yjyg",
+    "stock_yjbb_em",
+    "stock_lrb_em",
+    "stock_profit_forecast",
+    "stock_ipo_info",
+    "stock_financial_report_sina",
+    "stock_financial_analysis_indicator",
+    "stock_employee_analysis_em",
+    "stock_a_lg_indicator",
+    "tool_trade_date_hist_sina",
+)
+
+
+class ReplayMissing(KeyError):
+    """回放模式下请求了没有录制过的调用。"""
+
+
+def call_key(name: str, args: tuple, kwargs: dict) -> str:
+    """由函数名和参数生成稳定的录制文件名。"""
+    text = repr((name, args, sorted(kwargs.items())))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def record_path(name: str, args: tuple, kwargs: dict, root: str = REPLAY_DIR) -> str:
+    return os.path.join(root, name, f"{call_key(name, args, kwargs)}.pkl")
+
+
+def _recording(name, func, root):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        path = record_path(name, args, kwargs, root)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"  # 多线程录制同一个调用时各写各的临时文件
+        pd.to_pickle(result, tmp_path)
+        os.replace(tmp_path, path)
+        return result
+    return wrapper
+
+
+def _replaying(name, root, latency):
+    def wrapper(*args, **kwargs):
+        path = record_path(name, args, kwargs, root)
+        if not os.path.exists(path):
+            raise ReplayMissing(f"没有录制过 {name}(args={args}, kwargs={kwargs})")
+        if latency:
+            time.sleep(latency)
+        return pd.read_pickle(path)
+    wrapper.__name__ = name
+    return wrapper
+
+
+def install(mode: str = "replay", latency: float = 0.0, functions=FUNCTIONS, root: str = REPLAY_DIR):
+    """
+    替换 akshare 上的接口函数。
+
+    :param mode: "record" 录制 / "replay" 回放
+    :param latency: 回放时每次调用额外等待的秒数
+    :param functions: 需要替换的接口名
+    :param root: 录制文件目录
+    :return: 被替换后的 akshare 模块（回放且未安装 akshare 时是替身模块）
+    """
+    try:
+        import akshare as ak
+    except ImportError:
+        if mode != "replay":
+            raise
+        ak = sys.modules["akshare"] = types.ModuleType("akshare")
+
+    for name in functions:
+        if mode == "record":
+            func = getattr(ak, name, None)
+            if func is not None:
+                setattr(ak, name, _recording(name, func, root))
+        elif mode == "replay":
+            setattr(ak, name, _replaying(name, root, latency))
+        else:
+            raise ValueError(f"未知的模式: {mode}")
+    return ak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在录制 / 回放 akshare 的环境下运行脚本")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--record", action="store_true", help="请求上游并录制返回值")
+    group.add_argument("--replay", action="store_true", help="只用录制好的返回值，不联网")
+    parser.add_argument("--latency", type=float, default=0.0, help="回放时每次调用的人为延迟（秒）")
+    parser.add_argument("--dir", default=REPLAY_DIR, help="录制文件目录")
+    parser.add_argument("--store", help="本次运行使用的行情仓库目录（QUANT1_STORE）")
+    parser.add_argument("script", help="要运行的脚本")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="传给脚本的参数")
+    options = parser.parse_args()
+
+    if options.store:
+        os.environ["QUANT1_STORE"] = options.store
+    install("record" if options.record else "replay", options.latency, root=options.dir)
+    sys.argv = [options.script] + options.args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(options.script)))
+    start = time.perf_counter()
+    runpy.run_path(options.script, run_name="__main__")
+    print(f"脚本运行耗时: {time.perf_counter() - start:.3f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+无界面批量出图。
+
+策略脚本原来用 pyplot 画完整分辨率的曲线再 plt.show()，批量跑的时候会卡在弹出的窗口上。这里：
+
+- 图表先描述成纯数据的 Chart（曲线、水平线、标题等），可以 pickle，需要时交给工作进程渲染；
+- 直接用 matplotlib 的 Figure + Agg 画布渲染，不经过 pyplot，不改全局后端，不会弹窗；
+- 长序列在加入 Chart 时按像素列做 min/max 抽稀：每个像素列只保留区间内的最低点和最高点，
+  画出来的折线和原始数据看不出区别，点数却只和图片宽度有关；
+- 输出 PNG，或者把一次运行的所有图（加上汇总表）内嵌到一个 HTML 报告里。
+
+    from common.report import Chart, equity_charts, render, write_html
+    chart = Chart("t+0 trading strategy performance", xlabel="date", ylabel="profit")
+    chart.line(days.index, days['profit'].cumsum(), label="cumulative profits", color="b")
+    chart.hline(0, color="r", label="0 line")
+    render(chart, "trading_strategy_performance.png")
+
+    write_html(equity_charts(nav, benchmark=index_nav), "report.html", tables={"绩效": stats_df})
+"""
+import base64
+import html
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+def decimate(x, y, pixels: int):
+    """
+    按像素列做 min/max 抽稀：把序列均分成 pixels 段，每段保留最低点和最高点（按原顺序），首尾点总是保留。
+
+    :param x: 横坐标（可以是日期）
+    :param y: 纵坐标，NaN 不参与比较
+    :param pixels: 像素列数，点数不超过 2 * pixels 时原样返回
+    :return: (x, y) 抽稀后的数组
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2 * pixels:
+        return x, y
+    size = -(-n // pixels)
+    padded = np.full(pixels * size, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(pixels, size)
+    nan = np.isnan(blocks)
+    offsets = np.arange(pixels) * size
+    lows = offsets + np.argmin(np.where(nan, np.inf, blocks), axis=1)
+    highs = offsets + np.argmax(np.where(nan, -np.inf, blocks), axis=1)
+    keep = np.unique(np.concatenate([[0, n - 1], lows, highs]))
+    keep = keep[keep < n]
+    return x[keep], y[keep]
+
+
+class Chart:
+    """
+    一张图：一个坐标轴，可选右侧第二个纵轴。
+
+    :param title: 标题
+    :param xlabel: 横轴名称
+    :param ylabel: 纵轴名称
+    :param secondary_ylabel: 右侧纵轴名称
+    :param figsize: 图片尺寸（英寸）
+    :param dpi: 分辨率，figsize[0] * dpi 即抽稀用的像素列数
+    :param grid: 是否画网格
+    :param date_format: 横轴为日期时的刻度格式，例如 '%Y-%m-%d'
+    :param date_interval: 横轴为日期时每隔几天一个刻度，默认自动
+    """
+
+    def __init__(self, title: str = "", xlabel: str = "", ylabel: str = "", secondary_ylabel: str = None,
+                 figsize=(12, 6), dpi: int = 100, grid: bool = True, date_format: str = None, date_interval: int = None):
+        self.title = title
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.secondary_ylabel = secondary_ylabel
+        self.figsize = figsize
+        self.dpi = dpi
+        self.grid = grid
+        self.date_format = date_format
+        self.date_interval = date_interval
+        self.lines = []
+        self.hlines = []
+
+    @property
+    def pixels(self) -> int:
+        return int(self.figsize[0] * self.dpi)
+
+    def line(self, x, y=None, label: str = None, color=None, linestyle: str = "-", linewidth: float = None, secondary: bool = False) -> "Chart":
+        """
+        加一条折线（抽稀后保存）。
+
+        :param x: 横坐标；只传一个参数时作为纵坐标，横坐标为 0, 1, 2, ...
+        :param y: 纵坐标
+        :param secondary: 画在右侧第二个纵轴上
+        :return: self，便于链式调用
+        """
+        if y is None:
+            x, y = np.arange(len(x)), x
+        x, y = decimate(x, y, self.pixels)
+        self.lines.append({"x": x, "y": y, "label": label, "color": color, "linestyle": linestyle,
+                           "linewidth": linewidth, "secondary": secondary})
+        return self
+
+    def hline(self, y: float, label: str = None, color=None, linestyle: str = "--", linewidth: float = 0.8) -> "Chart":
+        """加一条水平线（画在左侧纵轴上）。"""
+        self.hlines.append({"y": y, "label": label, "color": color, "linestyle": linestyle, "linewidth": linewidth})
+        return self
+
+    def figure(self):
+        """生成 matplotlib Figure（Agg 画布，不经过 pyplot）。"""
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=self.figsize, dpi=self.dpi)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax2 = ax.twinx() if any(line["secondary"] for line in self.lines) else None
+        for line in self.lines:
+            target = ax2 if line["secondary"] else ax
+            target.plot(line["x"], line["y"], label=line["label"], color=line["color"],
+                        linestyle=line["linestyle"], linewidth=line["linewidth"])
+        for line in self.hlines:
+            ax.axhline(y=line["y"], label=line["label"], color=line["color"], linestyle=line["linestyle"], linewidth=line["linewidth"])
+        ax.set_title(self.title)
+        ax.set_xlabel(self.xlabel)
+        ax.set_ylabel(self.ylabel)
+        if ax2 is not None and self.secondary_ylabel:
+            ax2.set_ylabel(self.secondary_ylabel)
+        if self.grid:
+            ax.grid(True)
+        if self.date_format or self.date_interval:
+            from matplotlib.dates import DateFormatter, DayLocator
+            if self.date_format:
+                ax.xaxis.set_major_formatter(DateFormatter(self.date_format))
+            if self.date_interval:
+                ax.xaxis.set_major_locator(DayLocator(interval=self.date_interval))
+            fig.autofmt_xdate()
+        handles, labels = ax.get_legend_handles_labels()
+        if ax2 is not None:
+            more = ax2.get_legend_handles_labels()
+            handles, labels = handles + more[0], labels + more[1]
+        if labels:
+            ax.legend(handles, labels, loc="best")
+        fig.tight_layout()
+        return fig
+
+    def to_png(self) -> bytes:
+        buffer = io.BytesIO()
+        self.figure().savefig(buffer, format="png")
+        return buffer.getvalue()
+
+
+def equity_charts(equity, benchmark=None, title: str = "", dates=None, label: str = "Strategy", benchmark_label: str = "Benchmark") -> list:
+    """
+    净值曲线和回撤曲线两张图。
+
+    :param equity: 策略净值（pandas Series 时用它的索引作横坐标）
+    :param benchmark: 基准净值，可选
+    :param title: 标题前缀
+    :param dates: 横坐标，默认取 equity 的索引
+    :return: [净值图, 回撤图]
+    """
+    if dates is None:
+        dates = equity.index if hasattr(equity, "index") else np.arange(len(equity))
+    values = np.asarray(equity, dtype=np.float64)
+    nav = Chart(f"{title} Equity".strip(), xlabel="Date", ylabel="Equity")
+    nav.line(dates, values, label=label, color="orange")
+    if benchmark is not None:
+        nav.line(dates, benchmark, label=benchmark_label, color="blue")
+    peak = np.fmax.accumulate(values)
+    dd = Chart(f"{title} Drawdown".strip(), xlabel="Date", ylabel="Drawdown", figsize=(12, 3))
+    dd.line(dates, values / peak - 1, label=label, color="red")
+    return [nav, dd]
+
+
+def _render_job(chart: Chart, path: str):
+    png = chart.to_png()
+    if path is None:
+        return png
+    with open(path, "wb") as f:
+        f.write(png)
+    return path
+
+
+def render_many(jobs, max_workers: int = 1) -> list:
+    """
+    渲染多张图，默认在当前进程里逐张渲染。
+
+    进程池在 spawn 启动方式下（Windows / macOS 的默认方式）会在每个工作进程里重新 import 主脚本，
+    只有把脚本主体放在 `if __name__ == "__main__":` 里的调用方才能传 max_workers > 1。
+
+    :param jobs: [(chart, path), ...]，path 为 None 时返回 PNG 字节
+    :param max_workers: 进程数，1 表示不开进程池，None 表示等于 CPU 核数
+    :return: 与 jobs 顺序一致的路径（或 PNG 字节）列表
+    """
+    jobs = list(jobs)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    if max_workers <= 1:
+        return [_render_job(chart, path) for chart, path in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_render_job, *zip(*jobs)))
+
+
+def render(chart: Chart, path: str) -> str:
+    """把一张图渲染成 PNG 文件。"""
+    return _render_job(chart, path)
+
+
+def write_html(charts, path: str, title: str = "", tables: dict = None, max_workers: int = 1) -> str:
+    """
+    一次运行一个 HTML 报告：各张图渲染成 PNG 后以 base64 内嵌，不依赖外部文件。
+
+    :param charts: Chart 列表
+    :param path: 输出文件
+    :param title: 报告标题
+    :param tables: 表名 -> DataFrame，放在图的前面（例如绩效指标汇总）
+    :param max_workers: 渲染进程数，见 render_many
+    :return: path
+    """
+    charts = list(charts)
+    images = render_many([(chart, None) for chart in charts], max_workers) if charts else []
+    parts = [f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>{html.escape(title)}</title></head><body>"]
+    if title:
+        parts.append(f"<h1>{html.escape(title)}</h1>")
+    for name, df in (tables or {}).items():
+        parts.append(f"<h2>{html.escape(name)}</h2>")
+        parts.append(df.to_html())
+    for chart, png in zip(charts, images):
+        parts.append(f"<h2>{html.escape(chart.title)}</h2>")
+        parts.append(f"<img src='data:image/png;base64,{base64.b64encode(png).decode()}'>")
+    parts.append("</body></html>")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+    return path
@@ -0,0 +1,207 @@
+"""
+回测 / 参数扫描结果仓库。
+
+结果按行追加写进列式文件，不再每次运行都 to_excel：Excel 序列化很慢，也不能追加。目录结构：
+
+    <root>/<name>/run_id=<run_id>/part-00000.parquet
+
+- 每次运行一个 run_id 分区，运行参数（params）作为常量列写进每一行，文件元数据里也存一份；
+- 一个 ResultSink 对应一个文件，每次 append 写一个 row group（Parquet）或 record batch（Arrow IPC），
+  close 时才把临时文件改名为正式文件，with 块里出错时丢弃临时文件，不会留下写了一半的结果；
+- close（包括 load / export）以后还可以继续 append，新的结果写进下一个 part 文件，已经写好的文件不会被覆盖；
+- 需要 Excel / CSV 时在最后调用 export 一次性转换。
+
+    from common.results import ResultSink, load_results
+    with ResultSink("sig_sweep", params={"symbol": "300073"}) as sink:
+        for sig in sigs:
+            sink.append(one_result_df, sig=sig)
+        sink.export("sig_sweep.xlsx")
+    df = load_results("sig_sweep")          # 全部运行，带 run_id 列
+"""
+import glob
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from common.barstore import ROOT_DIR
+
+# 默认放在 datas/results 下，可以用环境变量 QUANT1_RESULTS 改到别处
+RESULTS_DIR = os.environ.get("QUANT1_RESULTS", os.path.join(ROOT_DIR, "datas", "results"))
+
+RUN_COLUMN = "run_id"
+PARAMS_KEY = b"quant1.params"
+
+# 格式 -> (扩展名, pyarrow.dataset 的格式名)
+FORMATS = {
+    "parquet": (".parquet", "parquet"),
+    "arrow": (".arrow", "ipc"),
+}
+
+
+def new_run_id() -> str:
+    """按启动时间生成的运行编号，同一秒内启动的进程用进程号区分。"""
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+
+
+class ResultSink:
+    """
+    :param name: 结果集名称，同名结果集的各次运行放在同一个目录下
+    :param params: 本次运行的参数，作为常量列追加到每一行
+    :param run_id: 运行编号，默认 new_run_id()
+    :param format: "parquet" 或 "arrow"（Arrow IPC 文件，写入更快、不压缩）
+    :param root: 结果仓库根目录
+    """
+
+    def __init__(self, name: str, params: dict = None, run_id: str = None, format: str = "parquet", root: str = RESULTS_DIR):
+        if format not in FORMATS:
+            raise ValueError(f"不支持的格式: {format}，只能是 {list(FORMATS)}")
+        self.name = name
+        self.params = dict(params or {})
+        self.run_id = run_id or new_run_id()
+        self.format = format
+        self.root = root
+        self.rows = 0
+        self._schema = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+        self._run_dir = os.path.join(root, name, f"{RUN_COLUMN}={self.run_id}")
+        os.makedirs(self._run_dir, exist_ok=True)
+        self._next_part()
+
+    def _next_part(self) -> None:
+        """下一个要写的 part 文件：编号接在这次运行已有的文件后面。"""
+        ext = FORMATS[self.format][0]
+        part = len(glob.glob(os.path.join(self._run_dir, f"part-*{ext}")))
+        self.path = os.path.join(self._run_dir, f"part-{part:05d}{ext}")
+        # 下划线开头的文件读取时会被忽略，写完改名后才可见
+        self._tmp_path = os.path.join(self._run_dir, f"_part-{part:05d}{ext}.{threading.get_ident()}.tmp")
+
+    def _to_table(self, df: pd.DataFrame, params: dict) -> pa.Table:
+        if not isinstance(df.index, pd.RangeIndex) or df.index.name is not None:
+            df = df.reset_index()
+        df = df.assign(**{**self.params, **params}) if self.params or params else df
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._schema is None:
+            metadata = {PARAMS_KEY: json.dumps(self.params, ensure_ascii=False, default=str).encode()}
+            self._schema = table.schema.remove_metadata().with_metadata(metadata)
+        return table.select(self._schema.names).cast(self._schema)
+
+    def append(self, df: pd.DataFrame, **params) -> None:
+        """
+        追加一批结果。列名和类型以第一次 append 为准，之后缺列或多列会报错。
+
+        :param df: 结果行；非默认索引（例如日期索引）会作为普通列保存
+        :param params: 这一批结果各自的参数（例如 sig），作为常量列追加
+        """
+        with self._lock:
+            table = self._to_table(df, params)
+            if self._writer is None:
+                if self.format == "parquet":
+                    self._writer = pq.ParquetWriter(self._tmp_path, self._schema)
+                else:
+                    self._writer = pa.ipc.new_file(self._tmp_path, self._schema)
+            self._writer.write_table(table)
+            self.rows += table.num_rows
+
+    def close(self, discard: bool = False) -> None:
+        """
+        写完文件并改名为正式文件；没有 append 过时什么也不写。之后再 append 会写进下一个 part 文件。
+
+        :param discard: 丢弃这个文件里还没改名的结果（出错时用），不发布到正式文件
+        """
+        with self._lock:
+            if self._writer is None:
+                return
+            self._writer.close()
+            self._writer = None
+            if discard:
+                os.remove(self._tmp_path)
+            else:
+                os.replace(self._tmp_path, self.path)
+            self._next_part()
+
+    def load(self) -> pd.DataFrame:
+        """读回本次运行的全部结果（会先 close）。"""
+        self.close()
+        return load_results(self.name, self.run_id, self.root)
+
+    def export(self, path: str, **kwargs) -> str:
+        """把本次运行的结果转换成 Excel / CSV，参数同 export_results。"""
+        self.close()
+        return export_results(self.name, path, self.run_id, self.root, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+
+
+# run_id 总是按字符串解析，避免纯数字的编号被推断成整数
+_PARTITIONING = ds.partitioning(pa.schema([(RUN_COLUMN, pa.string())]), flavor="hive")
+
+
+def _dataset(name: str, root: str):
+    directory = os.path.join(root, name)
+    datasets = []
+    for ext, fmt in FORMATS.values():
+        files = glob.glob(os.path.join(directory, f"{RUN_COLUMN}=*", f"part-*{ext}"))
+        if files:
+            datasets.append(ds.dataset(sorted(files), format=fmt, partitioning=_PARTITIONING, partition_base_dir=directory))
+    if not datasets:
+        raise FileNotFoundError(f"结果集 {name} 在 {directory} 下没有任何结果")
+    return datasets
+
+
+def load_results(name: str, run_id=None, root: str = RESULTS_DIR, columns=None) -> pd.DataFrame:
+    """
+    读取结果集。
+
+    :param name: 结果集名称
+    :param run_id: 只读某一次（或几次，传列表）运行，默认全部
+    :param root: 结果仓库根目录
+    :param columns: 只读这些列，默认全部（run_id 列总会带上）
+    :return: DataFrame，最后一列为 run_id
+    """
+    run_ids = [run_id] if isinstance(run_id, str) else run_id
+    tables = []
+    for dataset in _dataset(name, root):
+        filter = ds.field(RUN_COLUMN).isin(run_ids) if run_ids is not None else None
+        names = None if columns is None else [c for c in columns if c != RUN_COLUMN] + [RUN_COLUMN]
+        tables.append(dataset.to_table(columns=names, filter=filter))
+    table = pa.concat_tables(tables, promote_options="default") if len(tables) > 1 else tables[0]
+    return table.to_pandas()
+
+
+def export_results(name: str, path: str, run_id=None, root: str = RESULTS_DIR, index=None, sheets: dict = None, drop_run_id: bool = None) -> str:
+    """
+    把结果集转换成 Excel（.xlsx）或 CSV（.csv）。
+
+    :param name: 结果集名称
+    :param path: 输出文件，按扩展名决定格式
+    :param run_id: 只导出某一次运行，默认全部
+    :param root: 结果仓库根目录
+    :param index: 作为索引写出的列（例如保存时的日期索引），默认不写索引
+    :param sheets: Excel 工作表名 -> 要写的列（None 表示全部列），一个工作簿写多张表；默认一张表写全部列
+    :param drop_run_id: 是否去掉 run_id 列，默认只导出一次运行时去掉
+    :return: path
+    """
+    df = load_results(name, run_id, root)
+    if drop_run_id if drop_run_id is not None else isinstance(run_id, str):
+        df = df.drop(columns=RUN_COLUMN)
+    if index is not None:
+        df = df.set_index(index)
+    if path.lower().endswith(".csv"):
+        df.to_csv(path, index=index is not None)
+        return path
+    with pd.ExcelWriter(path) as writer:
+        for sheet, columns in (sheets or {"Sheet1": None}).items():
+            (df if columns is None else df[columns]).to_excel(writer, sheet_name=sheet, index=index is not None)
+    return path
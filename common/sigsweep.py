@@ -0,0 +1,173 @@
+"""
+涨跌幅阈值（sig）策略的向量化回测。
+
+zhishuduichong 下的 sig 系列脚本是同一个状态机：空仓时当天涨跌幅 >= sig 收盘买入，
+持仓时当天涨跌幅 < sig 收盘卖出，原来每个 sig 都要逐根 K 线跑一遍 Python 循环。这里换成：
+
+- 持仓状态只取决于最近一次出现的开仓 / 平仓信号，用“前向填充最近一次信号”一次求出
+  参数个数 × 天数 的持仓矩阵；每一段连续持仓就是一笔交易，用相邻两天状态的差找出全部开仓、平仓日；
+- 涨跌幅先排序去重：落在相邻两个不同涨跌幅之间的 sig 产生完全相同的信号，只算一次；
+- 每个参数的累计收益、最大回撤（按逐笔交易的净值计算）、按平仓年份汇总的收益一次算完。
+
+    from common.sigsweep import sig_sweep
+    result = sig_sweep(df['涨跌幅'], df['收盘'], np.arange(0.1, 10, 0.1), dates=df['日期'])
+    result.summary()    # sig, final_cumulative_return, max_drawdown, trades
+    result.yearly()     # 年份 × sig 的收益率之和
+
+其他“满足条件开仓、满足另一条件平仓”的规则（例如 微盘股/indexhuice.py 的跌 3% 买、涨 3% 卖）
+直接构造开仓 / 平仓信号交给 SignalBacktest。
+"""
+import numpy as np
+import pandas as pd
+
+
+def hold_state(enter, exit) -> np.ndarray:
+    """
+    由开仓 / 平仓信号得到每天收盘后的持仓状态：开仓信号当天变为持仓，平仓信号当天变为空仓，
+    两者都没有（包括涨跌幅为 NaN）时保持前一天的状态，一开始空仓。同一天不能同时有开仓和平仓信号。
+
+    :param enter: 开仓信号，最后一维是日期（可以是 参数个数 × 天数 的二维数组）
+    :param exit: 平仓信号，形状同 enter
+    :return: 同形状的布尔数组
+    """
+    enter = np.asarray(enter, dtype=bool)
+    exit = np.asarray(exit, dtype=bool)
+    # 每一天之前（含当天）最近一次出现信号的位置，没有信号时为 -1
+    last = np.where(enter | exit, np.arange(enter.shape[-1]), -1)
+    last = np.maximum.accumulate(last, axis=-1)
+    return np.take_along_axis(enter, np.maximum(last, 0), axis=-1) & (last >= 0)
+
+
+def trade_runs(state):
+    """
+    每一段连续持仓是一笔交易：第一天收盘买入，持仓结束后的第一天收盘卖出。
+
+    :param state: 参数个数 × 天数 的持仓状态
+    :return: (rows, entry, exit)，按 (行, 开仓日) 排序的等长数组；exit 为 -1 表示到最后一天还没平仓
+    """
+    state = np.atleast_2d(np.asarray(state, dtype=bool))
+    prev = np.zeros_like(state)
+    prev[:, 1:] = state[:, :-1]
+    rows, entry = np.nonzero(state & ~prev)
+    exit_rows, exit_days = np.nonzero(~state & prev)
+    # 同一行里第 j 次平仓对应第 j 次开仓，只有最后一次开仓可能没有平仓
+    first_entry = np.searchsorted(rows, exit_rows)
+    nth = np.arange(len(exit_rows)) - np.searchsorted(exit_rows, exit_rows)
+    exit = np.full(len(entry), -1, dtype=np.int64)
+    exit[first_entry + nth] = exit_days
+    return rows, entry, exit
+
+
+def threshold_signals(change_pct, sigs):
+    """
+    “涨跌幅 >= sig 开仓，< sig 平仓”的信号。sig 按排序去重后的涨跌幅分组，信号相同的 sig 只生成一行。
+
+    :param change_pct: 每天的涨跌幅，NaN 当天既不开仓也不平仓
+    :param sigs: 阈值列表
+    :return: (enter, exit, group)，enter / exit 为 不同信号数 × 天数 的布尔数组，sigs[i] 的信号是第 group[i] 行
+    """
+    pct = np.asarray(change_pct)
+    if not np.issubdtype(pct.dtype, np.floating):
+        pct = pct.astype(np.float64)
+    valid = ~np.isnan(pct)
+    levels = np.unique(pct[valid])
+    rank = np.searchsorted(levels, pct)  # 涨跌幅在 levels 里的位置，NaN 由 valid 屏蔽
+    # pct >= sig 等价于 pct 的位置 >= 小于 sig 的涨跌幅个数
+    # 阈值按涨跌幅本身的精度比较：仓库里的涨跌幅是 float32，1.80 的涨幅应当满足 sig = 1.8
+    cuts, group = np.unique(np.searchsorted(levels, np.asarray(sigs, dtype=pct.dtype)), return_inverse=True)
+    enter = valid & (rank >= cuts[:, None])
+    exit = valid & (rank < cuts[:, None])
+    return enter, exit, group.reshape(-1)
+
+
+class SignalBacktest:
+    """
+    按收盘价成交、每次全仓进出的信号回测，参数网格放在第 0 维上一次算完。
+
+    :param close: 每天的收盘价
+    :param enter: 开仓信号，参数个数 × 天数（一维时视为一个参数）
+    :param exit: 平仓信号，形状同 enter
+    :param dates: 交易日，按年汇总和输出交易明细时需要
+    :param params: 每个参数的取值，用作结果的行 / 列名
+    :param group: 参数 i 使用 enter / exit 的第 group[i] 行，默认一一对应
+    """
+
+    def __init__(self, close, enter, exit, dates=None, params=None, group=None):
+        self.close = np.asarray(close, dtype=np.float64)
+        self.dates = pd.DatetimeIndex(dates) if dates is not None else None
+        state = hold_state(np.atleast_2d(enter), np.atleast_2d(exit))
+        self.n_rows = len(state)
+        self.group = np.arange(self.n_rows) if group is None else np.asarray(group)
+        self.params = list(range(len(self.group))) if params is None else list(params)
+        self.rows, self.entry, self.exit = trade_runs(state)
+
+        closed = self.exit >= 0
+        self._rows = self.rows[closed]
+        self._exit = self.exit[closed]
+        buy = self.close[self.entry[closed]]
+        self.profit = (self.close[self._exit] - buy) / buy
+
+    def _equity(self) -> np.ndarray:
+        """每行逐笔交易后的净值（从 1 开始连乘），交易笔数不足的行用最后的净值补齐。"""
+        counts = np.bincount(self._rows, minlength=self.n_rows)
+        growth = np.ones((self.n_rows, max(int(counts.max(initial=0)), 1)))
+        nth = np.arange(len(self._rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        growth[self._rows, nth] = 1 + self.profit
+        return np.cumprod(growth, axis=1)
+
+    def summary(self) -> pd.DataFrame:
+        """
+        :return: 每个参数一行：sig、累计收益率、最大回撤（按逐笔平仓后的净值，从第一笔交易开始算）、已平仓交易笔数
+        """
+        equity = self._equity()
+        final = equity[:, -1] - 1
+        drawdown = (equity / np.maximum.accumulate(equity, axis=1) - 1).min(axis=1)
+        trades = np.bincount(self._rows, minlength=self.n_rows)
+        return pd.DataFrame({
+            'sig': self.params,
+            'final_cumulative_return': final[self.group],
+            'max_drawdown': drawdown[self.group],
+            'trades': trades[self.group],
+        })
+
+    def yearly(self) -> pd.DataFrame:
+        """
+        :return: 年份 × 参数 的逐笔收益率之和（按平仓日所在年份归属），没有交易的年份为 0
+        """
+        if self.dates is None:
+            raise ValueError("按年汇总需要传入 dates")
+        years, column = np.unique(self.dates.year[self._exit], return_inverse=True)
+        table = np.zeros((self.n_rows, len(years)))
+        np.add.at(table, (self._rows, column.reshape(-1)), self.profit)
+        return pd.DataFrame(table[self.group].T, index=pd.Index(years, name='year'), columns=self.params)
+
+    def trades(self, i: int = 0) -> pd.DataFrame:
+        """
+        :param i: 第几个参数
+        :return: 该参数的交易明细，最后一笔未平仓时卖出列为空
+        """
+        row = self.group[i]
+        lo, hi = np.searchsorted(self.rows, [row, row + 1])
+        entry, exit = self.entry[lo:hi], self.exit[lo:hi]
+        closed = exit >= 0
+        sell = np.where(closed, self.close[np.maximum(exit, 0)], np.nan)
+        buy = self.close[entry]
+        df = pd.DataFrame({'entry_price': buy, 'exit_price': sell, 'profit': (sell - buy) / buy})
+        if self.dates is not None:
+            df.insert(0, 'entry_date', self.dates[entry])
+            df.insert(2, 'exit_date', self.dates[np.maximum(exit, 0)].where(closed))
+        return df
+
+
+def sig_sweep(change_pct, close, sigs, dates=None) -> SignalBacktest:
+    """
+    一次回测全部 sig：涨跌幅 >= sig 时收盘买入，持仓后涨跌幅 < sig 时收盘卖出。
+
+    :param change_pct: 每天的涨跌幅（%）
+    :param close: 每天的收盘价
+    :param sigs: 阈值列表
+    :param dates: 交易日，需要按年汇总时传入
+    :return: SignalBacktest，行按 sigs 的顺序
+    """
+    enter, exit, group = threshold_signals(change_pct, sigs)
+    return SignalBacktest(close, enter, exit, dates=dates, params=sigs, group=group)
@@ -0,0 +1,165 @@
+"""
+全市场日终截面快照。
+
+每个交易日收盘后调用一次 `ak.stock_zh_a_spot()`，把全市场当天的 开/高/低/收/涨跌幅/成交量
+存成一个文件：<root>/snapshot/<YYYYMMDD>.npy，内容是按代码排序的 numpy 结构化数组（价格 float32，成交量单位为股），
+读取时用 mmap 映射，不解析、不复制，几千只股票的截面打开就能直接做向量化比较。
+
+只需要某一天截面的筛选（当日跌幅、跌停等）先读快照缩小范围，只对剩下的少数股票再逐只取历史行情，
+不必对几百上千只成分股逐只请求。
+
+收盘后由定时任务运行（交易日 15:30 之后）：
+
+    python -m common.snapshot
+
+没有当天实时接口可用的历史日期，可以从本地日线仓库补一份（未缓存的股票会逐只补拉）：
+
+    python -m common.snapshot --date 20241125 --index 000906
+"""
+import argparse
+import datetime
+import os
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+from common.adjfactor import plain_symbol
+from common.barstore import MARKET_SETTLED, STORE_DIR, to_timestamp
+from common.fetcher import call_with_retry
+from common.panel import load_panel
+from common.tradecal import get_calendar
+
+SNAPSHOT_DIR = os.path.join(STORE_DIR, "snapshot")
+
+FIELDS = ("open", "high", "low", "close", "pct_chg", "volume")
+DTYPE = np.dtype([("code", "S6")] + [(name, np.float32) for name in FIELDS[:-1]] + [("volume", np.float64)])
+
+# 新浪实时行情列名 -> 快照字段名
+SPOT_COLUMNS = {
+    "今开": "open",
+    "最高": "high",
+    "最低": "low",
+    "最新价": "close",
+    "涨跌幅": "pct_chg",
+    "成交量": "volume",
+}
+
+
+def snapshot_path(date, root: str = SNAPSHOT_DIR) -> str:
+    return os.path.join(root, f"{to_timestamp(date):%Y%m%d}.npy")
+
+
+def _to_records(codes, columns: dict) -> np.ndarray:
+    """代码序列 + 字段名 -> 数组 的字典，转换成按代码排序的结构化数组。"""
+    records = np.empty(len(codes), dtype=DTYPE)
+    records["code"] = np.asarray(codes, dtype="S6")
+    for name in FIELDS:
+        records[name] = np.asarray(columns[name], dtype=DTYPE[name])
+    return np.sort(records, order="code")
+
+
+def save_snapshot(date, records: np.ndarray, root: str = SNAPSHOT_DIR) -> str:
+    """先写临时文件再替换，读的一方不会看到写了一半的快照。"""
+    path = snapshot_path(date, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, records)
+    os.replace(tmp_path, path)
+    return path
+
+
+def take_snapshot(root: str = SNAPSHOT_DIR) -> str:
+    """
+    用一次实时行情请求保存今天的全市场截面。只在交易日收盘结算之后运行，否则拿到的不是当天的日终数据。
+
+    :return: 快照文件路径；不满足条件时返回 None
+    """
+    now = datetime.datetime.now()
+    today = pd.Timestamp(now.date())
+    if not get_calendar().is_trading_day(today):
+        print(f"{today:%Y-%m-%d} 不是交易日，不保存快照")
+        return None
+    if now.time() < MARKET_SETTLED:
+        print(f"尚未收盘结算（{MARKET_SETTLED:%H:%M} 之后），不保存快照")
+        return None
+
+    spot = call_with_retry("stock_zh_a_spot", ak.stock_zh_a_spot)
+    spot = spot[spot["成交量"].astype(float) > 0]  # 停牌的股票不进快照
+    codes = [plain_symbol(code) for code in spot["代码"].astype(str)]
+    records = _to_records(codes, {name: pd.to_numeric(spot[col]).to_numpy() for col, name in SPOT_COLUMNS.items()})
+    path = save_snapshot(today, records, root)
+    print(f"已保存 {len(records)} 只股票的快照: {path}")
+    return path
+
+
+def build_snapshot(date, symbols, root: str = SNAPSHOT_DIR, max_workers: int = 16) -> str:
+    """
+    从本地日线仓库（不复权）拼出某个历史交易日的截面，用于补齐没有跑快照任务的日期。
+
+    :param date: 交易日
+    :param symbols: 股票代码列表
+    :return: 快照文件路径
+    """
+    date = to_timestamp(date)
+    panel = load_panel(symbols, date, date, adjust="", fields=FIELDS, dates=[date], max_workers=max_workers)
+    traded = ~np.isnan(panel["close"][0])
+    columns = {name: panel[name][0][traded] for name in FIELDS}
+    columns["volume"] = columns["volume"] * 100  # 日线的成交量单位是手，快照统一为股
+    records = _to_records(panel.symbols[traded], columns)
+    path = save_snapshot(date, records, root)
+    print(f"已保存 {len(records)} 只股票的快照: {path}")
+    return path
+
+
+def read_snapshot(date, root: str = SNAPSHOT_DIR):
+    """
+    以 mmap 方式打开某个交易日的快照。
+
+    :return: 按 code 排序的只读结构化数组（字段见 DTYPE）；没有这一天的快照时返回 None
+    """
+    path = snapshot_path(date, root)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def snapshot_frame(date, root: str = SNAPSHOT_DIR) -> pd.DataFrame:
+    """快照转换成以股票代码为索引的 DataFrame；没有快照时返回 None。"""
+    records = read_snapshot(date, root)
+    if records is None:
+        return None
+    df = pd.DataFrame({name: records[name] for name in FIELDS})
+    df.index = pd.Index(records["code"].astype(str), name="code")
+    return df
+
+
+def lookup(records: np.ndarray, symbols) -> np.ndarray:
+    """
+    在快照里按代码查找位置。
+
+    :return: 与 symbols 等长的下标数组，快照里没有的股票（停牌、未上市）为 -1
+    """
+    keys = np.asarray([str(s) for s in symbols], dtype="S6")
+    if len(records) == 0:
+        return np.full(len(keys), -1)
+    pos = np.minimum(np.searchsorted(records["code"], keys), len(records) - 1)
+    return np.where(records["code"][pos] == keys, pos, -1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="保存全市场日终截面快照")
+    parser.add_argument("--date", help="补一个历史交易日的快照（从本地日线仓库拼出），不传时用实时行情保存今天的")
+    parser.add_argument("--index", default="000985", help="补历史快照时使用的指数成分股（默认中证全指）")
+    options = parser.parse_args()
+
+    if options.date is None:
+        take_snapshot()
+    else:
+        cons = call_with_retry("index_stock_cons_csindex", ak.index_stock_cons_csindex, symbol=options.index)
+        build_snapshot(options.date, cons["成分券代码"].astype(str).tolist())
+
+
+if __name__ == "__main__":
+    main()
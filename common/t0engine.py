@@ -0,0 +1,492 @@
+"""
+日线级别的 T+0（做T）回测引擎。
+
+sanfot0 / t0quant 下的脚本原来各自复制了一份逐行 iterrows 的做T循环，这里统一成一个引擎：
+- 开盘涨跌、盘中最高/最低是否触及阈值、成交价等与状态无关的量先按整列向量化算好；
+- 现金/持股这种前后依赖的状态递推放在一个紧凑的内核里跑（装了 numba 时会编译）；
+- 可买股数用闭式公式直接求出，代替原来 `while cash < ...: buy_shares -= 1` 的逐股递减。
+
+run_t0_intraday 用分钟线跑同样的规则：按预先算好的日偏移把分钟线切成一天一段，
+每天的开盘、收盘以及盘中第一次触及阈值的时刻都用整段数组运算求出，再交给同一个内核递推。
+
+sweep_t0 把参数网格放在数组的第一维上，一次递推就得到所有 (低开阈值, 高开阈值) 组合的结果。
+
+规则（rule）：
+- "offense"：低开买入一笔，盘中冲高卖出这一笔；高开卖出一笔（保留底仓），盘中回落用卖出所得买回；
+  平开时盘中下探买入、盘中冲高卖出一笔。对应 grapht0strategy*.py、differentratestatistics.py、zxpzqt0*.py
+- "offense_all"：同 offense，但高开和盘中冲高时卖出全部持仓。对应 lowtohighoffenset0strategy.py
+- "defense"：低开买入一笔、高开卖出一笔，不做盘中回转；平开时只在盘中冲高卖出全部持仓。
+  对应 highdefenselesslosst0strategy.py、xlshighdefenselesslosst0strategy.py
+
+参考价（reference）：
+- "prev_close"：涨跌幅相对昨收计算，盘中按阈值价成交（sanfot0 系列）
+- "open"：盘中涨跌幅相对开盘价计算，按当日最高/最低价成交（t0quant 系列）
+
+收盘前统一把持仓调整回底仓 base_shares。
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+except ImportError:  # 没装 numba 时退化为普通 Python 函数，结果完全一致，只是慢一些
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+RULES = {"offense": 0, "offense_all": 1, "defense": 2}
+OFFENSE, OFFENSE_ALL, DEFENSE = 0, 1, 2
+
+# 开盘分支
+LOW_OPEN, HIGH_OPEN, FLAT_OPEN = 0, 1, 2
+
+
+@njit(cache=True)
+def affordable_shares(shares, price, cash, fee_rate):
+    """
+    在现金约束下最多能买的股数（不超过 shares），等价于
+    `while cash < shares * price * (1 + fee_rate) and shares > 0: shares -= 1`。
+    """
+    if shares <= 0:
+        return shares
+    unit = price * (1 + fee_rate)
+    if cash >= shares * unit:
+        return shares
+    n = math.floor(cash / unit)
+    # 浮点除法可能差一股，按原来的比较方式校正
+    while n > 0 and cash < n * unit:
+        n -= 1
+    while n + 1 <= shares and cash >= (n + 1) * unit:
+        n += 1
+    return max(n, 0)
+
+
+@njit(cache=True)
+def sellable_shares(shares, held, base_shares):
+    """
+    保留底仓时最多能卖的股数，等价于
+    `while shares > held - base_shares and shares > 0: shares -= 1`。
+    """
+    if shares <= 0:
+        return shares
+    return max(min(shares, held - base_shares), 0)
+
+
+@njit(cache=True)
+def t0_kernel(branch, open_price, close_price, buy_low, buy_px, sell_high, sell_px,
+              cash, held, base_shares, buy_amount, fee_rate, stamp_duty_rate, rule,
+              out_cash, out_held, out_bought, out_sold, out_traded):
+    """
+    逐日递推现金和持股。除第一天外每一天都已在外面向量化算好：
+
+    :param branch: 开盘分支（LOW_OPEN / HIGH_OPEN / FLAT_OPEN），第一天为 -1 表示不交易
+    :param buy_low: 盘中是否跌到买入阈值
+    :param buy_px: 盘中买入成交价
+    :param sell_high: 盘中是否涨到卖出阈值
+    :param sell_px: 盘中卖出成交价
+    结果写入 out_* 数组（当日收盘后的现金、持股、买入股数、卖出股数、是否有交易）。
+    """
+    sell_keep = 1 - fee_rate - stamp_duty_rate
+    for i in range(len(branch)):
+        bought = 0
+        sold = 0
+        b = branch[i]
+        if b >= 0:
+            o = open_price[i]
+            if b == LOW_OPEN:
+                n = affordable_shares(int(buy_amount / o), o, cash, fee_rate)
+                if n > 0:
+                    cash -= n * o * (1 + fee_rate)
+                    held += n
+                    bought += n
+                    # 盘中冲高卖出刚买的这一笔
+                    if rule != DEFENSE and sell_high[i]:
+                        cash += n * sell_px[i] * sell_keep
+                        held -= n
+                        sold += n
+            elif b == HIGH_OPEN:
+                if rule == OFFENSE_ALL:
+                    s = held
+                else:
+                    s = sellable_shares(int(buy_amount / o), held, base_shares)
+                if s > 0:
+                    revenue = s * o * sell_keep
+                    cash += revenue
+                    held -= s
+                    sold += s
+                    # 盘中回落用卖出所得买回
+                    if rule != DEFENSE and buy_low[i]:
+                        n = affordable_shares(int(revenue / buy_px[i]), buy_px[i], cash, fee_rate)
+                        if n > 0:
+                            cash -= n * buy_px[i] * (1 + fee_rate)
+                            held += n
+                            bought += n
+            else:
+                if rule != DEFENSE and buy_low[i]:
+                    n = affordable_shares(int(buy_amount / buy_px[i]), buy_px[i], cash, fee_rate)
+                    if n > 0:
+                        cash -= n * buy_px[i] * (1 + fee_rate)
+                        held += n
+                        bought += n
+                elif sell_high[i]:
+                    if rule == OFFENSE:
+                        s = sellable_shares(int(buy_amount / sell_px[i]), held, base_shares)
+                    else:
+                        s = held
+                    if s > 0:
+                        cash += s * sell_px[i] * sell_keep
+                        held -= s
+                        sold += s
+
+            # 收盘前把持仓调整回底仓
+            c = close_price[i]
+            if held > base_shares:
+                s = held - base_shares
+                cash += s * c * sell_keep
+                held = base_shares
+                sold += s
+            elif held < base_shares:
+                n = affordable_shares(base_shares - held, c, cash, fee_rate)
+                if n > 0:
+                    cash -= n * c * (1 + fee_rate)
+                    held += n
+                    bought += n
+
+        out_cash[i] = cash
+        out_held[i] = held
+        out_bought[i] = bought
+        out_sold[i] = sold
+        out_traded[i] = bought > 0 or sold > 0
+
+
+def day_signals(open_price, high_price, low_price, close_price, open_threshold_low, open_threshold_high,
+                stop_loss_threshold, intraday_threshold, reference="prev_close"):
+    """
+    按整列计算每天的开盘分支、盘中是否触及阈值以及成交价。
+
+    :return: (branch, buy_low, buy_px, sell_high, sell_px)
+    """
+    prev_close = np.empty_like(close_price)
+    prev_close[0] = np.nan
+    prev_close[1:] = close_price[:-1]
+
+    open_return = (open_price - prev_close) / prev_close
+    branch = np.where(open_return <= open_threshold_low, LOW_OPEN,
+                      np.where(open_return >= open_threshold_high, HIGH_OPEN, FLAT_OPEN)).astype(np.int8)
+    branch[0] = -1
+
+    if reference == "prev_close":
+        buy_low = (low_price - prev_close) / prev_close <= stop_loss_threshold
+        sell_high = (high_price - prev_close) / prev_close >= intraday_threshold
+        buy_px = prev_close * (1 + stop_loss_threshold)
+        sell_px = prev_close * (1 + intraday_threshold)
+    elif reference == "open":
+        buy_low = (low_price - open_price) / open_price <= stop_loss_threshold
+        sell_high = (high_price - open_price) / open_price >= intraday_threshold
+        buy_px = low_price.copy()
+        sell_px = high_price.copy()
+    else:
+        raise ValueError(f"未知的参考价: {reference}")
+    return branch, buy_low, buy_px, sell_high, sell_px
+
+
+def run_t0(stock_data: pd.DataFrame, rule: str = "offense", initial_cash: float = 10000, shares_held: int = 1000,
+           buy_amount: float = 10000, open_threshold_low: float = -0.006, open_threshold_high: float = 0.014,
+           stop_loss_threshold: float = None, intraday_threshold: float = None, fee_rate: float = 0.0002,
+           stamp_duty_rate: float = 0.0005, reference: str = "prev_close") -> pd.DataFrame:
+    """
+    对一只股票的日线跑一次做T回测。
+
+    :param stock_data: akshare 日线数据（含 开盘/收盘/最高/最低 列，按日期升序）
+    :param rule: "offense" / "offense_all" / "defense"
+    :param initial_cash: 初始现金
+    :param shares_held: 初始持股，同时作为收盘前要恢复的底仓
+    :param buy_amount: 每笔买卖的金额
+    :param open_threshold_low: 早盘低开阈值
+    :param open_threshold_high: 早盘高开阈值
+    :param stop_loss_threshold: 盘中跌幅阈值，默认等于 open_threshold_low
+    :param intraday_threshold: 盘中涨幅阈值，默认等于 open_threshold_high
+    :param fee_rate: 手续费率
+    :param stamp_duty_rate: 印花税率（只在卖出时计算）
+    :param reference: "prev_close" / "open"，见模块说明
+    :return: 每日结果 DataFrame，列为 cash / shares / bought / sold / traded / profit（当日现金变化）
+    """
+    stop_loss_threshold = open_threshold_low if stop_loss_threshold is None else stop_loss_threshold
+    intraday_threshold = open_threshold_high if intraday_threshold is None else intraday_threshold
+
+    open_price = stock_data['开盘'].to_numpy(dtype=np.float64)
+    high_price = stock_data['最高'].to_numpy(dtype=np.float64)
+    low_price = stock_data['最低'].to_numpy(dtype=np.float64)
+    close_price = stock_data['收盘'].to_numpy(dtype=np.float64)
+
+    branch, buy_low, buy_px, sell_high, sell_px = day_signals(
+        open_price, high_price, low_price, close_price, open_threshold_low, open_threshold_high,
+        stop_loss_threshold, intraday_threshold, reference)
+
+    n = len(close_price)
+    out_cash = np.empty(n, dtype=np.float64)
+    out_held = np.empty(n, dtype=np.int64)
+    out_bought = np.empty(n, dtype=np.int64)
+    out_sold = np.empty(n, dtype=np.int64)
+    out_traded = np.empty(n, dtype=np.bool_)
+    t0_kernel(branch, open_price, close_price, buy_low, buy_px, sell_high, sell_px,
+              float(initial_cash), int(shares_held), int(shares_held), float(buy_amount), float(fee_rate),
+              float(stamp_duty_rate), RULES[rule], out_cash, out_held, out_bought, out_sold, out_traded)
+
+    profit = np.diff(out_cash, prepend=float(initial_cash))
+    return pd.DataFrame({
+        "cash": out_cash,
+        "shares": out_held,
+        "bought": out_bought,
+        "sold": out_sold,
+        "traded": out_traded,
+        "profit": profit,
+    }, index=stock_data.index)
+
+
+NS_PER_DAY = 86_400_000_000_000
+
+
+def day_offsets(ts) -> np.ndarray:
+    """
+    按交易日切分分钟线的偏移：第 i 天的分钟线是 [offsets[i], offsets[i + 1])。
+
+    :param ts: 升序的 int64 纳秒时间戳（本地时间）
+    :return: 长度为 天数 + 1 的 int64 数组
+    """
+    day = np.asarray(ts, dtype=np.int64) // NS_PER_DAY
+    return np.concatenate(([0], np.flatnonzero(day[1:] != day[:-1]) + 1, [len(day)])).astype(np.int64)
+
+
+def intraday_signals(offsets, open_price, high_price, low_price, close_price, open_threshold_low,
+                     open_threshold_high, stop_loss_threshold, intraday_threshold):
+    """
+    由分钟线按天计算开盘分支、盘中是否触及阈值以及成交价，返回值与 day_signals 相同，按天对齐。
+
+    盘中涨跌幅相对当天开盘价计算。触及阈值时按阈值价成交，触发的那一分钟开盘就已越过阈值时按该分钟开盘价成交；
+    平开的日子买卖两边都可能触发，按分钟先后只做先触发的一边（同一分钟都触发时先买）。
+    :param offsets: day_offsets 的结果
+    :return: (day_open, day_close, branch, buy_low, buy_px, sell_high, sell_px)
+    """
+    starts = offsets[:-1]
+    bar_day = np.repeat(np.arange(len(starts)), np.diff(offsets))
+    day_open = open_price[starts]
+    day_close = close_price[offsets[1:] - 1]
+
+    prev_close = np.empty_like(day_close)
+    prev_close[0] = np.nan
+    prev_close[1:] = day_close[:-1]
+    open_return = (day_open - prev_close) / prev_close
+    branch = np.where(open_return <= open_threshold_low, LOW_OPEN,
+                      np.where(open_return >= open_threshold_high, HIGH_OPEN, FLAT_OPEN)).astype(np.int8)
+    branch[0] = -1
+
+    # 每天第一次触及阈值的分钟位置，没有触及记为 never
+    bar_open = day_open[bar_day]
+    position = np.arange(len(close_price))
+    never = len(close_price)
+    first_buy = np.minimum.reduceat(np.where((low_price - bar_open) / bar_open <= stop_loss_threshold, position, never), starts)
+    first_sell = np.minimum.reduceat(np.where((high_price - bar_open) / bar_open >= intraday_threshold, position, never), starts)
+
+    buy_low = first_buy < never
+    sell_high = first_sell < never
+    buy_px = np.minimum(day_open * (1 + stop_loss_threshold), open_price[np.minimum(first_buy, never - 1)])
+    sell_px = np.maximum(day_open * (1 + intraday_threshold), open_price[np.minimum(first_sell, never - 1)])
+    buy_low = np.where(branch == FLAT_OPEN, buy_low & (first_buy <= first_sell), buy_low)
+    return day_open, day_close, branch, buy_low, buy_px, sell_high, sell_px
+
+
+def run_t0_intraday(bars: pd.DataFrame, rule: str = "offense", initial_cash: float = 10000, shares_held: int = 1000,
+                    buy_amount: float = 10000, open_threshold_low: float = -0.005, open_threshold_high: float = 0.005,
+                    stop_loss_threshold: float = None, intraday_threshold: float = None, fee_rate: float = 0.0002,
+                    stamp_duty_rate: float = 0.0005) -> pd.DataFrame:
+    """
+    对一只股票的分钟线跑一次做T回测，每个交易日的分钟线作为一段数组整体处理，不逐分钟循环。
+
+    :param bars: 分钟线（时间索引升序，含 open / high / low / close 列），见 common.minutestore
+    :param rule: "offense" / "offense_all" / "defense"
+    其余参数同 run_t0
+    :return: 每个交易日一行（索引为日期），列同 run_t0
+    """
+    stop_loss_threshold = open_threshold_low if stop_loss_threshold is None else stop_loss_threshold
+    intraday_threshold = open_threshold_high if intraday_threshold is None else intraday_threshold
+
+    ts = bars.index.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    offsets = day_offsets(ts)
+    day_open, day_close, branch, buy_low, buy_px, sell_high, sell_px = intraday_signals(
+        offsets, bars['open'].to_numpy(dtype=np.float64), bars['high'].to_numpy(dtype=np.float64),
+        bars['low'].to_numpy(dtype=np.float64), bars['close'].to_numpy(dtype=np.float64),
+        open_threshold_low, open_threshold_high, stop_loss_threshold, intraday_threshold)
+
+    n = len(day_close)
+    out_cash = np.empty(n, dtype=np.float64)
+    out_held = np.empty(n, dtype=np.int64)
+    out_bought = np.empty(n, dtype=np.int64)
+    out_sold = np.empty(n, dtype=np.int64)
+    out_traded = np.empty(n, dtype=np.bool_)
+    t0_kernel(branch, day_open, day_close, buy_low, buy_px, sell_high, sell_px,
+              float(initial_cash), int(shares_held), int(shares_held), float(buy_amount), float(fee_rate),
+              float(stamp_duty_rate), RULES[rule], out_cash, out_held, out_bought, out_sold, out_traded)
+
+    profit = np.diff(out_cash, prepend=float(initial_cash))
+    return pd.DataFrame({
+        "cash": out_cash,
+        "shares": out_held,
+        "bought": out_bought,
+        "sold": out_sold,
+        "traded": out_traded,
+        "profit": profit,
+    }, index=pd.DatetimeIndex(ts[offsets[:-1]].view("datetime64[ns]")).normalize())
+
+
+def summarize(stock_data: pd.DataFrame, days: pd.DataFrame, initial_cash: float) -> dict:
+    """
+    汇总成脚本里原来打印的统计量。亏损/盈利按当日现金变化判断（现金不增即计为亏损）。
+    """
+    traded = days['traded'].to_numpy()
+    profit = days['profit'].to_numpy()
+    return {
+        "total_trading_days": len(days),
+        "total_return": stock_data['收盘'].iloc[-1] / stock_data['开盘'].iloc[0] - 1,
+        "final_return": days['cash'].iloc[-1] / initial_cash - 1,
+        "days_with_trades": int(traded.sum()),
+        "days_with_profit": int((traded & (profit > 0)).sum()),
+        "days_with_loss": int((traded & (profit <= 0)).sum()),
+    }
+
+
+def _affordable_grid(shares, price, cash, fee_rate):
+    """affordable_shares 的向量版本，shares / price / cash 可以是同形状的数组或标量。"""
+    unit = price * (1 + fee_rate)
+    n = np.floor(cash / unit)
+    # 浮点除法可能差一股，按原来的比较方式校正
+    n = np.where(cash < n * unit, n - 1, n)
+    n = np.where(cash >= (n + 1) * unit, n + 1, n)
+    return np.minimum(shares, np.maximum(n, 0)).astype(np.int64)
+
+
+def sweep_t0(stock_data: pd.DataFrame, lows, highs, rule: str = "offense", initial_cash: float = 10000,
+             shares_held: int = 1000, buy_amount: float = 10000, fee_rate: float = 0.0002,
+             stamp_duty_rate: float = 0.0005, reference: str = "prev_close") -> pd.DataFrame:
+    """
+    对 lows × highs 的全部阈值组合跑做T回测，盘中阈值分别取对应的低开/高开阈值（与参数扫描脚本一致）。
+
+    每个组合占数组第一维上的一个位置，逐日递推时所有组合一起做向量运算，
+    不需要为每个组合各跑一遍 run_t0，也不保存逐日路径，100×100 的网格跑几年数据也很快。
+    :param stock_data: akshare 日线数据（含 开盘/收盘/最高/最低 列，按日期升序）
+    :param lows: 低开阈值序列
+    :param highs: 高开阈值序列
+    :return: 每个组合一行，列为 open_threshold_low / open_threshold_high / total_trading_days / total_return /
+             final_return / days_with_trades / days_with_profit / days_with_loss
+    """
+    rule = RULES[rule]
+    low_grid, high_grid = np.meshgrid(np.asarray(lows, dtype=np.float64), np.asarray(highs, dtype=np.float64), indexing="ij")
+    low_grid, high_grid = low_grid.ravel(), high_grid.ravel()
+    k = len(low_grid)
+
+    open_price = stock_data['开盘'].to_numpy(dtype=np.float64)
+    high_price = stock_data['最高'].to_numpy(dtype=np.float64)
+    low_price = stock_data['最低'].to_numpy(dtype=np.float64)
+    close_price = stock_data['收盘'].to_numpy(dtype=np.float64)
+    if reference not in ("prev_close", "open"):
+        raise ValueError(f"未知的参考价: {reference}")
+
+    sell_keep = 1 - fee_rate - stamp_duty_rate
+    base_shares = int(shares_held)
+    cash = np.full(k, float(initial_cash))
+    held = np.full(k, base_shares, dtype=np.int64)
+    days_with_trades = np.zeros(k, dtype=np.int64)
+    days_with_profit = np.zeros(k, dtype=np.int64)
+    zero = np.zeros(k, dtype=np.int64)
+
+    for i in range(1, len(close_price)):
+        prev, o, c = close_price[i - 1], open_price[i], close_price[i]
+        open_return = (o - prev) / prev
+        low_open = open_return <= low_grid
+        high_open = ~low_open & (open_return >= high_grid)
+        flat_open = ~low_open & ~high_open
+        if reference == "prev_close":
+            buy_low = (low_price[i] - prev) / prev <= low_grid
+            sell_high = (high_price[i] - prev) / prev >= high_grid
+            buy_px = prev * (1 + low_grid)
+            sell_px = (1 + high_grid) * prev
+        else:
+            buy_low = (low_price[i] - o) / o <= low_grid
+            sell_high = (high_price[i] - o) / o >= high_grid
+            buy_px = np.full(k, low_price[i])
+            sell_px = np.full(k, high_price[i])
+
+        old_cash = cash.copy()
+        bought = zero.copy()
+        sold = zero.copy()
+
+        # 早盘低开：买入一笔，盘中冲高卖出这一笔
+        n = np.where(low_open, _affordable_grid(int(buy_amount / o), o, cash, fee_rate), 0)
+        cash -= n * o * (1 + fee_rate)
+        held += n
+        bought += n
+        if rule != DEFENSE:
+            s = np.where(sell_high, n, 0)
+            cash += s * sell_px * sell_keep
+            held -= s
+            sold += s
+
+        # 早盘高开：卖出，盘中回落用卖出所得买回
+        s = held if rule == OFFENSE_ALL else np.maximum(np.minimum(int(buy_amount / o), held - base_shares), 0)
+        s = np.where(high_open, s, 0)
+        revenue = s * o * sell_keep
+        cash += revenue
+        held -= s
+        sold += s
+        if rule != DEFENSE:
+            n = _affordable_grid(np.floor(revenue / buy_px), buy_px, cash, fee_rate)
+            n = np.where(high_open & (s > 0) & buy_low, n, 0)
+            cash -= n * buy_px * (1 + fee_rate)
+            held += n
+            bought += n
+
+        # 平开：盘中下探买入或冲高卖出
+        if rule != DEFENSE:
+            n = np.where(flat_open & buy_low, _affordable_grid(np.floor(buy_amount / buy_px), buy_px, cash, fee_rate), 0)
+            cash -= n * buy_px * (1 + fee_rate)
+            held += n
+            bought += n
+            sell_now = flat_open & ~buy_low & sell_high
+        else:
+            sell_now = flat_open & sell_high
+        if rule == OFFENSE:
+            s = np.maximum(np.minimum(np.floor(buy_amount / sell_px).astype(np.int64), held - base_shares), 0)
+        else:
+            s = held
+        s = np.where(sell_now, s, 0)
+        cash += s * sell_px * sell_keep
+        held -= s
+        sold += s
+
+        # 收盘前把持仓调整回底仓
+        s = np.maximum(held - base_shares, 0)
+        cash += s * c * sell_keep
+        held -= s
+        sold += s
+        n = np.where(held < base_shares, _affordable_grid(base_shares - held, c, cash, fee_rate), 0)
+        cash -= n * c * (1 + fee_rate)
+        held += n
+        bought += n
+
+        traded = (bought > 0) | (sold > 0)
+        days_with_trades += traded
+        days_with_profit += traded & (cash > old_cash)
+
+    return pd.DataFrame({
+        "open_threshold_low": low_grid,
+        "open_threshold_high": high_grid,
+        "total_trading_days": len(close_price),
+        "total_return": close_price[-1] / open_price[0] - 1,
+        "final_return": cash / initial_cash - 1,
+        "days_with_trades": days_with_trades,
+        "days_with_profit": days_with_profit,
+        "days_with_loss": days_with_trades - days_with_profit,
+    })
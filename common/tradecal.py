@@ -0,0 +1,151 @@
+"""
+A 股交易日历。
+
+交易日历从新浪接口 `tool_trade_date_hist_sina` 下载一次后缓存到本地仓库，
+内存里保存为升序的 int32 日序号数组（自 1970-01-01 起的天数），
+另外预先算好“每个自然日 -> 不晚于它的最后一个交易日的位置”的直接索引表，
+prev / next / shift / range 都是 O(1) 的数组下标运算。
+
+    from common.tradecal import get_calendar
+    cal = get_calendar()
+    cal.shift("2024-11-25", -99)          # 往前数 100 个交易日（含当天）的那一天
+    cal.range("20241101", "20241130")     # 区间内的交易日
+"""
+import os
+import threading
+
+import akshare as ak
+import numpy as np
+import pandas as pd
+
+from common.barstore import STORE_DIR, to_timestamp
+from common.fetcher import call_with_retry
+
+CALENDAR_PATH = os.path.join(STORE_DIR, "calendar", "trade_dates.npy")
+
+NS_PER_DAY = 86400 * 10 ** 9
+
+
+def day_number(date) -> int:
+    """日期 -> 自 1970-01-01 起的天数。"""
+    return int(to_timestamp(date).value // NS_PER_DAY)
+
+
+def from_day_number(day: int) -> pd.Timestamp:
+    """自 1970-01-01 起的天数 -> 日期。"""
+    return pd.Timestamp(int(day) * NS_PER_DAY)
+
+
+class TradeCalendar:
+    """
+    :param days: 升序的交易日日序号数组
+    """
+
+    def __init__(self, days: np.ndarray):
+        self.days = np.asarray(days, dtype=np.int32)
+        self.first = int(self.days[0])
+        self.last = int(self.days[-1])
+        # floor[d - first]：不晚于自然日 d 的最后一个交易日在 days 中的位置
+        marks = np.zeros(self.last - self.first + 1, dtype=np.int32)
+        marks[self.days - self.first] = 1
+        self._floor = np.cumsum(marks, dtype=np.int32) - 1
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def position(self, date) -> int:
+        """不晚于 date 的最后一个交易日在日历中的位置；早于日历起点返回 -1。"""
+        d = day_number(date)
+        if d < self.first:
+            return -1
+        if d > self.last:
+            raise ValueError(f"{to_timestamp(date):%Y-%m-%d} 超出交易日历范围（最后一天 {from_day_number(self.last):%Y-%m-%d}）")
+        return int(self._floor[d - self.first])
+
+    def _day_at(self, pos: int) -> pd.Timestamp:
+        if pos < 0 or pos >= len(self.days):
+            raise ValueError(f"交易日位置 {pos} 超出交易日历范围")
+        return from_day_number(self.days[pos])
+
+    def is_trading_day(self, date) -> bool:
+        """date 是否为交易日。"""
+        d = day_number(date)
+        return self.first <= d <= self.last and int(self.days[self._floor[d - self.first]]) == d
+
+    def prev(self, date, inclusive: bool = True) -> pd.Timestamp:
+        """
+        最近的交易日。
+
+        :param date: 日期
+        :param inclusive: date 本身是交易日时是否直接返回它
+        """
+        pos = self.position(date)
+        if not inclusive and pos >= 0 and self.days[pos] == day_number(date):
+            pos -= 1
+        return self._day_at(pos)
+
+    def next(self, date, inclusive: bool = True) -> pd.Timestamp:
+        """
+        下一个交易日。
+
+        :param date: 日期
+        :param inclusive: date 本身是交易日时是否直接返回它
+        """
+        pos = self.position(date)
+        if not (inclusive and pos >= 0 and self.days[pos] == day_number(date)):
+            pos += 1
+        return self._day_at(pos)
+
+    def shift(self, date, n: int) -> pd.Timestamp:
+        """
+        以不晚于 date 的最后一个交易日为起点，前后移动 n 个交易日。
+        例如 shift(date, -(M - 1)) 就是“最近 M 个交易日”窗口的第一天。
+        """
+        return self._day_at(self.position(date) + n)
+
+    def range(self, start, end) -> pd.DatetimeIndex:
+        """[start, end] 内的全部交易日。"""
+        lo = self.position(self.next(start)) if day_number(start) >= self.first else 0
+        hi = self.position(end)
+        return pd.DatetimeIndex(self.days[lo:hi + 1].astype(np.int64) * NS_PER_DAY)
+
+    def count(self, start, end) -> int:
+        """[start, end] 内的交易日数。"""
+        return len(self.range(start, end))
+
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def _download() -> np.ndarray:
+    trade_date_df = call_with_retry("tool_trade_date_hist_sina", ak.tool_trade_date_hist_sina)
+    dates = pd.to_datetime(trade_date_df['trade_date'])
+    return np.sort((dates.to_numpy().astype("datetime64[D]").astype(np.int64)).astype(np.int32))
+
+
+def get_calendar(refresh: bool = False) -> TradeCalendar:
+    """
+    返回进程内共享的交易日历。
+
+    本地缓存已覆盖到今天之后（新浪日历包含当年剩余的交易日）时直接使用，否则重新下载；
+    下载失败但有旧缓存时继续用旧缓存。
+    :param refresh: 是否强制重新下载
+    """
+    global _calendar
+    with _calendar_lock:
+        if _calendar is not None and not refresh:
+            return _calendar
+
+        days = np.load(CALENDAR_PATH) if os.path.exists(CALENDAR_PATH) else None
+        if refresh or days is None or int(days[-1]) < day_number(pd.Timestamp.now()):
+            try:
+                days = _download()
+                os.makedirs(os.path.dirname(CALENDAR_PATH), exist_ok=True)
+                np.save(CALENDAR_PATH, days)
+            except Exception as e:
+                if days is None:
+                    raise
+                print(f"交易日历更新失败，使用本地缓存: {e}")
+        _calendar = TradeCalendar(days)
+        return _calendar
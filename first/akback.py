@@ -1,8 +1,13 @@
 from datetime import datetime
-import akshare as ak
+from functools import partial
 import backtrader as bt
 import matplotlib.pyplot as plt
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.barstore import stock_zh_a_hist
+from common.parallel import SharedArrays, arrays_to_frame, frame_to_arrays, sweep
 
 plt.rcParams["font.sans-serif"] = ["SimHei"]
 plt.rcParams["axes.unicode_minus"] = False
@@ -58,11 +63,21 @@ class MyStrategy(bt.Strategy):
         self.log("(MA均线： %2d日) 期末总资金 %.2f" % (self.params.maperiod, self.broker.getvalue()), do_print=True)
 
 
-def main(code="600070", start_cash=1000000, stake=100, commission_fee=0.001):
+def run_backtest(arrays, maperiod, start_date, end_date, start_cash, stake, commission_fee):
+    """在工作进程里用共享内存中的行情跑一个均线参数，返回期末总资金。"""
     cerebro = bt.Cerebro()
-    cerebro.optstrategy(MyStrategy, maperiod=range(3, 31))
+    cerebro.addstrategy(MyStrategy, maperiod=maperiod)
+    data = bt.feeds.PandasData(dataname=arrays_to_frame(arrays), fromdate=start_date, todate=end_date)
+    cerebro.adddata(data)
+    cerebro.broker.setcash(start_cash)
+    cerebro.broker.setcommission(commission=commission_fee)
+    cerebro.addsizer(bt.sizers.FixedSize, stake=stake)
+    cerebro.run()
+    return cerebro.broker.getvalue()
+
 
-    stock_hfq_df = ak.stock_zh_a_hist(symbol=code, adjust="hfq", start_date='20000101', end_date='20210617').iloc[:, :6]
+def main(code="600070", start_cash=1000000, stake=100, commission_fee=0.001):
+    stock_hfq_df = stock_zh_a_hist(symbol=code, adjust="hfq", start_date='20000101', end_date='20210617').iloc[:, :6]
     stock_hfq_df.columns = ['date', 'open', 'close', 'high', 'low', 'volume']
     stock_hfq_df[['open', 'close', 'high', 'low', 'volume']] = stock_hfq_df[['open', 'close', 'high', 'low', 'volume']].astype(float)
     stock_hfq_df.index = pd.to_datetime(stock_hfq_df['date'])
@@ -70,15 +85,16 @@ def main(code="600070", start_cash=1000000, stake=100, commission_fee=0.001):
 
     start_date = datetime(2000, 1, 1)  # 回测开始时间
     end_date = datetime(2021, 6, 16)  # 回测结束时间
-    data = bt.feeds.PandasData(dataname=stock_hfq_df, fromdate=start_date, todate=end_date)
-    cerebro.adddata(data)
-    cerebro.broker.setcash(start_cash)
-    cerebro.broker.setcommission(commission=commission_fee)
-    cerebro.addsizer(bt.sizers.FixedSize, stake=stake)
-    
-    print("期初总资金: %.2f" % cerebro.broker.getvalue())
-    cerebro.run(maxcpus=1)
-    print("期末总资金: %.2f" % cerebro.broker.getvalue())
+
+    print("期初总资金: %.2f" % start_cash)
+    # 行情只放进共享内存一次，各个均线参数分到多个进程里跑
+    run = partial(run_backtest, start_date=start_date, end_date=end_date, start_cash=start_cash, stake=stake, commission_fee=commission_fee)
+    results = {}
+    with SharedArrays(frame_to_arrays(stock_hfq_df)) as shared:
+        for maperiod, value in sweep(run, range(3, 31), shared):
+            results[maperiod] = value
+    best = max((p for p in results if results[p] is not None), key=results.get)
+    print("最优均线: %2d日, 期末总资金: %.2f" % (best, results[best]))
 
 if __name__ == '__main__':
     main(code="600070", start_cash=1000000, stake=100, commission_fee=0.001)
@@ -1,14 +1,17 @@
 from datetime import datetime
 import backtrader as bt
 import matplotlib.pyplot as plt
-import akshare as ak
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.barstore import stock_zh_a_hist
 
 plt.rcParams["font.sans-serif"] = ["SimHei"]
 plt.rcParams["axes.unicode_minus"] = False
 
 # Fetch the stock data
-stock_hfq_df = ak.stock_zh_a_hist(symbol="000001", adjust="hfq").iloc[:, :6]
+stock_hfq_df = stock_zh_a_hist(symbol="000001", adjust="hfq").iloc[:, :6]
 # Rename columns
 stock_hfq_df.columns = ['date', 'open', 'close', 'high', 'low', 'volume']
 # Convert 'date' column to datetime
@@ -1,7 +1,15 @@
-import akshare as ak  # 引入 AkShare 库，用于获取股票和指数数据
+import numpy as np  # 引入 NumPy 库，用于面板模式的向量化计算
 import pandas as pd  # 引入 Pandas 库，用于数据处理
 from concurrent.futures import ThreadPoolExecutor, as_completed  # 引入并发库，用于多线程加速
 from tqdm import tqdm  # 引入 tqdm 库，用于显示进度条
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.barstore import stock_zh_a_hist, index_zh_a_hist
+from common.constituents import constituent_store
+from common.detectors import down_streak, lookback, new_high_within
+from common.panel import load_panel, shift
+from common.tradecal import get_calendar
 
 # 假设的交易费用率（0.1%）
 TRANSACTION_FEE = 0.0005
@@ -21,24 +29,21 @@ def is_new_high(stock_code: str, date_str: str, N: int, M: int) -> bool:
         # 将字符串日期转换为 Pandas 日期类型
         current_date = pd.to_datetime(date_str)
         
-        # 动态扩展获取的历史数据范围
-        lookback_days = M * 2  # 初始回溯天数，考虑非交易日
-        while True:
-            start_date = (current_date - pd.Timedelta(days=lookback_days)).strftime("%Y%m%d")
-            # **获取股票历史数据**
-            stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, adjust="hfq")
-            
-            # 检查数据是否足够
-            if not stock_df.empty and len(stock_df) >= M:
-                stock_df = stock_df.tail(M)  # 取过去 M 天的数据
-                stock_df['close'] = stock_df['收盘'].astype(float)  # 提取收盘价并转为浮点型
-                historical_high = stock_df['close'].max()  # 计算 M 天内的最高价
-                recent_high = stock_df['close'].iloc[-N:].max()  # 计算最近 N 天的最高价
-                
-                # 判断最近 N 天最高价是否等于过去 M 天最高价
-                return recent_high == historical_high
+        # 最近 M 根有行情的 bar 在最近 lookback(M) 个交易日里找，停牌日不算，和面板模式一致
+        start_date = get_calendar().shift(current_date, -(lookback(M) - 1)).strftime("%Y%m%d")
+        # **获取股票历史数据**
+        stock_df = stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=current_date.strftime("%Y%m%d"), adjust="hfq")
+        
+        # 检查数据是否足够
+        if not stock_df.empty and len(stock_df) >= M:
+            stock_df = stock_df.tail(M)  # 取过去 M 天的数据
+            stock_df['close'] = stock_df['收盘'].astype(float)  # 提取收盘价并转为浮点型
+            historical_high = stock_df['close'].max()  # 计算 M 天内的最高价
+            recent_high = stock_df['close'].iloc[-N:].max()  # 计算最近 N 天的最高价
             
-            lookback_days += M  # 如果数据不足，扩大回溯范围
+            # 判断最近 N 天最高价是否等于过去 M 天最高价
+            return recent_high == historical_high
+        return False  # 上市不久或长期停牌，凑不齐 M 根 bar
     except Exception as e:
         print(f"Error checking stock {stock_code}: {e}")
         return False
@@ -55,21 +60,18 @@ def is_nday_minus(stock_code: str, date_str: str, N: int) -> bool:
     """
     try:
         current_date = pd.to_datetime(date_str)  # 将字符串日期转换为 Pandas 日期
-        lookback_days = N * 2  # 初始回溯天数
+        # 最近 N 根有行情的 bar 在最近 lookback(N) 个交易日里找，停牌日不算，和面板模式一致
+        start_date = get_calendar().shift(current_date, -(lookback(N) - 1)).strftime("%Y%m%d")
+        # **获取股票历史数据**
+        stock_df = stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=current_date.strftime("%Y%m%d"), adjust="hfq")
         
-        while True:
-            start_date = (current_date - pd.Timedelta(days=lookback_days)).strftime("%Y%m%d")
-            # **获取股票历史数据**
-            stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, adjust="hfq")
-            
-            if not stock_df.empty and len(stock_df) >= N:
-                stock_df = stock_df.tail(N)  # 取最近 N 天的数据
-                stock_df['fail'] = stock_df['涨跌幅'].astype(float)  # 提取涨跌幅并转为浮点型
-                
-                # 判断最近 N 天是否全部为负涨跌幅
-                return all(fail < 0.0 for fail in stock_df['fail'])
+        if not stock_df.empty and len(stock_df) >= N:
+            stock_df = stock_df.tail(N)  # 取最近 N 天的数据
+            stock_df['fail'] = stock_df['涨跌幅'].astype(float)  # 提取涨跌幅并转为浮点型
             
-            lookback_days += N  # 数据不足时扩大回溯范围
+            # 判断最近 N 天是否全部为负涨跌幅
+            return all(fail < 0.0 for fail in stock_df['fail'])
+        return False  # 上市不久或长期停牌，凑不齐 N 根 bar
     except Exception as e:
         print(f"Error checking stock {stock_code}: {e}")
         return False
@@ -86,10 +88,10 @@ def index_performance(vsindex_days: int, stock_market: str, date_str: str) -> fl
     """
     try:
         current_date = pd.to_datetime(date_str)  # 转换日期
-        start_date = (current_date - pd.Timedelta(days=vsindex_days * 2)).strftime("%Y%m%d")  # 开始日期
+        start_date = get_calendar().shift(current_date, -vsindex_days).strftime("%Y%m%d")  # 开始日期
         end_date = current_date.strftime("%Y%m%d")  # 结束日期
         # **获取指数历史数据**
-        index_df = ak.index_zh_a_hist(symbol=stock_market, period="daily", start_date=start_date, end_date=end_date)
+        index_df = index_zh_a_hist(symbol=stock_market, period="daily", start_date=start_date, end_date=end_date)
         
         if index_df.empty:
             print(f"警告: 指数 {stock_market} 在过去 {vsindex_days} 天内没有数据")
@@ -123,12 +125,12 @@ def stock_performance(vsindex_days: int, stock_code: str, date_str: str) -> floa
         # 将输入的日期字符串转换为日期类型
         current_date = pd.to_datetime(date_str)
         
-        # 设置开始日期（抓取范围比交易日多，以适应可能的非交易日）
-        start_date = (current_date - pd.Timedelta(days=vsindex_days * 2)).strftime("%Y%m%d")
+        # 设置开始日期：从交易日历上往前数 vsindex_days 个交易日
+        start_date = get_calendar().shift(current_date, -vsindex_days).strftime("%Y%m%d")
         end_date = current_date.strftime("%Y%m%d")
         
         # 获取股票的历史数据，为了避免除权除息！后复权！会导致与同花顺查询结果的不同
-        stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=end_date, adjust="hfq")
+        stock_df = stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=end_date, adjust="hfq")
         
         # 检查数据是否为空
         if stock_df.empty:
@@ -180,7 +182,7 @@ def fetch_stock_data(stock: str, date_str: str, minus: float, minus_days: int, n
         end_date = current_date.strftime("%Y%m%d")
         
         # 获取股票的日线历史数据
-        stock_df = ak.stock_zh_a_hist(
+        stock_df = stock_zh_a_hist(
             symbol=stock, period="daily", start_date=start_date, end_date=end_date, adjust="qfq"
         )
         
@@ -234,8 +236,7 @@ def findstocks(stock_market: str, date_str: str, minus: float, nday_minus: int,
         current_date = pd.to_datetime(date_str)  # 转换日期
         
         # 获取股票成分股列表
-        index_stocks_df = ak.index_stock_cons_csindex(symbol=stock_market)
-        index_stocks_df['stock'] = index_stocks_df['成分券代码'].astype(str)  # 提取成分券代码
+        index_stocks = constituent_store.members(stock_market, current_date)  # 当天的成分股
         
         # **计算指数涨幅**
         index_performance_value = index_performance(vs_index_days, stock_market, date_str)
@@ -260,7 +261,7 @@ def findstocks(stock_market: str, date_str: str, minus: float, nday_minus: int,
                     vs_index_days,
                     index_performance_value,
                     excess
-                ) for stock in index_stocks_df['stock']
+                ) for stock in index_stocks
             ]
             # 使用 tqdm 显示进度条
             for future in tqdm(as_completed(futures), total=len(futures), desc="Processing stocks"):
@@ -274,7 +275,93 @@ def findstocks(stock_market: str, date_str: str, minus: float, nday_minus: int,
         print(f"获取股票 {stock_market} 数据时出错: {e}")
         return pd.DataFrame()
 
-def backtest(stock_market: str, start_date: str, end_date: str, initial_capital: float, minus: float, nday_minus: int, nday_new_high: int, total_new_high: int, vs_index_days: int, excess: int) -> pd.DataFrame:
+def panel_masks(panel, index_close: np.ndarray, minus: float, nday_minus: int, nday_new_high: int, total_new_high: int, vs_index_days: int, excess: int) -> np.ndarray:
+    """
+    面板模式：一次算出所有日期、所有股票是否满足 findstocks 的全部条件。
+
+    :param panel: 后复权 close / pct_chg 面板
+    :param index_close: 与面板日期对齐的指数收盘价
+    :param minus: 筛选跌幅的阈值
+    :param nday_minus: 连续跌幅天数
+    :param nday_new_high: 新高阈值
+    :param total_new_high: 总新高次数
+    :param vs_index_days: 对比指数几天来
+    :param excess: 跑赢指数的超额收益要求
+    :return: 形状为 (日期数, 股票数) 的布尔矩阵
+    """
+    close = panel['close']
+    pct = panel['pct_chg']
+    with np.errstate(invalid='ignore'):
+        # 当日跌幅：创业板/科创板跌幅下限 -19.9%，其余 -9.9%（排除跌停）
+        limit = np.where([s.startswith("3") or s.startswith("68") for s in panel.symbols], -19.9, -9.9)
+        drop = (pct <= minus) & (pct >= limit)
+
+        # 最近 nday_minus 个交易日全部下跌
+        nday = down_streak(pct, nday_minus)
+
+        # 最近 nday_new_high 天的最高收盘价等于 total_new_high 天的最高收盘价
+        new_high = new_high_within(close, nday_new_high, total_new_high)
+
+        # vs_index_days 个交易日的涨幅跑赢指数 excess 个百分点
+        stock_perf = (close / shift(close, vs_index_days) - 1) * 100
+        index_perf = (index_close / shift(index_close, vs_index_days) - 1) * 100
+        beat = stock_perf >= (index_perf + excess)[:, None]
+
+    return drop & nday & new_high & beat
+
+def backtest_panel(stock_market: str, start_date: str, end_date: str, initial_capital: float, minus: float, nday_minus: int, nday_new_high: int, total_new_high: int, vs_index_days: int, excess: int) -> pd.DataFrame:
+    """
+    面板模式回测：成分股和行情只加载一次，选股条件对整个区间一次算完，再按交易日逐日换仓。
+    交易价格使用后复权收盘价（与逐日模式的不复权价收益率一致，且不受除权影响）。
+
+    参数与 backtest 相同。
+    :return: 回测结果 DataFrame
+    """
+    start_date = pd.to_datetime(start_date)
+    end_date = pd.to_datetime(end_date)
+
+    # 回溯期：最长条件所需的交易日数（停牌不算 bar 的条件按 lookback 往前找），从交易日历上精确往前数
+    days = max(lookback(nday_minus), lookback(total_new_high), vs_index_days + 1)
+    load_start = get_calendar().shift(start_date, -days)
+
+    # 成分股、指数和个股行情都只取一次；股票轴取回测区间内出现过的全部成分股，每天只在当天的成分股里选
+    symbols = constituent_store.union(stock_market, start_date, end_date)
+    index_df = index_zh_a_hist(symbol=stock_market, period="daily", start_date=load_start, end_date=end_date)
+    dates = pd.DatetimeIndex(index_df['日期'])
+    panel = load_panel(symbols, load_start, end_date, adjust="hfq", fields=("close", "pct_chg"), dates=dates)
+    index_close = index_df['收盘'].to_numpy(dtype=float)
+
+    mask = panel_masks(panel, index_close, minus, nday_minus, nday_new_high, total_new_high, vs_index_days, excess)
+    mask &= constituent_store.mask(stock_market, dates, panel.symbols)
+    # 停牌日沿用最近一个收盘价
+    price = panel.frame('close').ffill().to_numpy()
+
+    capital = initial_capital
+    holdings = {}  # 列号 -> 股数
+    daily_capital = []
+    for i in np.flatnonzero((dates >= start_date) & (dates <= end_date)):
+        date_str = dates[i].strftime("%Y-%m-%d")
+        selected = np.flatnonzero(mask[i])
+        if len(selected) == 0:
+            daily_capital.append({"date": date_str, "capital": capital, "action": "No trade"})
+            continue
+
+        # 卖出所有股票（按当天收盘价）
+        for j, shares in holdings.items():
+            capital += price[i, j] * shares * (1 - TRANSACTION_FEE)
+        holdings = {}
+
+        # 均分资金买入当天选中的股票
+        amount_per_stock = capital / len(selected)
+        for j in selected:
+            holdings[j] = amount_per_stock / price[i, j]
+            capital -= amount_per_stock * (1 + TRANSACTION_FEE)
+
+        daily_capital.append({"date": date_str, "capital": capital, "action": "Trade", "stocks": ",".join(panel.symbols[selected])})
+
+    return pd.DataFrame(daily_capital)
+
+def backtest(stock_market: str, start_date: str, end_date: str, initial_capital: float, minus: float, nday_minus: int, nday_new_high: int, total_new_high: int, vs_index_days: int, excess: int, mode: str = "daily") -> pd.DataFrame:
     """
     回测交易策略，模拟从 start_date 到 end_date 的股票买卖过程。
 
@@ -288,8 +375,12 @@ def backtest(stock_market: str, start_date: str, end_date: str, initial_capital:
     :param total_new_high: 总新高次数
     :param vs_index_days: 对比指数几天来
     :param excess: 跑赢指数的超额收益要求
+    :param mode: "daily" 逐日调用 findstocks；"panel" 使用面板模式一次算完所有日期
     :return: 回测结果 DataFrame
     """
+    if mode == "panel":
+        return backtest_panel(stock_market, start_date, end_date, initial_capital, minus, nday_minus, nday_new_high, total_new_high, vs_index_days, excess)
+
     # 转换为日期格式
     start_date = pd.to_datetime(start_date)
     end_date = pd.to_datetime(end_date)
@@ -300,8 +391,8 @@ def backtest(stock_market: str, start_date: str, end_date: str, initial_capital:
     stocks_bought = {}  # 记录买入的股票及其买入价格
     daily_capital = []  # 每日的资金变化
     
-    # 获取日期范围
-    date_range = pd.date_range(start=start_date, end=end_date)
+    # 获取日期范围（只取交易日，非交易日不会有选股结果）
+    date_range = get_calendar().range(start_date, end_date)
     
     for current_date in tqdm(date_range, desc="Backtesting"):
         date_str = current_date.strftime("%Y-%m-%d")
@@ -318,7 +409,7 @@ def backtest(stock_market: str, start_date: str, end_date: str, initial_capital:
         if stocks_held:
             # 卖出所有股票（按当天收盘价）
             for stock in stocks_held:
-                stock_price = ak.stock_zh_a_hist(stock, period="daily", start_date=date_str, end_date=date_str)["收盘"].iloc[-1]
+                stock_price = stock_zh_a_hist(stock, period="daily", start_date=date_str, end_date=date_str)["收盘"].iloc[-1]
                 capital += stock_price * stocks_bought[stock] * (1 - TRANSACTION_FEE)  # 卖出股票并扣除交易费用
             stocks_held.clear()  # 清空持仓
             stocks_bought.clear()  # 清空买入记录
@@ -328,7 +419,7 @@ def backtest(stock_market: str, start_date: str, end_date: str, initial_capital:
         if num_stocks > 0:
             amount_per_stock = capital / num_stocks  # 每支股票投入的金额
             for stock in selected_stocks_df['stock']:
-                stock_price = ak.stock_zh_a_hist(stock, period="daily", start_date=date_str, end_date=date_str)["收盘"].iloc[-1]
+                stock_price = stock_zh_a_hist(stock, period="daily", start_date=date_str, end_date=date_str)["收盘"].iloc[-1]
                 num_shares = amount_per_stock / stock_price
                 stocks_held.append(stock)
                 stocks_bought[stock] = num_shares  # 记录买入的股票及其数量
@@ -353,7 +444,7 @@ total_new_high = 100  # 总天数
 vs_index_days = 20  # 指数比较天数
 excess = 0  # 超额收益要求为0%
 
-result_df = backtest(stock_market, start_date, end_date, initial_capital, minus, nday_minus, nday_new_high, total_new_high, vs_index_days, excess)
+result_df = backtest(stock_market, start_date, end_date, initial_capital, minus, nday_minus, nday_new_high, total_new_high, vs_index_days, excess, mode="panel")
 
 # 输出回测结果
 print(result_df)
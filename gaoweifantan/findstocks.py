@@ -2,6 +2,12 @@ import akshare as ak
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm  # 进度条库
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.barstore import stock_zh_a_hist, index_zh_a_hist
+from common.detectors import lookback
+from common.tradecal import get_calendar
 
 # from ndayminus import is_nday_minus
 # from newhigh import is_new_high
@@ -20,31 +26,27 @@ def is_new_high(stock_code: str, date_str: str, N: int, M: int) -> bool:
         # 将字符串日期转换为 pd.Timestamp 类型
         current_date = pd.to_datetime(date_str)
         
-        # 动态获取数据，确保数据量达到 M 行
-        lookback_days = M * 2  # 初始回溯天数，考虑非交易日可能需要更多天数
-        while True:
-            start_date = (current_date - pd.Timedelta(days=lookback_days)).strftime("%Y%m%d")
+        # 最近 M 根有行情的 bar 在最近 lookback(M) 个交易日里找，停牌日不算，和面板模式一致
+        start_date = get_calendar().shift(current_date, -(lookback(M) - 1)).strftime("%Y%m%d")
+        
+        # 获取股票历史数据
+        stock_df = stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=current_date.strftime("%Y%m%d"), adjust="hfq")
+        
+        # 检查数据是否足够
+        if not stock_df.empty and len(stock_df) >= M:
+            # 截取最近 M 行数据
+            stock_df = stock_df.tail(M)
+            stock_df['close'] = stock_df['收盘'].astype(float)
             
-            # 获取股票历史数据
-            stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, adjust="hfq")
+            # 计算过去 M 天的最高价（包括最近 N 天）
+            historical_high = stock_df['close'].max()
             
-            # 检查数据是否足够
-            if not stock_df.empty and len(stock_df) >= M:
-                # 截取最近 M 行数据
-                stock_df = stock_df.tail(M)
-                stock_df['close'] = stock_df['收盘'].astype(float)
-                
-                # 计算过去 M 天的最高价（包括最近 N 天）
-                historical_high = stock_df['close'].max()
-                
-                # 计算最近 N 天的最高价
-                recent_high = stock_df['close'].iloc[-N:].max()
-                
-                # 判断最近 N 天的最高价是否等于过去 M 天的最高价
-                return recent_high == historical_high
+            # 计算最近 N 天的最高价
+            recent_high = stock_df['close'].iloc[-N:].max()
             
-            # 数据不足，扩大回溯范围
-            lookback_days += M  # 增加回溯的天数
+            # 判断最近 N 天的最高价是否等于过去 M 天的最高价
+            return recent_high == historical_high
+        return False  # 上市不久或长期停牌，凑不齐 M 根 bar
     except Exception as e:
         print(f"Error checking stock {stock_code}: {e}")
         return False
@@ -62,25 +64,21 @@ def is_nday_minus(stock_code: str, date_str: str, N: int) -> bool:
         # 将字符串日期转换为 pd.Timestamp 类型
         current_date = pd.to_datetime(date_str)
 
-        # 动态获取数据，确保数据量达到 N 行
-        lookback_days = N * 2  # 初始回溯天数，考虑非交易日
-        while True:
-            start_date = (current_date - pd.Timedelta(days=lookback_days)).strftime("%Y%m%d")
-            
-            # 获取股票历史数据
-            stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, adjust="hfq")
-            
-            # 检查数据是否足够
-            if not stock_df.empty and len(stock_df) >= N:
-                # 截取最近 N 行数据
-                stock_df = stock_df.tail(N)
-                stock_df['fail'] = stock_df['涨跌幅'].astype(float)
-                
-                # 计算最近 N 是否连续下跌
-                return all(fail < 0.0 for fail in stock_df['fail'])
+        # 最近 N 根有行情的 bar 在最近 lookback(N) 个交易日里找，停牌日不算，和面板模式一致
+        start_date = get_calendar().shift(current_date, -(lookback(N) - 1)).strftime("%Y%m%d")
+        
+        # 获取股票历史数据
+        stock_df = stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=current_date.strftime("%Y%m%d"), adjust="hfq")
+        
+        # 检查数据是否足够
+        if not stock_df.empty and len(stock_df) >= N:
+            # 截取最近 N 行数据
+            stock_df = stock_df.tail(N)
+            stock_df['fail'] = stock_df['涨跌幅'].astype(float)
             
-            # 数据不足，扩大回溯范围
-            lookback_days += N  # 增加回溯的天数
+            # 计算最近 N 是否连续下跌
+            return all(fail < 0.0 for fail in stock_df['fail'])
+        return False  # 上市不久或长期停牌，凑不齐 N 根 bar
     except Exception as e:
         print(f"Error checking stock {stock_code}: {e}")
         return False
@@ -99,11 +97,11 @@ def index_performance(vsindex_days: int, stock_market: str, date_str: str) -> fl
         current_date = pd.to_datetime(date_str)
         
         # 设置开始日期（假设交易日不连续，抓取的范围需要更大）
-        start_date = (current_date - pd.Timedelta(days=vsindex_days * 2)).strftime("%Y%m%d")
+        start_date = get_calendar().shift(current_date, -vsindex_days).strftime("%Y%m%d")
         end_date = current_date.strftime("%Y%m%d")
         
         # 获取指数的历史数据
-        index_df = ak.index_zh_a_hist(symbol=stock_market, period="daily", start_date=start_date, end_date=end_date)
+        index_df = index_zh_a_hist(symbol=stock_market, period="daily", start_date=start_date, end_date=end_date)
         
         # 检查数据是否为空
         if index_df.empty:
@@ -144,12 +142,12 @@ def stock_performance(vsindex_days: int, stock_code: str, date_str: str) -> floa
         # 将输入的日期字符串转换为日期类型
         current_date = pd.to_datetime(date_str)
         
-        # 设置开始日期（抓取范围比交易日多，以适应可能的非交易日）
-        start_date = (current_date - pd.Timedelta(days=vsindex_days * 2)).strftime("%Y%m%d")
+        # 设置开始日期：从交易日历上往前数 vsindex_days 个交易日
+        start_date = get_calendar().shift(current_date, -vsindex_days).strftime("%Y%m%d")
         end_date = current_date.strftime("%Y%m%d")
         
         # 获取股票的历史数据，为了避免除权除息！后复权！会导致与同花顺查询结果的不同
-        stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=end_date, adjust="hfq")
+        stock_df = stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=end_date, adjust="hfq")
         
         # 检查数据是否为空
         if stock_df.empty:
@@ -198,7 +196,7 @@ def fetch_stock_data(stock: str, date_str: str, minus: float, minus_days: int, n
         end_date = current_date.strftime("%Y%m%d")
         
         # 获取股票历史数据
-        stock_df = ak.stock_zh_a_hist(symbol=stock, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")
+        stock_df = stock_zh_a_hist(symbol=stock, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")
         
         # 打印获取的数据，用于调试
         # print(f"Fetching data for {stock} on {date_str}")
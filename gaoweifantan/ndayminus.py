@@ -1,5 +1,11 @@
-import akshare as ak
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.barstore import stock_zh_a_hist
+from common.detectors import down_streak, lookback
+from common.panel import load_calendar_panel
+from common.tradecal import get_calendar
 
 def is_nday_minus(stock_code: str, date_str: str, N: int) -> bool:
     """
@@ -14,29 +20,42 @@ def is_nday_minus(stock_code: str, date_str: str, N: int) -> bool:
         # 将字符串日期转换为 pd.Timestamp 类型
         current_date = pd.to_datetime(date_str)
 
-        # 动态获取数据，确保数据量达到 N 行
-        lookback_days = N * 2  # 初始回溯天数，考虑非交易日
-        while True:
-            start_date = (current_date - pd.Timedelta(days=lookback_days)).strftime("%Y%m%d")
+        # 最近 N 根有行情的 bar 在最近 lookback(N) 个交易日里找，停牌日不算，和面板模式一致
+        start_date = get_calendar().shift(current_date, -(lookback(N) - 1)).strftime("%Y%m%d")
+        
+        # 获取股票历史数据
+        stock_df = stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, end_date=current_date.strftime("%Y%m%d"), adjust="hfq")
+        
+        # 检查数据是否足够
+        if not stock_df.empty and len(stock_df) >= N:
+            # 截取最近 N 行数据
+            stock_df = stock_df.tail(N)
+            stock_df['fail'] = stock_df['涨跌幅'].astype(float)
             
-            # 获取股票历史数据
-            stock_df = ak.stock_zh_a_hist(symbol=stock_code, period="daily", start_date=start_date, adjust="hfq")
-            
-            # 检查数据是否足够
-            if not stock_df.empty and len(stock_df) >= N:
-                # 截取最近 N 行数据
-                stock_df = stock_df.tail(N)
-                stock_df['fail'] = stock_df['涨跌幅'].astype(float)
-                
-                # 计算最近 N 是否连续下跌
-                return all(fail < 0.0 for fail in stock_df['fail'])
-            
-            # 数据不足，扩大回溯范围
-            lookback_days += N  # 增加回溯的天数
+            # 计算最近 N 是否连续下跌
+            return all(fail < 0.0 for fail in stock_df['fail'])
+        return False  # 上市不久或长期停牌，凑不齐 N 根 bar
     except Exception as e:
         print(f"Error checking stock {stock_code}: {e}")
         return False
 
+def nday_minus_days(stock_codes, start_date, end_date, N: int) -> pd.DataFrame:
+    """
+    一次算出区间内每个交易日、每只股票是否在最近 N 个交易日持续下跌，
+    结果与逐日逐只调用 is_nday_minus 相同，但行情只读一次、条件只扫一遍。
+
+    :param stock_codes: 股票代码列表
+    :param start_date: 开始日期
+    :param end_date: 结束日期
+    :param N: 检查的区间天数（最近 N 个交易日）
+    :return: 以交易日为索引、股票代码为列的布尔 DataFrame
+    """
+    # 往前多读 lookback(N) - 1 个交易日，区间第一天就和 is_nday_minus 看到同样的历史
+    load_start = get_calendar().shift(start_date, -(lookback(N) - 1))
+    panel = load_calendar_panel(stock_codes, load_start, end_date, adjust="hfq", fields=("pct_chg",))
+    hits = pd.DataFrame(down_streak(panel['pct_chg'], N), index=panel.dates, columns=panel.symbols)
+    return hits[hits.index >= pd.to_datetime(start_date)]
+
 # 测试示例
 def test_with_input_date(stock_code: str, date_str: str, N: int):
     result = is_nday_minus(stock_code, date_str, N)
@@ -1,5 +1,9 @@
 import akshare as ak
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))  # 项目根目录，用于导入 common
+from common.metrics import summarize
 
 # 获取中证1000数据
 hs300_data = ak.index_zh_a_hist(symbol='000699', period='daily', start_date='20160101', end_date='20250120')
@@ -45,17 +49,12 @@ for i in range(len(dates)):
         position = 0
         print(f"[{date}] 平仓，平仓价: {close_price}，收益率: {profit:.2%}")
 
-# 计算总收益
-cumulative_returns = (1 + pd.Series(returns)).cumprod()
-
-# 总收益率的最后一个值
-final_cumulative_return = cumulative_returns.iloc[-1] - 1  # 从 Series 中提取最后一个值
+# 按逐笔交易收益计算总收益率和最大回撤
+stats = summarize(returns)
+final_cumulative_return = stats['total_return']
+max_drawdown = stats['max_drawdown']
 
 print(f"总收益率: {final_cumulative_return:.2%}")
 
-# 计算最大回撤
-drawdowns = cumulative_returns / cumulative_returns.cummax() - 1
-max_drawdown = drawdowns.min()
-
 # 打印最大回撤
 print(f"最大回撤: {max_drawdown:.2%}")
\ No newline at end of file
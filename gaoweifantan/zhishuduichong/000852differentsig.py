@@ -2,6 +2,10 @@ import akshare as ak
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))  # 项目根目录，用于导入 common
+from common.sigsweep import sig_sweep
 
 # 获取中证2000数据
 hs300_data = ak.index_zh_a_hist(symbol='932000', period='daily', start_date='20200101', end_date='20241231')
@@ -15,57 +19,12 @@ hs300_data['date'] = pd.to_datetime(hs300_data['date'])
 # 设置索引
 hs300_data.set_index('date', inplace=True)
 
-# 提取必要数据
-dates = hs300_data.index
-strategy = hs300_data['change_pct']
-hs300_close = hs300_data['close']
+# 测试不同的 sig 值：涨跌幅 >= sig 时收盘买入，之后涨跌幅 < sig 时收盘卖出，所有 sig 一次回测
+sig_values = np.arange(0, 1, 0.1).tolist()
+result = sig_sweep(hs300_data['change_pct'], hs300_data['close'], sig_values, dates=hs300_data.index)
 
-# 定义一个函数进行回测
-def backtest(sig):
-    position = 0  # 持仓状态
-    entry_price = 0  # 建仓价格
-    trades = []  # 存储每次交易的日期和收益
-
-    for i in range(len(dates)):
-        date = dates[i]
-        signal = strategy.iloc[i]
-        close_price = hs300_close.iloc[i]
-
-        if position == 0 and signal >= sig:  # 开仓条件
-            position = 1
-            entry_price = close_price
-
-        elif position == 1 and signal < sig:  # 平仓条件
-            profit = (close_price - entry_price) / entry_price
-            trades.append({'date': date, 'profit': profit})
-            position = 0
-    
-
-    # 如果没有交易，返回空的 DataFrame
-    if not trades:
-        return pd.DataFrame(columns=['date', 'profit'])
-
-    # 转换交易记录为 DataFrame
-    trades_df = pd.DataFrame(trades)
-    trades_df['year'] = trades_df['date'].dt.year  # 添加年份列
-    return trades_df
-
-# 测试不同的 sig 值
-sig_values = sig_values = np.arange(0, 1, 0.1).tolist()
-yearly_results = {}
-
-for sig in sig_values:
-    trades_df = backtest(sig)
-
-    # 按年统计收益率
-    if not trades_df.empty:
-        yearly_returns = trades_df.groupby('year')['profit'].sum()  # 按年求和
-        yearly_results[sig] = yearly_returns
-    else:
-        yearly_results[sig] = pd.Series([], dtype='float64')
-
-# 汇总所有 sig 值的年收益率
-yearly_results_df = pd.DataFrame(yearly_results).fillna(0)
+# 按平仓年份汇总每个 sig 的收益率（逐笔收益求和），没有交易的年份为 0
+yearly_results_df = result.yearly()
 
 # 打印每年的收益率
 print("Yearly Returns for Different Sig Values:")
@@ -1,8 +1,12 @@
-import akshare as ak
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))  # 项目根目录，用于导入 common
+from common.barstore import stock_zh_a_hist
+from common.metrics import summarize
 
 # 获取个股数据
-stock_data = ak.stock_zh_a_hist(symbol='301125', period='daily', start_date='20220101', end_date='20250124', adjust="qfq")
+stock_data = stock_zh_a_hist(symbol='301125', period='daily', start_date='20220101', end_date='20250124', adjust="qfq")
 print(stock_data.head())
 
 # 确认列名并重命名
@@ -45,20 +49,12 @@ for i in range(len(dates)):
         position = 0
         print(f"[{date}] 平仓，平仓价: {close_price}，收益率: {profit:.2%}")
 
-# 计算总收益
-cumulative_returns = (1 + pd.Series(returns)).cumprod()
-
-# 总收益率的最后一个值
-final_cumulative_return = cumulative_returns.iloc[-1] - 1 if not cumulative_returns.empty else 0  # 避免空值错误
+# 按逐笔交易收益计算总收益率和最大回撤
+stats = summarize(returns)
+final_cumulative_return = stats['total_return']
+max_drawdown = stats['max_drawdown']
 
 print(f"总收益率: {final_cumulative_return:.2%}")
 
-# 计算最大回撤
-if not cumulative_returns.empty:
-    drawdowns = cumulative_returns / cumulative_returns.cummax() - 1
-    max_drawdown = drawdowns.min()
-else:
-    max_drawdown = 0
-
 # 打印最大回撤
 print(f"最大回撤: {max_drawdown:.2%}")
@@ -1,5 +1,9 @@
 import akshare as ak
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))  # 项目根目录，用于导入 common
+from common.sigsweep import sig_sweep
 
 weipan_df = ak.stock_board_industry_index_ths(symbol="元件", start_date="20240101", end_date="20241231")
 print(weipan_df)
@@ -14,48 +18,21 @@ weipan_df['date'] = pd.to_datetime(weipan_df['date'])
 weipan_df.set_index('date', inplace=True)
 weipan_df['change_pct'] = weipan_df['close'].pct_change() * 100  # 转换为百分比
 
-# 提取日期、信号和收盘价数据
-dates = weipan_df.index  # 日期作为索引后，直接使用 index
-strategy = weipan_df['change_pct']  # 涨跌幅
-hs300_close = weipan_df['close']  # 收盘价
-
-# 初始化变量
-position = 0  # 持仓状态，1 表示持仓，0 表示空仓
-entry_price = 0  # 建仓价格
-returns = []  # 存储每次交易的收益记录
+# 回测：空仓且当日涨跌幅 >= sig 时开仓，持仓且当日涨跌幅 < sig 时平仓
 sig = 0.5
+result = sig_sweep(weipan_df['change_pct'], weipan_df['close'], [sig], dates=weipan_df.index)
 
-# 遍历选样数据进行回测
-for i in range(len(dates)):
-    date = dates[i]
-    signal = strategy.iloc[i]
-
-    close_price = hs300_close.iloc[i]
-
-    if position == 0 and signal >= sig:  # 空仓且当日中证1000涨跌幅大于0.5%
-        # 开仓：买入
-        position = 1
-        entry_price = close_price
-        print(f"[{date}] 开仓，开仓价: {entry_price}")
+for trade in result.trades().itertuples():
+    print(f"[{trade.entry_date}] 开仓，开仓价: {trade.entry_price}")
+    if not pd.isna(trade.exit_date):
+        print(f"[{trade.exit_date}] 平仓，平仓价: {trade.exit_price}，收益率: {trade.profit:.2%}")
 
-    elif position == 1 and signal < sig:  # 持仓且当日中证1000涨跌幅小于0.5%
-        # 平仓：卖出多头
-        profit = (close_price - entry_price) / entry_price
-        returns.append(profit)
-        position = 0
-        print(f"[{date}] 平仓，平仓价: {close_price}，收益率: {profit:.2%}")
-
-# 计算总收益
-cumulative_returns = (1 + pd.Series(returns)).cumprod()
-
-# 总收益率的最后一个值
-final_cumulative_return = cumulative_returns.iloc[-1] - 1  # 从 Series 中提取最后一个值
+# 总收益率与最大回撤（按逐笔平仓后的净值计算）
+summary = result.summary().iloc[0]
+final_cumulative_return = summary['final_cumulative_return']
+max_drawdown = summary['max_drawdown']
 
 print(f"总收益率: {final_cumulative_return:.2%}")
 
-# 计算最大回撤
-drawdowns = cumulative_returns / cumulative_returns.cummax() - 1
-max_drawdown = drawdowns.min()
-
 # 打印最大回撤
 print(f"最大回撤: {max_drawdown:.2%}")
\ No newline at end of file
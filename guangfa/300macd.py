@@ -1,7 +1,11 @@
 import akshare as ak
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.indicators import macd
+from common.report import Chart, render
 
 # 获取沪深300指数历史数据（使用通用指数数据，时间跨度较长）
 index_df = ak.index_zh_a_hist(symbol="000300", period="daily", start_date="20050101", end_date="20241029")
@@ -17,11 +21,8 @@ short_window = 12
 long_window = 26
 signal_window = 9
 
-df['EMA_12'] = df['close_price'].ewm(span=short_window, adjust=False).mean()
-df['EMA_26'] = df['close_price'].ewm(span=long_window, adjust=False).mean()
-df['DIF'] = df['EMA_12'] - df['EMA_26']  # 计算 DIF
-df['DEA'] = df['DIF'].ewm(span=signal_window, adjust=False).mean()  # 计算 DEA
-df['MACD'] = df['DIF'] - df['DEA']  # 计算 MACD
+# DIF = EMA12 - EMA26，DEA = DIF 的 9 日 EMA，MACD = DIF - DEA
+df['DIF'], df['DEA'], df['MACD'] = macd(df['close_price'], short_window, long_window, signal_window)
 
 # 生成买卖信号
 df['signal'] = 0
@@ -42,12 +43,8 @@ final_capital = df['portfolio_value'].iloc[-1]
 print("Initial Capital:", initial_capital)
 print("Final Capital:", final_capital)
 
-# 绘制策略表现
-plt.figure(figsize=(14, 7))
-plt.plot(df.index, (1 + df['return']).cumprod() * initial_capital, label='Market Portfolio', color='blue')
-plt.plot(df.index, df['portfolio_value'], label='MACD Strategy Portfolio', color='orange')
-plt.xlabel('Date')
-plt.ylabel('Portfolio Value (RMB)')
-plt.legend()
-plt.title("MACD Strategy Backtest on CSI 300 Index Over 10+ Years")
-plt.show()
+# 绘制策略表现并保存为图片（不弹窗，批量运行时不会阻塞）
+chart = Chart("MACD Strategy Backtest on CSI 300 Index Over 10+ Years", xlabel='Date', ylabel='Portfolio Value (RMB)', figsize=(14, 7), grid=False)
+chart.line(df.index, (1 + df['return']).cumprod() * initial_capital, label='Market Portfolio', color='blue')
+chart.line(df.index, df['portfolio_value'], label='MACD Strategy Portfolio', color='orange')
+render(chart, '300macd_backtest.png')
@@ -2,32 +2,43 @@ import akshare as ak
 import pandas as pd
 import numpy as np
 from tqdm import tqdm
-
-# 获取中证500和沪深300成分股
-index_500_stocks = ak.index_stock_cons_csindex(symbol="000905")  # 中证500成分股
-index_300_stocks = ak.index_stock_cons_csindex(symbol="000300")  # 沪深300成分股
-
-# 合并成分股代码并去重
-all_stocks = list(set(index_500_stocks['成分券代码'].tolist() + index_300_stocks['成分券代码'].tolist()))
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.barstore import stock_zh_a_hist
+from common.constituents import constituent_store
+from common.indicators import momentum, rolling_max, streak
+from common.report import equity_charts, write_html
+from common.tradecal import get_calendar
 
 # 设置回测参数
 start_date = "20241101"  # 回测开始日期
 end_date = "20241118"  # 回测结束日期
-capital = 1000000  # 初始资金
+calendar = get_calendar()  # 交易日历
+
+# 回测区间内出现过的中证500和沪深300成分股，合并去重
+all_stocks = sorted(set(constituent_store.union("000905", start_date, end_date) + constituent_store.union("000300", start_date, end_date)))
+initial_capital = 1000000  # 初始资金
+capital = initial_capital
 holding_stocks = {}  # 持仓记录，格式为 {股票代码: 买入价格}
+equity = []  # 每个交易日卖出后的资金，用于画净值曲线
 
 # 获取中证800指数每日收益率，用于计算相对涨幅
-benchmark_df = ak.index_zh_a_hist(symbol="000906", period="daily", start_date=start_date, end_date=end_date)
+# 多取 20 个交易日，保证回测首日就有 20 日涨跌幅
+benchmark_df = ak.index_zh_a_hist(symbol="000906", period="daily", start_date=calendar.shift(start_date, -20).strftime("%Y%m%d"), end_date=end_date)
 benchmark_df['日期'] = pd.to_datetime(benchmark_df['日期'])
 benchmark_df.set_index('日期', inplace=True)
 benchmark_df['收盘'] = benchmark_df['收盘'].astype(float)
-benchmark_df['20d_return'] = benchmark_df['收盘'].pct_change(periods=20)  # 20日涨跌幅
+benchmark_df['20d_return'] = momentum(benchmark_df['收盘'], 20)  # 20日涨跌幅
 
-# 构建交易日序列
-dates = pd.date_range(start=start_date, end=end_date, freq="B")  # freq="B" 表示仅包含工作日
+# 构建交易日序列（交易日历已排除节假日）
+dates = calendar.range(start_date, end_date)
+
+# 每个交易日哪些股票是中证800（中证500 + 沪深300）成分股，日期 × 股票
+member_mask = constituent_store.mask("000905", dates, all_stocks) | constituent_store.mask("000300", dates, all_stocks)
 
 # 开始回测
-for current_date in tqdm(dates, desc="Backtesting"):
+for day, current_date in enumerate(tqdm(dates, desc="Backtesting")):
     print(f"Processing date: {current_date}")
     
     # 卖出逻辑：仅在持仓不为空时执行
@@ -36,8 +47,8 @@ for current_date in tqdm(dates, desc="Backtesting"):
         for stock, buy_price in holding_stocks.items():
             try:
                 print(f"Attempting to sell stock: {stock}")
-                stock_df = ak.stock_zh_a_hist(symbol=stock, period="daily", start_date=current_date.strftime("%Y%m%d"),
-                                              end_date=current_date.strftime("%Y%m%d"), adjust="hfq")
+                stock_df = stock_zh_a_hist(symbol=stock, period="daily", start_date=current_date.strftime("%Y%m%d"),
+                                           end_date=current_date.strftime("%Y%m%d"), adjust="hfq")
                 if not stock_df.empty:
                     sell_price = stock_df['收盘'].iloc[0]
                     daily_return += (sell_price / buy_price - 1) * (capital / len(holding_stocks))
@@ -47,28 +58,28 @@ for current_date in tqdm(dates, desc="Backtesting"):
         # 更新资金
         capital *= (1 + daily_return)
         holding_stocks = {}  # 清空持仓记录
+    equity.append(capital)
     
     # 买入逻辑：筛选符合条件的股票
     print(f"Selecting stocks for {current_date}")
     selected_stocks = []
-    for stock in all_stocks:
+    for stock in np.asarray(all_stocks)[member_mask[day]].tolist():  # 只在当天的成分股里选
         try:
-            stock_df = ak.stock_zh_a_hist(symbol=stock, period="daily",
-                                          start_date=(current_date - pd.Timedelta(days=100)).strftime("%Y%m%d"),
-                                          end_date=current_date.strftime("%Y%m%d"), adjust="hfq")
+            stock_df = stock_zh_a_hist(symbol=stock, period="daily",
+                                       start_date=calendar.shift(current_date, -99).strftime("%Y%m%d"),  # 最近 100 个交易日
+                                       end_date=current_date.strftime("%Y%m%d"), adjust="hfq")
             if stock_df.empty or len(stock_df) < 100:
                 continue
 
             stock_df['close'] = stock_df['收盘'].astype(float)
-            stock_df['return'] = stock_df['close'].pct_change()
-            stock_df['100d_high'] = stock_df['close'].rolling(window=100).max()
-            stock_df['20d_return'] = stock_df['close'].pct_change(periods=20)
+            close = stock_df['close'].to_numpy()
+            returns = momentum(close, 1)
             
-            if (stock_df['close'].iloc[-1] >= stock_df['100d_high'].iloc[-1] and
-                stock_df['return'].iloc[-2] <= 0 and
-                stock_df['return'].iloc[-3] <= 0 and
-                stock_df['return'].iloc[-1] < -0.03 and
-                stock_df['20d_return'].iloc[-1] >= benchmark_df['20d_return'].loc[current_date] + 0.15):
+            # 收盘创 100 日新高、连续 3 天不涨且当天跌超 3%、20 日涨幅跑赢基准 15% 以上
+            if (close[-1] >= rolling_max(close, 100)[-1] and
+                streak(returns <= 0)[-1] >= 3 and
+                returns[-1] < -0.03 and
+                momentum(close, 20)[-1] >= benchmark_df['20d_return'].loc[current_date] + 0.15):
                 selected_stocks.append(stock)
                 print(f"Stock {stock} selected")
         except Exception as e:
@@ -88,3 +99,8 @@ for current_date in tqdm(dates, desc="Backtesting"):
 
 # 输出回测结束后的总资金
 print(f"Final capital: {capital}")
+
+# 资金曲线与中证800对比，写成 HTML 报告（不弹窗，批量运行时不会阻塞）
+benchmark = benchmark_df['收盘'].reindex(dates).ffill()
+write_html(equity_charts(pd.Series(equity, index=dates) / initial_capital, benchmark=benchmark / benchmark.iloc[0], label='800easy', benchmark_label='CSI 800'),
+           '800easy_report.html', title='800easy')
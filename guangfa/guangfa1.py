@@ -1,9 +1,12 @@
-import akshare as ak
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.barstore import stock_zh_a_hist
 
 # 获取数据
 code = "000521"
-res = ak.stock_zh_a_hist(symbol=code, adjust="hfq", start_date='20200101', end_date='20210617')
+res = stock_zh_a_hist(symbol=code, adjust="hfq", start_date='20200101', end_date='20210617')
 
 # 打印数据的列名
 print("数据列名：", res.columns)
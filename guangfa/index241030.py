@@ -1,5 +1,9 @@
 import akshare as ak
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.indicators import rolling_std, rolling_sum, sma
 
 # 获取中证1000指数（000852.SH）的日线数据
 index_df = ak.index_zh_a_hist(symbol="000852", period="daily", start_date="20200101", end_date="20231029")
@@ -19,9 +23,9 @@ df.rename(columns={'收盘': 'close'}, inplace=True)  # 重命名列方便后续
 df['return'] = df['close'].pct_change()
 
 # 计算其他指标
-df['ma_long_period'] = df['close'].rolling(window=5).mean()
-df['sigma'] = df['close'].rolling(window=10).std()
-df['Momentum1'] = df['return'].rolling(window=8).sum()
+df['ma_long_period'] = sma(df['close'], 5)
+df['sigma'] = rolling_std(df['close'], 10)
+df['Momentum1'] = rolling_sum(df['return'], 8)
 df['index_value'] = df['close'] / df.iloc[0]['close'] - 1
 
 # 参数设置
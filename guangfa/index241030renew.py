@@ -1,5 +1,10 @@
 import akshare as ak
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.indicators import rolling_std, rolling_sum, sma
+from common.results import ResultSink
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -22,13 +27,13 @@ df.rename(columns={'收盘': 'close'}, inplace=True)
 df['return'] = df['close'].pct_change()
 
 # 计算5日均线
-df['ma_long_period'] = df['close'].rolling(window=5).mean()
+df['ma_long_period'] = sma(df['close'], 5)
 
 # 计算10日波动率（标准差）
-df['sigma'] = df['close'].rolling(window=10).std()
+df['sigma'] = rolling_std(df['close'], 10)
 
 # 计算8日动量（收益率之和）
-df['Momentum1'] = df['return'].rolling(window=8).sum()
+df['Momentum1'] = rolling_sum(df['return'], 8)
 
 # 参数设置
 threshold1 = 0  # 阈值1
@@ -86,9 +91,11 @@ plt.ylabel("Daily Return")
 plt.legend()
 plt.show()
 
-# 导出数据到Excel文件
-df.to_excel("strategy_backtest_results.xlsx", sheet_name="Backtest Results")
-
-# 将结果输出到Excel，包含每日收益和累积收益
+# 回测明细写入本地结果仓库，再一次性导出到Excel：同一个工作簿里写全部列和每日收益 / 累积收益两张表
 output_columns = ['close', 'return', 'strategy_return', 'cumulative_index_return', 'portfolio_value']
-df[output_columns].to_excel("strategy_backtest_results.xlsx", sheet_name="Backtest Detailed Results")
+with ResultSink("index241030renew", params={"symbol": "000852", "initial_capital": initial_capital}) as sink:
+    sink.append(df)
+    sink.export("strategy_backtest_results.xlsx", index='日期', sheets={
+        "Backtest Results": list(df.columns),
+        "Backtest Detailed Results": output_columns,
+    })
@@ -1,5 +1,9 @@
 import akshare as ak
 import pandas as pd
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.indicators import rolling_std, rolling_sum, sma
 import numpy as np
 import matplotlib.pyplot as plt
 
@@ -22,13 +26,13 @@ df.rename(columns={'收盘': 'close'}, inplace=True)
 df['return'] = df['close'].pct_change()
 
 # 计算5日均线
-df['ma_long_period'] = df['close'].rolling(window=5).mean()
+df['ma_long_period'] = sma(df['close'], 5)
 
 # 计算10日波动率（标准差）
-df['sigma'] = df['close'].rolling(window=10).std()
+df['sigma'] = rolling_std(df['close'], 10)
 
 # 计算8日动量（收益率之和）
-df['Momentum1'] = df['return'].rolling(window=8).sum()
+df['Momentum1'] = rolling_sum(df['return'], 8)
 
 # 参数设置
 threshold1 = 0  # 阈值1
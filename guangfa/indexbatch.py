@@ -0,0 +1,202 @@
+"""
+指数择时策略批量回测：一次运行把若干条择时规则、若干组参数套到一组指数上，输出一张对比表。
+
+规则来自 guangfa 和 微盘股 下各自只回测一个指数的脚本：
+
+- rsi_ma：RSI + 均线（sample_strategy_CSI1000.py），每天固定扣 fee；
+- macd：DIF 上穿 / 下穿 DEA 做多 / 做空（300macd.py）；
+- ma_sigma_momentum：均线、波动率通道和动量（index241030renew.py）；
+- drop_rebound：空仓时跌 down% 收盘买入，持仓时涨 up% 收盘卖出（微盘股/indexhuice.py）。
+
+全部指数先读进一个 dates × symbols 面板（common.panel.load_index_panel），
+每条规则对整个面板逐列一次算出持仓，次日生效；收益和绩效指标用 common.metrics 计算。
+
+    python guangfa/indexbatch.py
+    python guangfa/indexbatch.py --rules macd rsi_ma --symbols 000300 000852 --param rsi_ma:cycle=3,4,5 --param rsi_ma:window=10,14
+"""
+import argparse
+import itertools
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+import numpy as np
+import pandas as pd
+
+from common.indicators import gain_loss, macd, rolling_std, rolling_sum, sma
+from common.metrics import equity, summarize
+from common.panel import load_index_panel, shift
+from common.report import Chart, write_html
+from common.results import ResultSink
+from common.sigsweep import hold_state
+
+# 沪深300、中证1000、中证500、中证2000、东方财富微盘股概念板块
+SYMBOLS = ["000300", "000852", "000905", "932000", "微盘股"]
+
+
+# ---------- 择时规则：输入 dates × symbols 的收盘价和涨跌幅（%），返回当天收盘后的目标持仓 ----------
+def rsi_ma(close, pct, window: int = 10, cycle: int = 4, fee: float = 0.000023):
+    """RSI 与均线结合：站上均线且未超买时持有，跌破均线且未超卖时空仓，RSI < 5 / > 95 时强制买入 / 卖出。"""
+    avg_up, avg_down = gain_loss(close, window)
+    # 平均下跌为 0 或数据不足时 RSI 记为 0，同原脚本
+    rs = np.divide(avg_up, avg_down, out=np.zeros(close.shape), where=avg_down > 0)
+    rsi = np.where(rs > 0, 100 - 100 / (1 + rs), 0)
+    ma = sma(close, cycle)
+    signal = np.zeros(close.shape)
+    signal[(close > ma) & (rsi < 85)] = 1
+    signal[(close < ma) & (rsi > 15)] = 0
+    signal[rsi < 5] = 1
+    signal[rsi > 95] = 0
+    return signal
+
+
+def macd_cross(close, pct, fast: int = 12, slow: int = 26, signal: int = 9):
+    """DIF 在 DEA 之上做多，之下做空。"""
+    dif, dea, _ = macd(close, fast, slow, signal)
+    return np.where(dif > dea, 1.0, np.where(dif < dea, -1.0, 0.0))
+
+
+def ma_sigma_momentum(close, pct, ma: int = 5, sigma: int = 10, momentum: int = 8,
+                      threshold1: float = 0.0, threshold2: float = 0.0, multiplier: float = 3.0):
+    """站上均线或动量为正且未超出波动率通道时做多，反之做空；超出通道上 / 下轨时反向。"""
+    ma_line = sma(close, ma)
+    band = rolling_std(close, sigma) * multiplier
+    mom = rolling_sum(close / shift(close, 1) - 1, momentum)
+    signal = np.zeros(close.shape)
+    signal[((close > ma_line * (1 + threshold1)) | (mom > threshold2)) & (close < ma_line + band)] = 1
+    signal[((close < ma_line * (1 - threshold1)) | (mom < -threshold2)) & (close > ma_line - band)] = -1
+    signal[close > ma_line + band] = -1
+    signal[close < ma_line - band] = 1
+    return signal
+
+
+def drop_rebound(close, pct, down: float = 3.0, up: float = 3.0):
+    """空仓时当天跌幅 >= down% 收盘买入，持仓时当天涨幅 >= up% 收盘卖出。"""
+    state = hold_state((pct <= -down).T, (pct >= up).T).T
+    return state.astype(np.float64)
+
+
+# 规则名 -> (函数, 默认参数)，默认参数与原脚本一致
+RULES = {
+    "rsi_ma": (rsi_ma, {"window": 10, "cycle": 4, "fee": 0.000023}),
+    "macd": (macd_cross, {"fast": 12, "slow": 26, "signal": 9}),
+    "ma_sigma_momentum": (ma_sigma_momentum, {"ma": 5, "sigma": 10, "momentum": 8, "threshold1": 0.0, "threshold2": 0.0, "multiplier": 3.0}),
+    "drop_rebound": (drop_rebound, {"down": 3.0, "up": 3.0}),
+}
+
+
+def param_grid(rule: str, overrides: dict) -> list:
+    """
+    :param rule: 规则名
+    :param overrides: 参数名 -> 取值列表，覆盖默认参数
+    :return: 参数组合列表，每个组合是一个 dict
+    """
+    defaults = RULES[rule][1]
+    unknown = set(overrides) - set(defaults)
+    if unknown:
+        raise ValueError(f"规则 {rule} 没有参数 {sorted(unknown)}，可用参数: {list(defaults)}")
+    keys = list(defaults)
+    values = [overrides.get(key, [defaults[key]]) for key in keys]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def parse_overrides(items) -> dict:
+    """把若干个 'rule:key=v1,v2' 解析成 {rule: {key: [v1, v2]}}，取值按默认参数的类型转换。"""
+    overrides = {}
+    for item in items or []:
+        rule, _, assignment = item.partition(":")
+        key, _, values = assignment.partition("=")
+        if rule not in RULES or not key or not values:
+            raise ValueError(f"参数格式应为 规则:参数名=取值1,取值2，规则只能是 {list(RULES)}: {item}")
+        kind = type(RULES[rule][1].get(key, 0.0))
+        overrides.setdefault(rule, {})[key] = [kind(v) for v in values.split(",")]
+    return overrides
+
+
+def first_valid(close) -> np.ndarray:
+    """每列第一个有收盘价的行号，整列为空时为行数。"""
+    valid = ~np.isnan(close)
+    return np.where(valid.any(axis=0), valid.argmax(axis=0), len(close))
+
+
+def backtest(close, pct, rule: str, params: dict):
+    """
+    一条规则、一组参数在整个面板上的回测。
+
+    :return: (每日收益, 每日持仓)，dates × symbols
+    """
+    func = RULES[rule][0]
+    position = shift(func(close, pct, **params), 1)  # 收盘后得到的持仓从下一天开始产生收益
+    returns = position * (close / shift(close, 1) - 1) - params.get("fee", 0.0)
+    return returns, position
+
+
+def compare(close, pct, dates, symbols, rules, overrides: dict) -> tuple:
+    """
+    :return: (对比表, {(规则, 参数): 每日收益})；对比表每行一个 规则 × 参数 × 指数，
+             绩效从该指数第一个有数据的交易日算起
+    """
+    starts = first_valid(close)
+    last = len(close) - 1
+    benchmark = np.array([close[last, j] / close[s, j] - 1 if s <= last else np.nan for j, s in enumerate(starts)])
+    rows = []
+    curves = {}
+    for rule in rules:
+        for params in param_grid(rule, overrides.get(rule, {})):
+            label = ",".join(f"{k}={v}" for k, v in params.items())
+            returns, position = backtest(close, pct, rule, params)
+            curves[(rule, label)] = returns
+            # 起点相同的指数放在一起，一次算出各列的指标
+            for start in np.unique(starts[starts <= last]):
+                cols = np.flatnonzero(starts == start)
+                stats = summarize(returns[start:, cols], position=position[start:, cols])
+                for k, j in enumerate(cols):
+                    row = {"rule": rule, "params": label, "symbol": symbols[j], "start": dates[start], "end": dates[last],
+                           "benchmark_return": benchmark[j]}
+                    row.update({key: np.broadcast_to(np.asarray(value, dtype=np.float64), cols.shape)[k] for key, value in stats.items()})
+                    rows.append(row)
+    return pd.DataFrame(rows), curves
+
+
+def equity_chart(rule: str, label: str, returns, dates, symbols, starts) -> Chart:
+    """一条规则、一组参数下各指数的净值曲线，每条曲线从该指数第一个交易日开始。"""
+    chart = Chart(f"{rule} ({label})", xlabel="Date", ylabel="Equity")
+    for j, symbol in enumerate(symbols):
+        if starts[j] < len(dates):
+            chart.line(dates[starts[j]:], equity(returns[starts[j]:, j]), label=symbol)
+    return chart
+
+
+def main():
+    parser = argparse.ArgumentParser(description="指数择时策略批量回测")
+    parser.add_argument("--rules", nargs="+", default=list(RULES), choices=list(RULES), help="要回测的规则，默认全部")
+    parser.add_argument("--symbols", nargs="+", default=SYMBOLS, help="指数代码或东方财富概念板块名称")
+    parser.add_argument("--start", default="20050101", help="开始日期")
+    parser.add_argument("--end", default="20241231", help="结束日期")
+    parser.add_argument("--param", action="append", metavar="RULE:KEY=V1,V2",
+                        help="覆盖某条规则的参数，可以给多个取值、重复多次，各参数取值做笛卡尔积")
+    parser.add_argument("--output", default="index_batch", help="输出文件名前缀（CSV 对比表和 HTML 报告）")
+    options = parser.parse_args()
+
+    overrides = parse_overrides(options.param)
+    panel = load_index_panel(options.symbols, options.start, options.end)
+    # 个别指数缺某天的行情时沿用前一天的收盘价，还没发布的日期保持 NaN
+    close = panel.frame("close").astype(np.float64).ffill().to_numpy()
+    pct = panel["pct_chg"].astype(np.float64)
+    symbols = list(panel.symbols)
+
+    table, curves = compare(close, pct, panel.dates, symbols, options.rules, overrides)
+    pd.set_option('expand_frame_repr', False)
+    print(table[["rule", "params", "symbol", "start", "total_return", "benchmark_return", "cagr", "sharpe", "max_drawdown", "win_rate"]])
+
+    with ResultSink("index_batch", params={"start_date": options.start, "end_date": options.end}) as sink:
+        sink.append(table)
+        sink.export(f"{options.output}.csv")
+
+    # 每组参数一张净值图，和对比表一起写进一个 HTML 报告
+    starts = first_valid(close)
+    charts = [equity_chart(rule, label, returns, panel.dates, symbols, starts) for (rule, label), returns in curves.items()]
+    write_html(charts, f"{options.output}.html", title="指数择时策略对比", tables={"绩效对比": table})
+
+
+if __name__ == "__main__":
+    main()
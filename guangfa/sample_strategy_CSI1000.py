@@ -6,7 +6,14 @@ Created on Sat Nov  2 22:09:16 2024
 """
 import akshare as ak
 import pandas as pd
-import matplotlib.pyplot as plt
+import numpy as np
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.indicators import gain_loss, sma
+from common.metrics import summarize
+from common.report import equity_charts, write_html
+from common.results import ResultSink
 
 df = ak.stock_zh_index_daily(symbol="sh000852")
 df = df.sort_index()
@@ -15,26 +22,19 @@ df.set_index('date', inplace=True)
 df['return'] = df['close'].pct_change()
 
 def rsi_strategy(df):
-    # 计算价格变化
-    price_change = df['close'].diff()
-    # 区分上涨和下跌的价格变化
-    up = [max(change, 0) for change in price_change]
-    down = [abs(min(change, 0)) for change in price_change]
-    # 计算平均上涨和平均下跌
+    # 计算平均上涨和平均下跌（最近 window 日价格变化的简单平均，不足 window 日为 NaN）
     window = 10
-    avg_up = [sum(up[max(0, i - window + 1):i + 1]) / min(i + 1, window) if i >= window - 1 else sum(up[:i + 1]) / (i + 1) for i in range(len(up))]
-    avg_down = [sum(down[max(0, i - window + 1):i + 1]) / min(i + 1, window) if i >= window - 1 else sum(down[:i + 1]) / (i + 1) for i in range(len(down))]
-    # 计算相对强弱指数 RSI
-    rs = [up_value / down_value if down_value > 0 else 0 for up_value, down_value in zip(avg_up, avg_down)]
-    rsi = [100 - (100 / (1 + r_value)) if r_value > 0 else 0 for r_value in rs]
-    df['rsi'] = rsi
+    avg_up, avg_down = gain_loss(df['close'], window)
+    # 计算相对强弱指数 RSI（平均下跌为 0 或数据不足时记为 0）
+    rs = np.divide(avg_up, avg_down, out=np.zeros(len(df)), where=avg_down > 0)
+    df['rsi'] = np.where(rs > 0, 100 - 100 / (1 + rs), 0)
     return df
 df = rsi_strategy(df)
 
 
 #策略一：突破前高/低、均线与RSI结合策略
 cycle=4
-df['ma'] = df['close'].rolling(window=cycle).mean()
+df['ma'] = sma(df['close'], cycle)
 
 df['signal1'] = 0
 df.loc[(df['close']>df['ma'])
@@ -48,42 +48,39 @@ df.loc[(df['rsi']>95), 'signal1'] = 0
 
 df['Strategy Returns']  = df['return'] * df['signal1'].shift(1)
 
-# 计算累积收益率，并创建一个新的列来存储它
-df['Cumulative Returns'] = (1 + df['Strategy Returns']-0.000023).cumprod()-1  # 计算累积收益率
-df['cum_NV'] = (1 + df['Strategy Returns']-0.000023).cumprod().ffill()
-df['max_drawdown'] = (df['cum_NV'].cummax() - df['cum_NV']) / df['cum_NV'].cummax()
+# 计算累积收益率（扣除每日费用），并创建一个新的列来存储它
+net_returns = df['Strategy Returns'] - 0.000023
+df['Cumulative Returns'] = (1 + net_returns).cumprod() - 1  # 计算累积收益率
 df['index_return'] = df['close']/df['close'].iloc[0]-1
 
 # 输出交易结果
 pd.set_option('expand_frame_repr', False)
 print(df[-50:])
-# 计算每个周期的胜率和盈亏比
-period_returns1 = df['Strategy Returns'][df['signal1'].shift(1) != 0]
-period_wins1 = period_returns1[period_returns1 > 0]
-period_losses1 = period_returns1[period_returns1 < 0]
-win_rate1 = len(period_wins1) / len(period_returns1)
-loss_rate1 = len(period_losses1) / len(period_returns1)
-win_loss_ratio1 = -period_wins1.mean() / period_losses1.mean()
-
-print("Win Rate1: {:.2%}".format(win_rate1))
-print("Loss Rate1: {:.2%}".format(loss_rate1))
-print("Win/Loss Ratio1: {:.2f}".format(win_loss_ratio1))
-
-print("Cumulative Returns: {:.2%}".format(df['Cumulative Returns'].iloc[-1]))
-print('Max Drawdown: {:.2%}'.format(df['max_drawdown'].max()))
-
-# 绘制累积收益率的时间序列图
-plt.figure(figsize=(28, 8))
-plt.plot(df['Cumulative Returns'], label='Cumulative Returns')
-plt.plot(df['index_return'], label='Index_return' )
-plt.title('Cumulative Returns')
-plt.xlabel('Date')
-plt.ylabel('Returns')
-plt.legend()
-plt.grid(True) 
-plt.show()
-
-df.to_excel('中证1000_result.xlsx')
+# 绩效指标一次算出：净值类指标按扣费后的收益，胜率和盈亏比按扣费前的收益、只统计有持仓的周期
+stats = summarize(net_returns, dates=df.index, position=df['signal1'].shift(1))
+hits = summarize(df['Strategy Returns'], position=df['signal1'].shift(1))
+stats.update({key: hits[key] for key in ('win_rate', 'loss_rate', 'win_loss_ratio')})
+
+print("Win Rate1: {:.2%}".format(stats['win_rate']))
+print("Loss Rate1: {:.2%}".format(stats['loss_rate']))
+print("Win/Loss Ratio1: {:.2f}".format(stats['win_loss_ratio']))
+
+print("Cumulative Returns: {:.2%}".format(stats['total_return']))
+print('Max Drawdown: {:.2%}'.format(-stats['max_drawdown']))
+print("CAGR: {:.2%}".format(stats['cagr']))
+print("Sharpe: {:.2f}".format(stats['sharpe']))
+print(stats['yearly'])
+
+# 生成 HTML 报告：策略与指数的净值曲线、回撤曲线和绩效指标（不弹窗，批量运行时不会阻塞）
+charts = equity_charts(1 + df['Cumulative Returns'].fillna(0), benchmark=1 + df['index_return'], title='CSI1000 RSI+MA',
+                       label='Strategy', benchmark_label='Index')
+summary = pd.Series({k: v for k, v in stats.items() if k not in ('yearly', 'monthly')}, name='value').to_frame()
+write_html(charts, '中证1000_report.html', title='中证1000 RSI+均线策略', tables={'绩效指标': summary, '分年收益': stats['yearly'].to_frame('return')})
+
+# 回测明细写入本地结果仓库，再导出到Excel
+with ResultSink("sample_strategy_CSI1000", params={"symbol": "sh000852", "cycle": cycle}) as sink:
+    sink.append(df)
+    sink.export('中证1000_result.xlsx', index='date', sheets={"Sheet1": list(df.columns)})
 
 
 
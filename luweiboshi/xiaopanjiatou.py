@@ -1,57 +1,50 @@
-import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import os
+import sys
 import warnings
 warnings.filterwarnings('ignore')
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.fundamentals import fundamental_store
+from common.panel import load_panel
+from common.tradecal import get_calendar
 
 # ========== 基础数据准备 ==========
 def get_all_stocks():
-    """获取全市场股票列表"""
-    stock_info = ak.stock_info_a_code_name()
-    return stock_info[stock_info['code'].str.startswith(('00', '60', '30'))]  # 仅A股
-
-def get_ipo_date():
-    """获取IPO日期"""
-    ipo_data = ak.stock_ipo_info()
-    return ipo_data[['code', 'listing_date']]
-
-# ========== 财务数据获取 ==========
-def get_financial_data(year):
-    """获取指定年份的年报财务数据"""
-    financial_df = ak.stock_financial_report_sina(2023)  # 需要根据年份调整
-    # 选取需要的字段：营业收入、净利润、ROE、毛利率、营业利润率
-    return financial_df[['code', '报表日期', '营业收入', '净利润', '净资产收益率', '销售毛利率', '营业利润率']]
-
-# ========== 员工数据获取 ==========
-def get_employee_data(year):
-    """获取员工数据"""
-    employee_df = ak.stock_employee_analysis_em(symbol="SH600000")  # 示例接口，需要遍历个股
-    # 需要自行实现全市场获取逻辑
-    return employee_df[['code', '员工人数', '应付职工薪酬']]
-
-# ========== 机构预测数据获取 ==========
-def get_eps_forecast():
-    """获取机构预测EPS数据"""
-    forecast_df = ak.stock_profit_forecast()
-    return forecast_df[['code', '预测年度', '预测EPS']]
+    """获取全市场股票列表（含上市日期），本地每天最多下载一次"""
+    stock_info = fundamental_store.listings()
+    return stock_info[stock_info.index.str.startswith(('00', '60', '30'))]  # 仅A股
+
+# ========== 财务与员工数据获取 ==========
+def get_fundamentals(years):
+    """
+    一次性读出若干年年报的财务与员工数据（本地按报告期缓存，只补拉缺的部分）
+    以 (报告期, 代码) 为索引，列为 营业收入 / 净利润 / 净资产收益率 / 销售毛利率 / 营业利润率 / 公告日期 / 员工人数 / 应付职工薪酬
+    """
+    return fundamental_store.load(list(years))
 
 # ========== 策略筛选逻辑 ==========
 class StrategyFilter:
-    def __init__(self, current_date):
+    """
+    :param current_date: 调仓日
+    :param fundamentals: get_fundamentals 的返回值，筛选时只在内存里做向量化比较
+    """
+    def __init__(self, current_date, fundamentals):
         self.current_date = current_date
-        
+        # 使用上一年年报，只取调仓日之前已经公告的
+        period = pd.Timestamp(current_date.year - 1, 12, 31)
+        annual = fundamentals[fundamentals.index.get_level_values('报告期') == period].droplevel('报告期')
+        self.annual = annual[annual['公告日期'] <= current_date]
+
     def filter_ipo_age(self, stocks):
         """IPO时间筛选"""
-        ipo_date = get_ipo_date()
-        merged = pd.merge(stocks, ipo_date, on='code')
-        merged['ipo_years'] = (self.current_date - merged['listing_date']).dt.days / 365
-        return merged[(merged['ipo_years'] >= 1) & (merged['ipo_years'] <= 8)]
-    
+        ipo_years = (self.current_date - stocks['上市日期']).dt.days / 365
+        return stocks[(ipo_years >= 1) & (ipo_years <= 8)]
+
     def filter_financials(self, stocks):
         """财务指标筛选"""
-        financials = get_financial_data(self.current_date.year-1)  # 使用上一年年报
-        merged = pd.merge(stocks, financials, on='code')
+        merged = stocks.join(self.annual, how='inner')
         return merged[
             (merged['营业收入'] >= 1e8) & (merged['营业收入'] <= 1e10) &
             (merged['净利润'] >= 1e7) & (merged['净利润'] <= 1e9) &
@@ -59,11 +52,10 @@ class StrategyFilter:
             (merged['销售毛利率'] > 20) &
             (merged['营业利润率'] > 5)
         ]
-    
+
     def filter_employee(self, stocks):
-        """人均指标筛选"""
-        employee = get_employee_data(self.current_date.year-1)
-        merged = pd.merge(stocks, employee, on='code')
+        """人均指标筛选（员工数据已随财务数据一起并入）"""
+        merged = stocks.copy()
         merged['人均营收'] = merged['营业收入'] / merged['员工人数']
         merged['人均利润'] = merged['净利润'] / merged['员工人数']
         merged['人均薪酬'] = merged['应付职工薪酬'] / merged['员工人数']
@@ -73,12 +65,11 @@ class StrategyFilter:
             (merged['人均利润'] > 1e4) &
             (merged['人均薪酬'] > 8e4)
         ]
-    
+
     def filter_eps_growth(self, stocks):
         """EPS增长预测筛选"""
-        eps = get_eps_forecast()
-        # 需要处理预测数据的时间维度
-        # 此处为示意逻辑，实际需要计算复合增长率
+        # 机构一致预期接口只提供当前的预测，历史调仓日用不了（会用到未来信息）
+        # 此处为示意逻辑，实际需要历史预测数据计算复合增长率
         return stocks
 
 # ========== 回测引擎 ==========
@@ -88,7 +79,7 @@ class BacktestEngine:
         self.end_date = pd.to_datetime(end_date)
         self.capital = 1e6  # 初始资金
         self.positions = {}
-        
+
     def get_rebalance_dates(self):
         """生成调仓日期序列"""
         dates = []
@@ -98,37 +89,56 @@ class BacktestEngine:
                 dates.append(current)
             current += timedelta(days=1)
         return dates
-    
+
     def run_backtest(self):
         rebalance_dates = self.get_rebalance_dates()
-        portfolio_values = []
-        
+
+        # 股票列表和所有年份的年报数据只读一次，之后的调仓循环不再有网络请求
+        all_stocks = get_all_stocks()
+        fundamentals = get_fundamentals(range(self.start_date.year - 1, self.end_date.year))
+
+        # 执行筛选逻辑
+        selections = []
         for date in rebalance_dates:
-            # 执行筛选逻辑
-            filter = StrategyFilter(date)
-            stocks = get_all_stocks()
-            stocks = filter.filter_ipo_age(stocks)
+            filter = StrategyFilter(date, fundamentals)
+            stocks = filter.filter_ipo_age(all_stocks)
             stocks = filter.filter_financials(stocks)
             stocks = filter.filter_employee(stocks)
             stocks = filter.filter_eps_growth(stocks)
-            
-            # 获取价格数据
-            selected_codes = stocks['code'].tolist()
-            prices = ak.stock_zh_a_hist(symbol=selected_codes, period="daily", start_date=date.strftime('%Y%m%d'), end_date=date.strftime('%Y%m%d'))
-            
-            # 计算等权重持仓
+            selections.append(stocks.index.tolist())
+
+        # 获取价格数据：所有入选股票在各调仓日（不晚于 6 月 30 日的最近交易日）的收盘价，一次读成面板
+        calendar = get_calendar()
+        trade_dates = [calendar.prev(date) for date in rebalance_dates]
+        symbols = sorted(set().union(*selections))
+        panel = load_panel(symbols, trade_dates[0], trade_dates[-1], adjust="qfq", fields=("close",), dates=sorted(set(trade_dates)))
+        prices = panel.frame("close")
+
+        portfolio_values = []
+        for trade_date, selected_codes in zip(trade_dates, selections):
+            close = prices.loc[pd.Timestamp(trade_date)]
+
+            # 按调仓日收盘价计算组合净值，停牌的股票按买入时的市值计
+            if self.positions:
+                self.capital = sum(
+                    shares * close[code] if not np.isnan(close[code]) else cost
+                    for code, (shares, cost) in self.positions.items()
+                )
+
+            # 计算等权重持仓（调仓日停牌的股票不买入）
+            selected_codes = [code for code in selected_codes if not np.isnan(close[code])]
             if len(selected_codes) > 0:
                 position_size = self.capital / len(selected_codes)
-                self.positions = {code: position_size / prices[code]['收盘'].iloc[0] for code in selected_codes}
-            
-            # 计算组合净值
-            # 此处需要实现持仓市值计算逻辑
+                self.positions = {code: (position_size / close[code], position_size) for code in selected_codes}
+            else:
+                self.positions = {}
+
             portfolio_values.append(self.capital)
-            
+
         return portfolio_values
 
 # ========== 执行回测 ==========
 if __name__ == "__main__":
     engine = BacktestEngine('2015-06-30', '2023-06-30')
     results = engine.run_backtest()
-    print(pd.Series(results, index=engine.get_rebalance_dates()).plot())
\ No newline at end of file
+    print(pd.Series(results, index=engine.get_rebalance_dates()).plot())
@@ -1,12 +1,13 @@
-import akshare as ak
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.barstore import stock_zh_a_hist
+from common.report import Chart, render
 
 # 获取数据
 def get_stock_data(symbol, start_date, end_date):
-    stock_data = ak.stock_zh_a_hist(symbol=symbol, period="daily", start_date=start_date, end_date=end_date, adjust="")
+    stock_data = stock_zh_a_hist(symbol=symbol, period="daily", start_date=start_date, end_date=end_date, adjust="")
     stock_data['日期'] = pd.to_datetime(stock_data['日期'])
     stock_data.set_index('日期', inplace=True)
     return stock_data
@@ -26,33 +27,22 @@ def calculate_statistics(stock_data):
     
     return avg_max_increase, avg_max_decrease, median_max_increase, median_max_decrease
 
-# 可视化
-def visualize_statistics(stock_data, avg_max_increase, avg_max_decrease, median_max_increase, median_max_decrease):
-    plt.figure(figsize=(14, 7))
+# 可视化：保存为图片（不弹窗，批量运行时不会阻塞）
+def visualize_statistics(stock_data, avg_max_increase, avg_max_decrease, median_max_increase, median_max_decrease, path='SZ002780_daily_max_change.png'):
+    chart = Chart('SZ002780 Daily Max Increase and Decrease', xlabel='Date', ylabel='Change',
+                  figsize=(14, 7), date_format='%Y-%m-%d', date_interval=2)
 
     # 绘制每日最大涨幅和最大跌幅
-    plt.plot(stock_data.index, stock_data['Max Increase'], label='Daily Max Increase', color='g')
-    plt.plot(stock_data.index, stock_data['Max Decrease'], label='Daily Max Decrease', color='r')
+    chart.line(stock_data.index, stock_data['Max Increase'], label='Daily Max Increase', color='g')
+    chart.line(stock_data.index, stock_data['Max Decrease'], label='Daily Max Decrease', color='r')
 
     # 绘制平均值和中位数
-    plt.axhline(y=avg_max_increase, color='g', linestyle='--', label=f'Avg Max Increase: {avg_max_increase:.4f}')
-    plt.axhline(y=avg_max_decrease, color='r', linestyle='--', label=f'Avg Max Decrease: {avg_max_decrease:.4f}')
-    plt.axhline(y=median_max_increase, color='g', linestyle=':', label=f'Median Max Increase: {median_max_increase:.4f}')
-    plt.axhline(y=median_max_decrease, color='r', linestyle=':', label=f'Median Max Decrease: {median_max_decrease:.4f}')
+    chart.hline(avg_max_increase, color='g', linestyle='--', linewidth=None, label=f'Avg Max Increase: {avg_max_increase:.4f}')
+    chart.hline(avg_max_decrease, color='r', linestyle='--', linewidth=None, label=f'Avg Max Decrease: {avg_max_decrease:.4f}')
+    chart.hline(median_max_increase, color='g', linestyle=':', linewidth=None, label=f'Median Max Increase: {median_max_increase:.4f}')
+    chart.hline(median_max_decrease, color='r', linestyle=':', linewidth=None, label=f'Median Max Decrease: {median_max_decrease:.4f}')
 
-    plt.title('SZ002780 Daily Max Increase and Decrease')
-    plt.xlabel('Date')
-    plt.ylabel('Change')
-    plt.legend()
-    plt.grid(True)
-    plt.tight_layout()
-
-    # 格式化日期显示
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-    plt.gca().xaxis.set_major_locator(mdates.DayLocator(interval=2))
-    plt.gcf().autofmt_xdate()
-
-    plt.show()
+    return render(chart, path)
 
 def main():
     symbol = "002780"
@@ -1,5 +1,9 @@
 import pandas as pd
 import akshare as ak
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # 项目根目录，用于导入 common
+from common.sigsweep import SignalBacktest
 
 # 获取概念板块历史数据
 stock_board_concept_hist_em_df = ak.stock_board_concept_hist_em(
@@ -19,29 +23,24 @@ stock_board_concept_hist_em_df = stock_board_concept_hist_em_df.sort_values(by='
 initial_balance = 1_000_000
 balance = initial_balance
 position = 0  # 持仓数量
-total_value = initial_balance  # 总资产价值记录
 transaction_log = []  # 记录交易信息
 
-# 回测策略
-for index, row in stock_board_concept_hist_em_df.iterrows():
-    date = row['日期']
-    price_change = row['涨跌幅'] / 100
-    close_price = row['收盘']  # 假设有收盘价字段
-    
-    if price_change <= -0.03 and balance > 0:
-        # 全仓买入
-        position = balance / close_price
-        balance = 0
-        transaction_log.append((date, "买入", close_price, position, balance))
-    
-    elif price_change >= 0.03 and position > 0:
-        # 全仓卖出
-        balance = position * close_price
+# 回测策略：空仓时跌 3% 全仓买入，持仓时涨 3% 全仓卖出，持仓区间由信号一次求出
+price_change = stock_board_concept_hist_em_df['涨跌幅'] / 100
+result = SignalBacktest(
+    stock_board_concept_hist_em_df['收盘'],
+    enter=price_change <= -0.03,
+    exit=price_change >= 0.03,
+    dates=stock_board_concept_hist_em_df['日期'],
+)
+for trade in result.trades().itertuples():
+    position = balance / trade.entry_price
+    balance = 0
+    transaction_log.append((trade.entry_date, "买入", trade.entry_price, position, balance))
+    if not pd.isna(trade.exit_date):
+        balance = position * trade.exit_price
         position = 0
-        transaction_log.append((date, "卖出", close_price, position, balance))
-    
-    # 记录总资产价值
-    total_value = balance + position * close_price
+        transaction_log.append((trade.exit_date, "卖出", trade.exit_price, position, balance))
 
 # 输出交易日志
 for log in transaction_log: